@@ -113,7 +113,7 @@ else:
 a = Analysis(['main.py'],
              pathex=pathex,
              binaries=None,
-             datas=libportaudio,
+             datas=libportaudio + [('friture/generated_filters.npz', 'friture')],
              hiddenimports=[],
              hookspath=[],
              runtime_hooks=[],
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2009 Timothée Lecomte
+
+# This file is part of Friture.
+#
+# Friture is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as published by
+# the Free Software Foundation.
+#
+# Friture is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Friture.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Process-wide cache of STFT frames, shared by the docks that use the same analysis parameters."""
+
+import logging
+
+from numpy import zeros
+
+from friture.audioproc import audioproc
+
+# number of spectra kept per cache entry, so that docks that lag
+# a little behind the others can still be served from the cache
+DEFAULT_HISTORY_FRAMES = 64
+
+__analysisCacheInstance = None
+
+
+def AnalysisCache():
+    global __analysisCacheInstance
+    if __analysisCacheInstance is None:
+        __analysisCacheInstance = __AnalysisCache()
+    return __analysisCacheInstance
+
+
+class AnalysisEntry:
+    """Spectra of one channel for a given FFT size and hop size, with the Hann window of audioproc.
+
+    Frames are identified by the ring buffer index where they end. That index is
+    always a multiple of the hop size, so that all the subscribers compute
+    their frames on the same grid and can share them."""
+
+    def __init__(self, key, audiobuffer, fft_size, step, channel):
+        self.key = key
+        self.audiobuffer = audiobuffer
+        self.fft_size = fft_size
+        self.step = step
+        self.channel = channel
+
+        self.refcount = 0
+
+        self.proc = audioproc()
+        self.proc.set_fftsize(fft_size)
+
+        self.nfreq = fft_size // 2 + 1
+
+        # doubled storage so that any run of frames can be returned as a contiguous view
+        self.capacity = DEFAULT_HISTORY_FRAMES
+        self.history = zeros((2 * self.capacity, self.nfreq))
+
+        # number of the first and one-past-last frame held in the history
+        self.first_frame = 0
+        self.end_frame = 0
+
+    def align(self, index):
+        # align a ring buffer index on the frame grid of this entry
+        return index - index % self.step
+
+    def frames(self, index, count):
+        """Return the spectra of the 'count' frames that end at index, index + step, ...
+
+        The result has shape (count, fft_size/2 + 1) and is read-only, since it is
+        shared with the other subscribers."""
+
+        if index % self.step != 0:
+            raise ValueError("Frame index %d is not aligned on the hop size %d" % (index, self.step))
+
+        first = index // self.step
+        end = first + count
+
+        if count > self.capacity:
+            self.grow(count)
+
+        if first < self.first_frame or first > self.end_frame:
+            # not contiguous with the cached frames (docks far apart, or a reset): restart the history
+            self.first_frame = first
+            self.end_frame = first
+
+        if end > self.end_frame:
+            self.compute(self.end_frame, end - self.end_frame)
+
+        start = first % self.capacity
+        view = self.history[start: start + count]
+        view.flags.writeable = False
+        return view
+
+    def compute(self, first, count):
+        # the last frame ends at (first + count - 1) * step
+        length = self.fft_size + (count - 1) * self.step
+        floatdata = self.audiobuffer.data_indexed((first + count - 1) * self.step, length)
+        spectra = self.proc.analyzelive_batch(floatdata[min(self.channel, floatdata.shape[0] - 1), :], count, self.step)
+
+        if spectra.dtype != self.history.dtype:
+            # the processing precision was changed, the spectra follow the type of the samples
+            self.history = zeros(self.history.shape, dtype=spectra.dtype)
+            self.first_frame = first
+
+        self.store(first, spectra)
+
+        self.end_frame = first + count
+        self.first_frame = max(self.first_frame, self.end_frame - self.capacity)
+
+    def store(self, first, spectra):
+        count = spectra.shape[0]
+        start = first % self.capacity
+        # first copy, always complete
+        self.history[start: start + count] = spectra
+        # second copy, can be folded
+        direct = min(count, self.capacity - start)
+        folded = count - direct
+        self.history[start + self.capacity: start + self.capacity + direct] = spectra[:direct]
+        self.history[:folded] = spectra[direct:]
+
+    def grow(self, count):
+        self.capacity = 2 * count
+        self.history = zeros((2 * self.capacity, self.nfreq), dtype=self.history.dtype)
+        self.first_frame = self.end_frame
+
+
+class __AnalysisCache:
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self.entries = {}
+
+    def subscribe(self, audiobuffer, fft_size, step, channel=0):
+        key = (fft_size, step, channel)
+
+        entry = self.entries.get(key)
+        if entry is None:
+            self.logger.info("Creating analysis cache entry %s", key)
+            entry = AnalysisEntry(key, audiobuffer, fft_size, step, channel)
+            self.entries[key] = entry
+
+        entry.refcount += 1
+        return entry
+
+    def unsubscribe(self, entry):
+        if entry is None:
+            return
+
+        entry.refcount -= 1
+        if entry.refcount <= 0:
+            self.logger.info("Dropping analysis cache entry %s", entry.key)
+            self.entries.pop(entry.key, None)
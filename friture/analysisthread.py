@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2009 Timothée Lecomte
+
+# This file is part of Friture.
+#
+# Friture is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as published by
+# the Free Software Foundation.
+#
+# Friture is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Friture.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Analysis thread that drains the audio input and runs the widgets processing away from the GUI thread."""
+
+import logging
+from collections import deque
+
+from PyQt5 import QtCore
+
+from friture.audiobackend import AudioBackend
+from friture.instrumentation import Instrumentation, TickLateness
+
+
+class Mailbox:
+    """Hands results over from the analysis thread to the GUI thread without locks.
+
+    In single-slot mode, only the most recent result is kept: the GUI draws
+    the latest state and older results are dropped. In queue mode, every result
+    is kept until taken, for widgets that must not lose data (spectrogram columns).
+
+    deque.append and deque.popleft are atomic in CPython, so no lock is needed.
+
+    Each result is stamped with the capture time of the audio block it was
+    computed from, for the latency probe of the dock (see instrumentation)."""
+
+    def __init__(self, single_slot=True):
+        self.slot = deque(maxlen=1 if single_slot else None)
+
+        # capture time of the last result taken
+        self.capture_time = None
+
+    def post(self, result, capture_time=None):
+        self.slot.append((result, capture_time))
+
+    def take(self):
+        # return the oldest pending result, or None
+        try:
+            result, self.capture_time = self.slot.popleft()
+        except IndexError:
+            return None
+        return result
+
+    def take_all(self):
+        results = []
+        result = self.take()
+        while result is not None:
+            results.append(result)
+            result = self.take()
+        return results
+
+    def clear(self):
+        self.take_all()
+
+
+class AnalysisWorker(QtCore.QObject):
+
+    def __init__(self, period_ms):
+        super().__init__()
+
+        self.logger = logging.getLogger(__name__)
+
+        # the timer is a child of the worker, so it moves with it to the analysis thread
+        self.timer = QtCore.QTimer(self)
+        self.timer.setInterval(period_ms)
+        self.timer.timeout.connect(self.tick)
+
+        self.lateness = TickLateness("Analysis thread", period_ms)
+
+    # decorated, so that the slot is invoked in the analysis thread rather than
+    # through a proxy living in the thread where the connection was made
+    @QtCore.pyqtSlot()
+    def start(self):
+        self.timer.start()
+
+    @QtCore.pyqtSlot()
+    def stop(self):
+        self.timer.stop()
+        self.lateness.reset()
+
+    @QtCore.pyqtSlot()
+    def tick(self):
+        # new_data_available is emitted from this thread, so that the
+        # ring buffer and the widgets processing run here too
+        self.lateness.tick()
+        with Instrumentation().timed("Analysis thread", "fetchAudioData"):
+            AudioBackend().fetchAudioData()
+
+
+class AnalysisThread(QtCore.QObject):
+
+    start_requested = QtCore.pyqtSignal()
+    stop_requested = QtCore.pyqtSignal()
+
+    def __init__(self, period_ms, parent=None):
+        super().__init__(parent)
+
+        self.logger = logging.getLogger(__name__)
+
+        self.thread = QtCore.QThread()
+        self.thread.setObjectName("analysis")
+
+        self.worker = AnalysisWorker(period_ms)
+        self.worker.moveToThread(self.thread)
+
+        # queued connections, since the worker lives in the analysis thread
+        self.start_requested.connect(self.worker.start)
+        self.stop_requested.connect(self.worker.stop)
+
+        self.thread.start()
+
+    def move_to_analysis_thread(self, qobject):
+        # objects whose slots must run in the analysis thread (the audio buffer)
+        qobject.moveToThread(self.thread)
+
+    def start(self):
+        self.logger.info("Starting the analysis thread timer")
+        self.start_requested.emit()
+
+    def stop(self):
+        self.logger.info("Stopping the analysis thread timer")
+        self.stop_requested.emit()
+
+    def is_analysis_thread(self):
+        return QtCore.QThread.currentThread() is self.thread
+
+    def quit(self):
+        self.stop()
+        self.thread.quit()
+        self.thread.wait()
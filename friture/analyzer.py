@@ -19,6 +19,7 @@
 
 import sys
 import os
+import argparse
 import os.path
 import errno
 import platform
@@ -38,8 +39,13 @@ from friture.ui_friture import Ui_MainWindow
 from friture.about import About_Dialog  # About dialog
 from friture.settings import Settings_Dialog  # Setting dialog
 from friture.audiobuffer import AudioBuffer  # audio ring buffer class
-from friture.audiobackend import AudioBackend  # audio backend class
+from friture.audiobackend import AudioBackend, SAMPLING_RATE  # audio backend class
+from friture.filesource import FileSource
+from friture.syntheticsource import SyntheticSource, SIGNALS, DEFAULT_DURATION, DEFAULT_BLOCK_SIZE, DEFAULT_SEED
+from friture.analysisthread import AnalysisThread
+from friture.instrumentation import Instrumentation, TickLateness
 from friture.dockmanager import DockManager
+from friture.framescheduler import FrameScheduler
 from friture.tilelayout import TileLayout
 from friture.levels import Levels_Widget
 
@@ -55,6 +61,9 @@ SLOW_TIMER_PERIOD_MS = 1000
 
 class Friture(QMainWindow, ):
 
+    # errors raised in the analysis thread are shown from the GUI thread
+    analysis_error = QtCore.pyqtSignal(str)
+
     def __init__(self):
         QMainWindow.__init__(self)
 
@@ -63,13 +72,19 @@ class Friture(QMainWindow, ):
         # exception hook that logs to console, file, and display a message box
         self.errorDialogOpened = False
         sys.excepthook = self.excepthook
+        self.analysis_error.connect(self.show_error)
 
         # Setup the user interface
         self.ui = Ui_MainWindow()
         self.ui.setupUi(self)
 
+        # the audio input is drained and the widgets processing is run in a separate thread,
+        # only ready-to-draw results are handed back to the GUI thread
+        self.analysis_thread = AnalysisThread(SMOOTH_DISPLAY_TIMER_PERIOD_MS)
+
         # Initialize the audio data ring buffer
         self.audiobuffer = AudioBuffer()
+        self.analysis_thread.move_to_analysis_thread(self.audiobuffer)
 
         # Initialize the audio backend
         # signal containing new data from the audio callback thread, processed as numpy array
@@ -88,7 +103,10 @@ class Friture(QMainWindow, ):
 
         self.level_widget = Levels_Widget(self)
         self.level_widget.set_buffer(self.audiobuffer)
-        self.audiobuffer.new_data_available.connect(self.level_widget.handle_new_data)
+        # direct connection, like the docks: the levels are computed in the analysis thread
+        self.audiobuffer.new_data_available.connect(
+            Instrumentation().timed_call("Levels", "handle_new_data", self.level_widget.handle_new_data),
+            QtCore.Qt.DirectConnection)
 
         self.hboxLayout = QHBoxLayout(self.ui.centralwidget)
         self.hboxLayout.setContentsMargins(0, 0, 0, 0)
@@ -101,9 +119,14 @@ class Friture(QMainWindow, ):
         self.dockmanager = DockManager(self)
 
         # timer ticks
+        self.display_lateness = TickLateness("Display timer", SMOOTH_DISPLAY_TIMER_PERIOD_MS)
+        self.display_timer.timeout.connect(self.display_lateness.tick)
         self.display_timer.timeout.connect(self.dockmanager.canvasUpdate)
         self.display_timer.timeout.connect(self.level_widget.canvasUpdate)
-        self.display_timer.timeout.connect(AudioBackend().fetchAudioData)
+
+        # the quality of the docks is lowered when the processing and the display are over budget
+        self.frame_scheduler = FrameScheduler(self.dockmanager)
+        self.slow_timer.timeout.connect(self.frame_scheduler.evaluate)
 
         # toolbar clicks
         self.ui.actionStart.triggered.connect(self.timer_toggle)
@@ -133,6 +156,15 @@ class Friture(QMainWindow, ):
     def excepthook(self, exception_type, exception_value, traceback_object):
         gui_message = fileexcepthook(exception_type, exception_value, traceback_object)
 
+        if QtCore.QThread.currentThread() is not self.thread():
+            # message boxes can only be opened from the GUI thread
+            self.analysis_error.emit(gui_message)
+            return
+
+        self.show_error(gui_message)
+
+    # slot
+    def show_error(self, gui_message):
         # we do not want to flood the user with message boxes when the error happens repeatedly on each timer event
         if not self.errorDialogOpened:
             self.errorDialogOpened = True
@@ -149,6 +181,7 @@ class Friture(QMainWindow, ):
 
     # event handler
     def closeEvent(self, event):
+        self.analysis_thread.quit()
         AudioBackend().close()
         self.saveAppState()
         event.accept()
@@ -231,12 +264,15 @@ class Friture(QMainWindow, ):
         if self.display_timer.isActive():
             self.logger.info("Timer stop")
             self.display_timer.stop()
+            self.display_lateness.reset()
+            self.analysis_thread.stop()
             self.ui.actionStart.setText("Start")
             AudioBackend().pause()
             self.dockmanager.pause()
         else:
             self.logger.info("Timer start")
             self.display_timer.start()
+            self.analysis_thread.start()
             self.ui.actionStart.setText("Stop")
             AudioBackend().restart()
             self.dockmanager.restart()
@@ -274,7 +310,52 @@ class StreamToLogger(object):
         pass
 
 
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="friture", description="Real-time audio analyzer.",
+                                     epilog="Use 'friture analyze --help' for the offline analysis of recordings.")
+    parser.add_argument("--python", dest="profile", action="store_const", const="python", default="no",
+                        help="profile with cProfile, to friture.cprof")
+    parser.add_argument("--kcachegrind", dest="profile", action="store_const", const="kcachegrind",
+                        help="profile for KCacheGrind, to cachegrind.out.00000")
+    parser.add_argument("--no", dest="profile", action="store_const", const="no", help="do not profile")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--file", default=None, help="play a WAV file (or a raw PCM file) instead of the input device")
+    source.add_argument("--synthetic", default=None, choices=SIGNALS,
+                        help="play a deterministic synthetic signal instead of the input device, and quit at its end")
+    parser.add_argument("--speed", type=float, default=1.,
+                        help="playback speed, as a multiple of real time, 0 for as fast as possible (default: %(default)s)")
+    parser.add_argument("--loop", action="store_true", help="loop the playback of the file")
+    parser.add_argument("--raw-format", default=None, metavar="DTYPE:CHANNELS:RATE",
+                        help="format of a raw PCM file, for example int16:2:48000 or int24:1:96000")
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION,
+                        help="duration of the synthetic signal, in seconds (default: %(default)s)")
+    parser.add_argument("--block-size", type=int, default=DEFAULT_BLOCK_SIZE,
+                        help="number of samples in each block of the synthetic signal (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED,
+                        help="seed of the synthetic noise (default: %(default)s)")
+
+    # the remaining arguments are left to Qt
+    args, args.unknown = parser.parse_known_args(argv)
+
+    if args.speed < 0:
+        parser.error("the speed must be positive, or 0 for as fast as possible")
+    if args.duration <= 0 or args.block_size <= 0:
+        parser.error("the duration and the block size must be positive")
+
+    return args
+
+
 def main():
+    # headless analysis of recordings: friture analyze [options] files...
+    if len(sys.argv) > 1 and sys.argv[1] == "analyze":
+        from friture.offline import main as analyze_main
+        sys.exit(analyze_main(sys.argv[2:]))
+
+    # benchmarks of the processing paths: friture benchmark [--save|--compare baseline.json]
+    if len(sys.argv) > 1 and sys.argv[1] == "benchmark":
+        from friture.benchmark import main as benchmark_main
+        sys.exit(benchmark_main(sys.argv[2:]))
+
     # make the Python warnings go to Friture logger
     logging.captureWarnings(True)
 
@@ -337,6 +418,8 @@ def main():
         except:
             logger.error("Could not set the app model ID. If the plaftorm is older than Windows 7, this is normal.")
 
+    args = parse_args(sys.argv[1:])
+
     app = QApplication(sys.argv)
 
     if platform.system() == "Darwin":
@@ -362,21 +445,28 @@ def main():
     splash.showMessage("Initializing the audio subsystem")
     app.processEvents()
 
+    # the source replaces the input device, before the settings are restored and the analysis starts,
+    # and the devices are not opened at all
+    if args.file is not None:
+        try:
+            AudioBackend(FileSource(args.file, args.speed, args.loop, args.raw_format))
+        except (OSError, ValueError):
+            logger.exception("Failed to open '%s'", args.file)
+            sys.exit(1)
+    elif args.synthetic is not None:
+        # same workload on every run, for comparable profiles
+        AudioBackend(SyntheticSource(SAMPLING_RATE, args.synthetic, args.duration, args.block_size, args.seed,
+                                     args.speed))
+        AudioBackend().source_finished.connect(app.quit)
+
     window = Friture()
     window.show()
     splash.finish(window)
 
-    profile = "no"  # "python" or "kcachegrind" or anything else to disable
+    profile = args.profile  # "python" or "kcachegrind" or anything else to disable
 
-    if len(sys.argv) > 1:
-        if sys.argv[1] == "--python":
-            profile = "python"
-        elif sys.argv[1] == "--kcachegrind":
-            profile = "kcachegrind"
-        elif sys.argv[1] == "--no":
-            profile = "no"
-        else:
-            logger.info("command-line arguments (%s) not recognized", sys.argv[1:])
+    if len(args.unknown) > 0:
+        logger.info("command-line arguments (%s) not recognized", args.unknown)
 
     return_code = 0
     if profile == "python":
@@ -19,15 +19,31 @@
 
 import logging
 import math
+import time
 
 from PyQt5 import QtCore
 import sounddevice
 import rtmixer
-from numpy import ndarray, vstack, int16, float64, float32, frombuffer, concatenate
+from numpy import ndarray, int16, float64, float32, frombuffer, empty
 
-# the sample rate below should be dynamic, taken from PyAudio/PortAudio
-SAMPLING_RATE = 48000
-FRAMES_PER_BUFFER = 512
+from friture.filesource import SPEED_UNLIMITED
+from friture.instrumentation import Instrumentation
+# re-exported, most of the widgets import them from here
+from friture.defaults import SAMPLING_RATE, FRAMES_PER_BUFFER
+
+# sample types of the processing chain, selected in the settings dialog
+# single precision halves the memory traffic and is enough for display purposes
+PRECISION_DOUBLE = 0
+PRECISION_SINGLE = 1
+PRECISION_DTYPES = [float64, float32]
+
+# when a source is played as fast as possible, blocks are emitted for at most
+# this duration per fetch, so that the analysis thread still handles its events
+UNLIMITED_PLAYBACK_BUDGET_S = 0.02
+
+# the estimated capture time of the first frame is allowed to move later by this much per second,
+# more than the drift between the device clock and the stream clock, see capture_time()
+CAPTURE_ORIGIN_LEAK = 1e-3
 
 __audiobackendInstance = None
 
@@ -57,19 +73,25 @@ __audiobackendInstance = None
 # > doc, features are lacking
 
 
-def AudioBackend():
+def AudioBackend(source=None):
+    # source: a file or a synthetic signal played instead of the input device (see open_source),
+    # when given on the first call, the audio devices are neither enumerated nor opened
     global __audiobackendInstance
     if __audiobackendInstance is None:
-        __audiobackendInstance = __AudioBackend()
+        __audiobackendInstance = __AudioBackend(source)
+    elif source is not None:
+        __audiobackendInstance.open_source(source)
     return __audiobackendInstance
 
 
 class __AudioBackend(QtCore.QObject):
 
     underflow = QtCore.pyqtSignal()
-    new_data_available = QtCore.pyqtSignal(ndarray, float, bool)
+    # samples, stream time, overflow, capture time of the newest sample on the perf_counter clock
+    new_data_available = QtCore.pyqtSignal(ndarray, float, bool, float)
+    source_finished = QtCore.pyqtSignal()
 
-    def __init__(self):
+    def __init__(self, source=None):
         QtCore.QObject.__init__(self)
 
         self.logger = logging.getLogger(__name__)
@@ -78,9 +100,13 @@ class __AudioBackend(QtCore.QObject):
 
         self.logger.info("Initializing audio backend")
 
-        # look for devices
-        self.input_devices = self.get_input_devices()
-        self.output_devices = self.get_output_devices()
+        # look for devices, unless a source replaces them, so that a box without sound card can play it
+        if source is None:
+            self.input_devices = self.get_input_devices()
+            self.output_devices = self.get_output_devices()
+        else:
+            self.input_devices = []
+            self.output_devices = []
 
         self.device = None
         self.first_channel = None
@@ -91,6 +117,10 @@ class __AudioBackend(QtCore.QObject):
         self.action = None
         self.nchannels_max = 0
 
+        # file or synthetic signal played instead of the input device, see open_source
+        self.source = None
+        self.source_finished_emitted = False
+
         # we will try to open all the input devices until one
         # works, starting by the default input device
         for device in self.input_devices:
@@ -115,16 +145,71 @@ class __AudioBackend(QtCore.QObject):
         self.xruns = 0
 
         self.chunk_number = 0
+        self.frames_read = 0
+
+        # stream time at which frame 0 of frames_read was captured, estimated in capture_time()
+        self.capture_origin = None
+        self.capture_origin_time = None
+
+        # preallocated array where the selected channels are de-interleaved
+        # the array emitted with new_data_available is a view on it, only valid during the emission
+        self.staging_dtype = float64
+        self.staging = empty((2, 0), dtype=self.staging_dtype)
 
         self.devices_with_timing_errors = []
 
+        if source is not None:
+            self.open_source(source)
+
     def close(self):
         if self.stream is not None:
             self.stream.stop()
             self.stream = None
 
+        if self.source is not None:
+            self.source.close()
+            self.source = None
+
+    # method
+    # play a file (see filesource) or a synthetic signal (see syntheticsource) instead of the input device
+    def open_source(self, source):
+        if source.sampling_rate != SAMPLING_RATE:
+            self.logger.warning("The source sampling rate (%d Hz) differs from %d Hz, the frequencies will be scaled",
+                                source.sampling_rate, SAMPLING_RATE)
+
+        # the device is not needed anymore
+        if self.stream is not None:
+            self.stream.stop()
+        self.stream = None
+        self.ringBuffer = None
+        self.action = None
+
+        if self.source is not None:
+            self.source.close()
+        self.source = source
+        self.source_finished_emitted = False
+
+        # the timings and latencies of the previous input are not mixed with the new ones
+        Instrumentation().reset()
+
+        nchannels = source.get_nchannels()
+        self.nchannels_max = nchannels
+        self.device = {'name': source.name, 'max_input_channels': nchannels}
+        self.first_channel = 0
+        self.second_channel = 0 if nchannels == 1 else 1
+
+        source.start()
+
+    # method
+    def is_playing_source(self):
+        return self.source is not None
+
     # method
     def get_readable_devices_list(self):
+        if len(self.input_devices) == 0:
+            # not enumerated when a source is played instead
+            return []
+
         input_devices = self.get_input_devices()
 
         raw_devices = sounddevice.query_devices()
@@ -155,6 +240,9 @@ class __AudioBackend(QtCore.QObject):
 
     # method
     def get_readable_output_devices_list(self):
+        if len(self.output_devices) == 0:
+            return []
+
         output_devices = self.get_output_devices()
 
         raw_devices = sounddevice.query_devices()
@@ -271,6 +359,7 @@ class __AudioBackend(QtCore.QObject):
             (self.stream, self.ringBuffer, self.action, self.nchannels_max) = self.open_stream(device)
             self.device = device
             self.stream.start()
+            self.capture_origin = None
             success = True
         except Exception:
             self.logger.exception("Failed to open input device")
@@ -290,6 +379,13 @@ class __AudioBackend(QtCore.QObject):
             if previous_stream is not None:
                 previous_stream.stop()
 
+            # back to live input
+            if self.source is not None:
+                self.source.close()
+                self.source = None
+
+            Instrumentation().reset()
+
             self.first_channel = 0
             nchannels = self.device['max_input_channels']
             if nchannels == 1:
@@ -372,8 +468,27 @@ class __AudioBackend(QtCore.QObject):
     # (not the same as the PortAudio index, since the latter is the index
     # in the list of *all* devices, not only input ones)
     def get_readable_current_device(self):
+        if self.source is not None:
+            # a file or a synthetic signal is not in the devices list
+            return -1
         return self.input_devices.index(self.device)
 
+    # method
+    # description of the current input, for the timings export
+    def describe_input(self):
+        description = {'device': self.device['name'] if self.device is not None else None,
+                       'sampling_rate': SAMPLING_RATE}
+
+        if self.source is not None:
+            description['speed'] = self.source.speed
+        elif self.device is not None:
+            description['blocksize'] = FRAMES_PER_BUFFER
+            description['host_api'] = sounddevice.query_hostapis(self.device['hostapi'])['name']
+            if self.stream is not None:
+                description['reported_latency_ms'] = 1000. * self.stream.latency
+
+        return description
+
     # method
     def get_readable_current_channels(self):
         nchannels = self.device['max_input_channels']
@@ -403,43 +518,135 @@ class __AudioBackend(QtCore.QObject):
         return device['max_output_channels']
 
     def fetchAudioData(self):
+        if self.source is not None:
+            self.fetchSourceData()
+            return
+
         if self.action is None or self.ringBuffer is None:
             return
 
-        while self.ringBuffer.read_available >= FRAMES_PER_BUFFER:
-            read, buf1, buf2 = self.ringBuffer.get_read_buffers(FRAMES_PER_BUFFER)
-            assert read == FRAMES_PER_BUFFER
-            buffer1 = frombuffer(buf1, dtype='float32')
-            buffer2 = frombuffer(buf2, dtype='float32')
-            buffer = concatenate((buffer1, buffer2)).astype(float64)
-            buffer.shape = -1, self.nchannels_max
-            self.ringBuffer.advance_read_index(FRAMES_PER_BUFFER)
+        # drain everything that is available in one go, so that a late timer tick
+        # does not translate into one signal emission per buffer
+        available = self.ringBuffer.read_available
+        if available == 0:
+            return
+
+        # zero-copy views on the two parts of the rtmixer ring buffer, with interleaved channels
+        read, buf1, buf2 = self.ringBuffer.get_read_buffers(available)
+        buffer1 = frombuffer(buf1, dtype='float32').reshape(-1, self.nchannels_max)
+        buffer2 = frombuffer(buf2, dtype='float32').reshape(-1, self.nchannels_max)
 
-            channel = self.get_current_first_channel()
-            if self.duo_input:
-                channel_2 = self.get_current_second_channel()
+        floatdata = self.select_channels(read, buffer1, buffer2)
 
-            floatdata1 = buffer[:, channel]
+        self.ringBuffer.advance_read_index(read)
 
-            if self.duo_input:
-                floatdata2 = buffer[:, channel_2]
-                floatdata = vstack((floatdata1, floatdata2))
-            else:
-                floatdata = floatdata1
-                floatdata.shape = (1, floatdata.size)
+        input_time = self.get_stream_time()
+
+        input_overflows = self.action.stats.input_overflows
+        input_overflow = input_overflows > self.xruns
+        if input_overflow:
+            self.xruns = input_overflows
+            self.logger.info("Stream overflow!")
+            self.underflow.emit()
+            # frames were lost, the frame count does not follow the capture any more
+            self.capture_origin = None
+
+        self.frames_read += read
+        capture_time = self.capture_time(input_time)
+
+        self.new_data_available.emit(floatdata, input_time, input_overflow, capture_time)
+
+        self.chunk_number = self.frames_read // FRAMES_PER_BUFFER
+
+    def fetchSourceData(self):
+        # emit the blocks that are due, or when the playback is not paced,
+        # emit blocks until the time budget is spent
+        deadline = time.perf_counter() + UNLIMITED_PLAYBACK_BUDGET_S
+
+        while True:
+            available = self.source.read_available()
+            if available == 0:
+                break
 
-            input_time = self.get_stream_time()
+            # views on the source data (the memory-mapped file), the only copy is the channel selection
+            read, buffer1, buffer2 = self.source.read_buffers(available)
+            floatdata = self.select_channels(read, buffer1, buffer2)
 
-            input_overflows = self.action.stats.input_overflows
-            input_overflow = input_overflows > self.xruns
-            if input_overflow:
-                self.xruns = input_overflows
-                self.logger.info("Stream overflow!")
-                self.underflow.emit()
+            if self.source.offset != 0.:
+                floatdata -= self.source.offset
+            if self.source.scale != 1.:
+                floatdata *= self.source.scale
 
-            self.new_data_available.emit(floatdata, input_time, input_overflow)
+            self.source.advance_read_index(read)
 
-            self.chunk_number += 1
+            self.new_data_available.emit(floatdata, self.source.get_time(), False, self.source.get_capture_time())
+
+            self.frames_read += read
+            self.chunk_number = self.frames_read // FRAMES_PER_BUFFER
+
+            if self.source.speed == SPEED_UNLIMITED and time.perf_counter() > deadline:
+                break
+
+        if self.source.is_finished() and not self.source_finished_emitted:
+            self.source_finished_emitted = True
+            self.logger.info("End of the input source")
+            self.source_finished.emit()
+
+    def capture_time(self, stream_time):
+        """Capture time of the newest sample read, on the perf_counter clock.
+
+        The last callback queued the newest sample after the input latency, and the samples
+        captured since then are still waiting in the device. The stream time of the first frame,
+        stream time - latency - frames_read / rate, is exact for a fetch right after a callback
+        and overestimated by the time since the last callback otherwise, so the minimum over the
+        fetches is kept."""
+        perf_time = time.perf_counter()
+        if stream_time == 0:
+            # no stream clock, the perf_counter clock is the closest substitute
+            stream_time = perf_time
+
+        origin = stream_time - self.stream.latency - self.frames_read / float(SAMPLING_RATE)
+        if self.capture_origin is not None:
+            # let the origin follow the drift of the device clock
+            leaked = self.capture_origin + CAPTURE_ORIGIN_LEAK * (stream_time - self.capture_origin_time)
+            origin = min(origin, leaked)
+        self.capture_origin = origin
+        self.capture_origin_time = stream_time
+
+        capture_stream_time = origin + self.frames_read / float(SAMPLING_RATE)
+        return perf_time - (stream_time - capture_stream_time)
+
+    def select_channels(self, read, buffer1, buffer2):
+        if self.duo_input:
+            channels = (self.get_current_first_channel(), self.get_current_second_channel())
+        else:
+            channels = (self.get_current_first_channel(),)
+
+        floatdata = self.staging_view(len(channels), read)
+
+        # de-interleave and convert to the staging type, without temporaries
+        n1 = buffer1.shape[0]
+        for i, channel in enumerate(channels):
+            floatdata[i, :n1] = buffer1[:, channel]
+            floatdata[i, n1:] = buffer2[:, channel]
+
+        return floatdata
+
+    def staging_view(self, nchannels, length):
+        # grow geometrically, so that the staging array is reallocated only a few times
+        if length > self.staging.shape[1] or self.staging.dtype != self.staging_dtype:
+            self.staging = empty((2, max(length, 2 * self.staging.shape[1])), dtype=self.staging_dtype)
+
+        return self.staging[:nchannels, :length]
+
+    def set_precision(self, precision):
+        # the staging array is reallocated by the analysis thread on the next fetch
+        # the downstream buffers follow the type of the emitted data
+        self.staging_dtype = PRECISION_DTYPES[precision]
+        self.logger.info("Processing precision set to %s", self.staging_dtype.__name__)
+
+    def get_precision(self):
+        return PRECISION_DTYPES.index(self.staging_dtype)
 
     def set_single_input(self):
         self.duo_input = False
@@ -449,6 +656,9 @@ class __AudioBackend(QtCore.QObject):
 
     # returns the stream time in seconds
     def get_stream_time(self):
+        if self.source is not None:
+            return self.source.get_time()
+
         if self.stream is None:
             return 0
 
@@ -464,6 +674,14 @@ class __AudioBackend(QtCore.QObject):
         if self.stream is not None:
             self.stream.stop()
 
+        if self.source is not None:
+            self.source.pause()
+
     def restart(self):
         if self.stream is not None:
             self.stream.start()
+            # the frames captured during the pause are not counted
+            self.capture_origin = None
+
+        if self.source is not None:
+            self.source.start()
@@ -23,6 +23,10 @@ from friture.ringbuffer import RingBuffer
 
 FRAMES_PER_BUFFER = 1024
 
+# samples kept on top of what the widgets need, so that they can lag
+# behind the input by about 1.4 second at 48 kHz without losing data
+RINGBUFFER_HEADROOM = 2 ** 16
+
 
 class AudioBuffer(QtCore.QObject):
     new_data_available = QtCore.pyqtSignal(np.ndarray)
@@ -30,9 +34,11 @@ class AudioBuffer(QtCore.QObject):
     def __init__(self):
         super().__init__()
 
-        self.ringbuffer = RingBuffer()
+        self.ringbuffer = RingBuffer(headroom=RINGBUFFER_HEADROOM)
         self.newpoints = 0
         self.lastDataTime = 0.
+        # capture time of the newest sample, on the perf_counter clock, for the latency probes
+        self.lastCaptureTime = None
 
     def data(self, length):
         return self.ringbuffer.data(length)
@@ -49,8 +55,15 @@ class AudioBuffer(QtCore.QObject):
     def data_indexed(self, start, length):
         return self.ringbuffer.data_indexed(start, length)
 
-    def handle_new_data(self, floatdata, input_time, status):
+    def register_reader(self, length, step):
+        return self.ringbuffer.register_reader(length, step)
+
+    def unregister_reader(self, reader):
+        self.ringbuffer.unregister_reader(reader)
+
+    def handle_new_data(self, floatdata, input_time, status, capture_time=None):
         self.ringbuffer.push(floatdata)
         self.set_newdata(floatdata.shape[1])
+        self.lastCaptureTime = capture_time
         self.new_data_available.emit(floatdata)
         self.lastDataTime = input_time
@@ -19,9 +19,23 @@
 
 import logging
 
-from numpy import linspace, log10, cos, arange, pi
+from numpy import linspace, log10, cos, arange, pi, empty, multiply
 from numpy.fft import rfft
-from friture.audiobackend import SAMPLING_RATE
+from numpy.lib.stride_tricks import as_strided
+from friture.defaults import SAMPLING_RATE
+
+
+# compute psychoacoustic weighting. See http://en.wikipedia.org/wiki/A-weighting
+# returns the A, B and C weightings in dB for the frequencies f
+def frequency_weightings(f):
+    Rc = 12200. ** 2 * f ** 2 / ((f ** 2 + 20.6 ** 2) * (f ** 2 + 12200. ** 2))
+    Rb = 12200. ** 2 * f ** 3 / ((f ** 2 + 20.6 ** 2) * (f ** 2 + 12200. ** 2) * ((f ** 2 + 158.5 ** 2) ** 0.5))
+    Ra = 12200. ** 2 * f ** 4 / ((f ** 2 + 20.6 ** 2) * (f ** 2 + 12200. ** 2) * ((f ** 2 + 107.7 ** 2) ** 0.5) * ((f ** 2 + 737.9 ** 2) ** 0.5))
+    eps = 1e-50
+    C = 0.06 + 20. * log10(Rc + eps)
+    B = 0.17 + 20. * log10(Rb + eps)
+    A = 2.0 + 20. * log10(Ra + eps)
+    return A, B, C
 
 
 class audioproc():
@@ -35,10 +49,15 @@ class audioproc():
         self.C = 0. * self.freq
         self.maxfreq = 1.
         self.window = arange(0, 1)
+        # window converted to the type of the samples, by dtype
+        self.typed_windows = {}
         self.size_sq = 1.
 
         self.fft_size = 10
 
+        # reusable buffer for the windowed frames of the batched path
+        self.windowed_frames = empty((0, self.fft_size))
+
     def analyzelive(self, samples):
         # FFT for a linear transformation in frequency scale
         fft = rfft(samples * self.window)
@@ -46,6 +65,49 @@ class audioproc():
 
         return spectrum
 
+    # Compute the spectra of 'count' overlapping frames at once.
+    # 'samples' is a contiguous 1D array that covers all the frames: the first frame
+    # starts at samples[0], and each next frame starts 'step' samples later.
+    # The frames are taken as a strided view, windowed in a reusable buffer and
+    # transformed with a single rfft call, which avoids the Python overhead
+    # of one analyzelive call per frame.
+    # The result is written into 'out', of shape (count, fft_size/2 + 1), when given.
+    # The windowed frames and the result have the same floating type as 'samples',
+    # so that a single precision chain stays in single precision.
+    def analyzelive_batch(self, samples, count, step, out=None):
+        needed = self.fft_size + (count - 1) * step
+        if samples.shape[0] < needed:
+            raise ValueError("Not enough samples for %d frames: %d < %d" % (count, samples.shape[0], needed))
+
+        frames = as_strided(samples, shape=(count, self.fft_size), strides=(step * samples.strides[0], samples.strides[0]), writeable=False)
+
+        dtype = samples.dtype
+
+        if self.windowed_frames.shape[0] < count or self.windowed_frames.shape[1] != self.fft_size or self.windowed_frames.dtype != dtype:
+            self.windowed_frames = empty((count, self.fft_size), dtype=dtype)
+
+        windowed = self.windowed_frames[:count]
+        multiply(frames, self.typed_window(dtype), out=windowed)
+
+        fft = rfft(windowed, axis=-1)
+
+        if out is None:
+            out = empty(fft.shape, dtype=dtype)
+
+        # squared norm, without the temporaries of fft*fft.conjugate()
+        multiply(fft.real, fft.real, out=out)
+        out += fft.imag ** 2
+        out /= self.size_sq
+
+        return out
+
+    def typed_window(self, dtype):
+        window = self.typed_windows.get(dtype)
+        if window is None:
+            window = self.window.astype(dtype)
+            self.typed_windows[dtype] = window
+        return window
+
     def norm_square(self, fft):
         return (fft*fft.conjugate()).real / self.size_sq
 
@@ -78,6 +140,7 @@ class audioproc():
         n = arange(0, N)
         # Hann window : better frequency resolution than the rectangular window
         self.window = 0.5 * (1. - cos(2 * pi * n / (N - 1)))
+        self.typed_windows = {}
         self.logger.info("audioproc: updating window")
 
     def update_freq_cache(self):
@@ -85,15 +148,7 @@ class audioproc():
             self.logger.info("audioproc: updating self.freq cache")
             self.freq = linspace(0, SAMPLING_RATE // 2, self.fft_size // 2 + 1)
 
-            # compute psychoacoustic weighting. See http://en.wikipedia.org/wiki/A-weighting
-            f = self.freq
-            Rc = 12200. ** 2 * f ** 2 / ((f ** 2 + 20.6 ** 2) * (f ** 2 + 12200. ** 2))
-            Rb = 12200. ** 2 * f ** 3 / ((f ** 2 + 20.6 ** 2) * (f ** 2 + 12200. ** 2) * ((f ** 2 + 158.5 ** 2) ** 0.5))
-            Ra = 12200. ** 2 * f ** 4 / ((f ** 2 + 20.6 ** 2) * (f ** 2 + 12200. ** 2) * ((f ** 2 + 107.7 ** 2) ** 0.5) * ((f ** 2 + 737.9 ** 2) ** 0.5))
-            eps = 1e-50
-            self.C = 0.06 + 20. * log10(Rc + eps)
-            self.B = 0.17 + 20. * log10(Rb + eps)
-            self.A = 2.0 + 20. * log10(Ra + eps)
+            self.A, self.B, self.C = frequency_weightings(self.freq)
 
     # above is done a FFT of the signal. This is ok for linear frequency scale, but
     # not satisfying for logarithmic scale, which is much more adapted to voice or music
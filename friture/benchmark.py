@@ -0,0 +1,430 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2009 Timothée Lecomte
+
+# This file is part of Friture.
+#
+# Friture is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as published by
+# the Free Software Foundation.
+#
+# Friture is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Friture.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmarks of the processing paths of the widgets, the Cython kernels and the plotting data preparation.
+
+    friture benchmark --save baseline.json
+    friture benchmark --compare baseline.json [--filter octave]
+
+Each benchmark is a 'tick' function, timed over many calls. The result is
+given in nanoseconds per sample (audio samples for the widgets and the
+kernels, bars or bins for the plotting), with the peak of the memory
+allocated by one tick, as traced by tracemalloc."""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+# samples per tick: the analysis thread fetches the audio every 10 ms at 48 kHz
+TICK_SAMPLES = 480
+
+# each benchmark runs for at least this duration, after the warm-up ticks
+MIN_DURATION_S = 0.3
+WARMUP_TICKS = 20
+# ticks measured with tracemalloc, which is too slow for the timing
+ALLOCATION_TICKS = 5
+
+# a benchmark slower than the baseline by more than this ratio is reported as a regression
+DEFAULT_THRESHOLD = 1.25
+
+FFT_SIZES = [1024, 4096, 16384]
+BANDS_PER_OCTAVE = [1, 3, 6, 12, 24]
+CHANNELS = [1, 2]
+
+
+class Benchmark:
+
+    def __init__(self, name, samples, tick, after_tick=None):
+        self.name = name
+        # number of samples processed by each call of tick
+        self.samples = samples
+        self.tick = tick
+        # untimed cleanup after each tick
+        self.after_tick = after_tick
+
+
+def widget_benchmark(name, widget_class, channels, setup=None):
+    # widgets are driven exactly like in the application: the audio buffer
+    # receives the block and forwards it to the widget handle_new_data
+    from friture.audiobuffer import AudioBuffer
+
+    buffer = AudioBuffer()
+    widget = widget_class(None)
+    widget.set_buffer(buffer)
+    buffer.new_data_available.connect(widget.handle_new_data)
+
+    if setup is not None:
+        setup(widget)
+
+    rng = np.random.RandomState(0)
+    blocks = [0.1 * rng.randn(channels, TICK_SAMPLES) for i in range(16)]
+    state = {'i': 0}
+
+    def tick():
+        state['i'] = (state['i'] + 1) % len(blocks)
+        buffer.handle_new_data(blocks[state['i']], 0., False)
+
+    def after_tick():
+        # the results are not drawn, drop them so that the queued mailboxes do not grow
+        mailbox = getattr(widget, 'mailbox', None)
+        if mailbox is not None:
+            mailbox.clear()
+
+    # keep references to the Qt objects for the lifetime of the benchmark
+    tick.objects = (buffer, widget)
+
+    return Benchmark(name, TICK_SAMPLES * channels, tick, after_tick)
+
+
+def widget_benchmarks():
+    from friture.widgetdict import widgets
+    from friture.constantq import ANALYSIS_CQT
+
+    classes = {widget['Class'].__name__: widget['Class'] for widget in widgets}
+
+    # (name, widget class name, channels, setup)
+    cases = [("scope/%dch" % channels, 'Scope_Widget', channels, None) for channels in CHANNELS]
+
+    for fft_size in FFT_SIZES:
+        def setup(widget, fft_size=fft_size):
+            widget.setfftsize(fft_size)
+
+        def setup_dual(widget, fft_size=fft_size):
+            widget.setfftsize(fft_size)
+            widget.setdualchannels(True)
+
+        cases += [("spectrum/fft%d/1ch" % fft_size, 'Spectrum_Widget', 1, setup),
+                  ("spectrum/fft%d/2ch" % fft_size, 'Spectrum_Widget', 2, setup_dual),
+                  ("spectrogram/fft%d" % fft_size, 'Spectrogram_Widget', 1, setup)]
+
+    def setup_cqt(widget):
+        widget.setanalysis(ANALYSIS_CQT)
+
+    cases += [("spectrum/cqt", 'Spectrum_Widget', 1, setup_cqt),
+              ("spectrogram/cqt", 'Spectrogram_Widget', 1, setup_cqt)]
+
+    for bands in BANDS_PER_OCTAVE:
+        def setup(widget, bands=bands):
+            widget.setbandsperoctave(bands)
+
+        cases += [("octave/%dbands" % bands, 'OctaveSpectrum_Widget', 1, setup)]
+
+    cases += [("generator", 'Generator_Widget', 1, None),
+              ("delay_estimator/2ch", 'Delay_Estimator_Widget', 2, None),
+              ("longlevels", 'LongLevelWidget', 1, None)]
+
+    for name, class_name, channels, setup in cases:
+        yield name, lambda name, class_name=class_name, channels=channels, setup=setup: \
+            widget_benchmark(name, classes[class_name], channels, setup)
+
+
+def kernel_benchmarks():
+    from friture import generated_filters
+    from friture.signal.decimate import normalize_filter
+    from friture_extensions.exp_smoothing_conv import pyx_exp_smoothed_value
+    from friture_extensions.filterbank import pyx_sos_filter_bank_float64, pyx_polyphase_decimate_float64
+    from friture_extensions.lfilter import pyx_lfilter_1D
+    from friture_extensions.linear_interp import pyx_linear_interp_2D
+    from friture_extensions.lookup_table import pyx_color_from_float_2D, pyx_color_from_level_2D
+
+    n = 4096
+    rng = np.random.RandomState(0)
+
+    def lfilter(name, dtype):
+        b = np.array([0.2, 0.4, 0.2])
+        a = np.array([1., -0.3, 0.1])
+        x = rng.randn(n).astype(dtype)
+        zi = np.zeros(2)
+        return Benchmark(name, n, lambda: pyx_lfilter_1D(b, a, x, zi))
+
+    for dtype in [np.float64, np.float32]:
+        name = "kernel/lfilter/%s" % np.dtype(dtype).name
+        yield name, lambda name, dtype=dtype: lfilter(name, dtype)
+
+    def exp_smoothing(name):
+        kernel = 0.99 ** np.arange(n - 1, -1, -1)
+        x = rng.randn(n) ** 2
+        return Benchmark(name, n, lambda: pyx_exp_smoothed_value(kernel, 0.01, x, 0.))
+
+    yield "kernel/exp_smoothing", exp_smoothing
+
+    def sos_filter_bank(name, bands):
+        sos = np.ascontiguousarray(generated_filters.PARAMS['%d' % bands][0])
+        x = rng.randn(n)
+        zi = np.zeros((sos.shape[0], sos.shape[1], 2))
+        y = np.empty((sos.shape[0], n))
+        return Benchmark(name, n, lambda: pyx_sos_filter_bank_float64(sos, x, zi, y))
+
+    for bands in [3, 24]:
+        name = "kernel/sos_filter_bank/%dbands" % bands
+        yield name, lambda name, bands=bands: sos_filter_bank(name, bands)
+
+    def polyphase_decimate(name):
+        bdec, adec = normalize_filter(*generated_filters.PARAMS['dec'])
+        x = rng.randn(n)
+        zi = np.zeros(len(adec) - 1)
+        work = np.empty(n + len(adec) - 1)
+        y = np.empty(n // 2)
+        return Benchmark(name, n, lambda: pyx_polyphase_decimate_float64(bdec, adec, x, zi, 0, work, y))
+
+    yield "kernel/polyphase_decimate", polyphase_decimate
+
+    def linear_interp(name):
+        bins, columns = 1025, 8
+        out = np.empty((bins, columns))
+        data = rng.rand(bins)
+        old_data = rng.rand(bins)
+        return Benchmark(name, bins * columns, lambda: pyx_linear_interp_2D(out, data, old_data, 1., 0., 0.1, columns))
+
+    yield "kernel/linear_interp_2D", linear_interp
+
+    def color_lookup(name):
+        lut = np.arange(256, dtype=np.uint32)
+        values = rng.rand(1024, 8)
+        return Benchmark(name, values.size, lambda: pyx_color_from_float_2D(lut, values))
+
+    yield "kernel/color_from_float_2D", color_lookup
+
+    def level_color_lookup(name):
+        lut = np.arange(256, dtype=np.uint32)
+        levels = rng.uniform(-160., 0., (1024, 8))
+        out = np.empty((1024, 8), dtype=np.uint32)
+        return Benchmark(name, levels.size, lambda: pyx_color_from_level_2D(lut, levels[::-1, :], -140., 0., out))
+
+    yield "kernel/color_from_level_2D", level_color_lookup
+
+
+def plotting_benchmarks():
+    from friture.plotting.coordinateTransform import CoordinateTransform
+    from friture.plotting.quadsItem import QuadsItem, pre_tree_rebin, tree_rebin
+
+    def prepare_quads(name, bars):
+        item = QuadsItem((1., 0., 0.), (0., 0., 0.))
+        x = np.linspace(0., 1000., bars)
+        y = np.random.RandomState(0).rand(bars) * 500.
+        w = np.full(bars, 1000. / bars)
+        r, g, b = np.zeros(bars), np.zeros(bars), np.ones(bars)
+        return Benchmark(name, bars, lambda: item.prepareQuadData(x, y, w, 0., r, g, b))
+
+    # 1/3 and 1/24 octave bands, and a spectrum with one bar per pixel
+    for bars in [27, 216, 1000]:
+        name = "plot/prepareQuadData/%dbars" % bars
+        yield name, lambda name, bars=bars: prepare_quads(name, bars)
+
+    def rebin(name, fft_size):
+        # a logarithmic frequency axis, 1000 pixels wide
+        freq = np.linspace(0., 24000., fft_size // 2 + 1)
+        df = freq[1] - freq[0]
+        log_scale = lambda f: 1000. * np.log10(np.maximum(f, 20.) / 20.) / np.log10(1000.)
+        x1, x2, n = pre_tree_rebin(log_scale(freq - df / 2), log_scale(freq + df / 2))
+        ns = [0] + n
+        N = sum((ns[i + 1] - ns[i]) // 2 ** i for i in range(len(ns) - 1))
+        y = np.random.RandomState(0).rand(freq.shape[0])
+        return Benchmark(name, y.shape[0], lambda: tree_rebin(y, ns, N))
+
+    for fft_size in FFT_SIZES:
+        name = "plot/tree_rebin/fft%d" % fft_size
+        yield name, lambda name, fft_size=fft_size: rebin(name, fft_size)
+
+    def spectrum_bars(name, fft_size, instanced):
+        # the per-frame Python work of a spectrum on a logarithmic axis, 1000 pixels wide
+        xMap = CoordinateTransform(20., 24000., 1000, 0, 0)
+        xMap.setLogarithmic()
+        yMap = CoordinateTransform(-140., 0., 500, 0, 0)
+
+        freq = np.linspace(0., 24000., fft_size // 2 + 1)
+        df = freq[1] - freq[0]
+        y = np.random.RandomState(0).rand(freq.shape[0]) * -140.
+        item = QuadsItem((0., 0.3, 0.), (0., 0.5, 0.))
+        item.setData(np.maximum(freq - df / 2, 1e-10), freq + df / 2, y, (y + 140.) / 140.)
+
+        if instanced:
+            return Benchmark(name, y.shape[0], lambda: item.instanceValues(xMap, yMap))
+        return Benchmark(name, y.shape[0], lambda: item.vertexData(xMap, yMap))
+
+    for fft_size in FFT_SIZES:
+        for instanced in [False, True]:
+            name = "plot/spectrum_bars/%s/fft%d" % ("instanced" if instanced else "quads", fft_size)
+            yield name, lambda name, fft_size=fft_size, instanced=instanced: spectrum_bars(name, fft_size, instanced)
+
+
+def all_benchmarks():
+    # (name, factory) pairs, the benchmarks are only set up when they are run, by factory(name)
+    yield from widget_benchmarks()
+    yield from kernel_benchmarks()
+    yield from plotting_benchmarks()
+
+
+def measure(benchmark, min_duration=MIN_DURATION_S):
+    for i in range(WARMUP_TICKS):
+        benchmark.tick()
+        if benchmark.after_tick is not None:
+            benchmark.after_tick()
+
+    durations = []
+    start = time.perf_counter()
+    while time.perf_counter() - start < min_duration:
+        t0 = time.perf_counter()
+        benchmark.tick()
+        durations.append(time.perf_counter() - t0)
+        if benchmark.after_tick is not None:
+            benchmark.after_tick()
+
+    # peak of the memory allocated by one tick, without the memory allocated before
+    peaks = []
+    for i in range(ALLOCATION_TICKS):
+        tracemalloc.start()
+        benchmark.tick()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peaks.append(peak)
+        if benchmark.after_tick is not None:
+            benchmark.after_tick()
+
+    # the median is robust to the occasional preemption
+    tick_s = float(np.median(durations))
+
+    return {
+        'ns_per_sample': 1e9 * tick_s / benchmark.samples,
+        'us_per_tick': 1e6 * tick_s,
+        'alloc_bytes_per_tick': int(np.median(peaks)),
+        'ticks': len(durations),
+    }
+
+
+def run(name_filter=None, min_duration=MIN_DURATION_S):
+    logger = logging.getLogger(__name__)
+
+    results = {}
+    for name, make_benchmark in all_benchmarks():
+        if name_filter is not None and name_filter not in name:
+            continue
+
+        benchmark = make_benchmark(name)
+
+        results[benchmark.name] = measure(benchmark, min_duration)
+        logger.debug("%s: %s", benchmark.name, results[benchmark.name])
+        print(format_result(benchmark.name, results[benchmark.name]))
+        sys.stdout.flush()
+
+    return results
+
+
+def format_result(name, result, baseline=None):
+    line = "%-36s %10.2f ns/sample %10.1f us/tick %10.1f KiB/tick" % (
+        name, result['ns_per_sample'], result['us_per_tick'], result['alloc_bytes_per_tick'] / 1024.)
+
+    if baseline is not None:
+        line += "   x%.2f" % (result['ns_per_sample'] / baseline['ns_per_sample'])
+
+    return line
+
+
+def environment():
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL,
+                                         cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        'commit': commit,
+        'date': time.strftime("%Y-%m-%d %H:%M:%S"),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+    }
+
+
+def compare(baseline, results, threshold=DEFAULT_THRESHOLD):
+    """Print the results next to the baseline, and return the names of the benchmarks that regressed."""
+    print("\nComparison with the baseline of %s (commit %s):" % (baseline['environment']['date'],
+                                                                baseline['environment']['commit']))
+
+    regressions = []
+    for name, result in results.items():
+        reference = baseline['results'].get(name)
+        if reference is None:
+            print("%-36s (new)" % name)
+            continue
+
+        line = format_result(name, result, reference)
+        if result['ns_per_sample'] > threshold * reference['ns_per_sample']:
+            line += "  SLOWER"
+            regressions.append(name)
+        print(line)
+
+    return regressions
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="friture benchmark",
+                                     description="Benchmark the processing paths, and compare them to a baseline.")
+    parser.add_argument("--filter", "-k", default=None, help="only run the benchmarks whose name contains this string")
+    parser.add_argument("--save", default=None, metavar="JSON", help="save the results as a baseline")
+    parser.add_argument("--compare", default=None, metavar="JSON", help="compare the results to a saved baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="slowdown ratio reported as a regression (default: %(default)s)")
+    parser.add_argument("--duration", type=float, default=MIN_DURATION_S,
+                        help="minimum duration of each benchmark, in seconds (default: %(default)s)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    # the widgets are Qt objects, but nothing is shown
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5 import QtWidgets
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([sys.argv[0]])
+
+    baseline = None
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    results = run(args.filter, args.duration)
+
+    if args.save is not None:
+        with open(args.save, 'w') as f:
+            json.dump({'environment': environment(), 'results': results}, f, indent=2, sort_keys=True)
+        print("\nBaseline saved to %s" % args.save)
+
+    if baseline is not None:
+        regressions = compare(baseline, results, args.threshold)
+        if len(regressions) > 0:
+            print("\n%d benchmark(s) slower than x%.2f the baseline" % (len(regressions), args.threshold))
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2009 Timothée Lecomte
+
+# This file is part of Friture.
+#
+# Friture is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as published by
+# the Free Software Foundation.
+#
+# Friture is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Friture.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Constant-Q transform, for spectra with log-spaced frequency bins.
+
+The transform follows the efficient algorithm of Schörkhuber and Klapuri (2010):
+the sparse spectral kernel of Brown and Puckette (1992) is computed once for the
+highest octave, and applied to the FFT of successively decimated versions of the
+signal for the lower octaves. The FFT size is then set by the highest octave only,
+while a linear FFT would need a size of the order of Q * fs / minfreq to get
+the same resolution at low frequencies."""
+
+import logging
+
+from numpy import (arange, ceil, cos, concatenate, empty, exp, float64, log2,
+                   nonzero, pi, zeros, ascontiguousarray)
+from numpy.fft import fft, rfft
+
+from friture import generated_filters
+from friture.defaults import SAMPLING_RATE
+from friture.audioproc import frequency_weightings
+from friture.ringbuffer import RingBuffer
+from friture.signal.decimate import normalize_filter
+from friture.signal.sparse import CSRMatrix
+from friture_extensions.filterbank import pyx_polyphase_decimate_float64
+
+# analysis engines that the spectrum and spectrogram docks can select
+ANALYSIS_FFT = 0
+ANALYSIS_CQT = 1
+
+# spectral kernel coefficients smaller than this fraction of the largest one are dropped
+KERNEL_THRESHOLD = 0.0054
+
+# the decimation filter is flat up to 0.96 of the decimated Nyquist frequency,
+# so the kernels are kept below that limit
+MAX_RELATIVE_FREQUENCY = 0.45
+
+# the window of the lowest bins grows with the number of bins per octave,
+# these limits keep the time resolution acceptable for a live display
+MIN_BINS_PER_OCTAVE = 12
+MAX_BINS_PER_OCTAVE = 48
+
+
+def bins_per_octave_for_pixels(pixels, minfreq, maxfreq):
+    """Choose the number of bins per octave so that the bins match the pixels of a log-frequency axis."""
+    octaves = log2(max(maxfreq, 2. * minfreq) / minfreq)
+    bins = int(ceil(pixels / octaves))
+    return min(max(bins, MIN_BINS_PER_OCTAVE), MAX_BINS_PER_OCTAVE)
+
+
+class ConstantQTransform:
+
+    def __init__(self, minfreq, maxfreq, bins_per_octave, sampling_rate=SAMPLING_RATE):
+        self.logger = logging.getLogger(__name__)
+
+        self.sampling_rate = sampling_rate
+        self.bins_per_octave = bins_per_octave
+
+        maxfreq = min(maxfreq, MAX_RELATIVE_FREQUENCY * sampling_rate)
+        minfreq = min(max(minfreq, 1.), maxfreq / 2.)
+        self.n_octaves = int(ceil(log2(maxfreq / minfreq)))
+
+        # bins of the highest octave, the highest one just below maxfreq
+        top_freq = maxfreq * 2. ** (-arange(bins_per_octave, 0, -1) / float(bins_per_octave))
+        # all the bins, by increasing frequency, each octave being one octave below the next one
+        self.freq = concatenate([top_freq / 2 ** octave for octave in reversed(range(self.n_octaves))])
+
+        self.A, self.B, self.C = frequency_weightings(self.freq)
+
+        self.kernel, self.fft_size = self.spectral_kernel(top_freq)
+
+        # decimation chain, as in the octave filter bank
+        bdec, adec = generated_filters.PARAMS['dec']
+        self.bdec, self.adec = normalize_filter(bdec, adec)
+        order = len(self.adec) - 1
+        self.zdec = zeros((self.n_octaves - 1, order))
+        self.phases = [0] * (self.n_octaves - 1)
+
+        # history of the (decimated) signal of each octave, for the frames
+        self.histories = [RingBuffer(headroom=2 * self.fft_size) for octave in range(self.n_octaves)]
+
+        # number of input samples processed
+        self.offset = 0
+
+        self.logger.info("Constant-Q transform: %d octaves, %d bins per octave, FFT size %d, %d kernel coefficients",
+                         self.n_octaves, bins_per_octave, self.fft_size, self.kernel.nnz())
+
+    def spectral_kernel(self, top_freq):
+        # quality factor such that neighbouring bins overlap at their -6 dB points
+        Q = 1. / (2. ** (1. / self.bins_per_octave) - 1.)
+        lengths = ceil(Q * self.sampling_rate / top_freq).astype(int)
+        fft_size = 2 ** int(ceil(log2(lengths.max())))
+        n_spectrum = fft_size // 2 + 1
+
+        rows = []
+        for f, length in zip(top_freq, lengths):
+            # Hann-windowed complex exponential, aligned on the end of the frame so that
+            # the short kernels of the high frequencies react quickly.
+            # It is normalized so that a sine gets the same power as with the FFT spectrum.
+            n = arange(length)
+            window = 0.5 * (1. - cos(2. * pi * n / length))
+            temporal = zeros(fft_size, dtype=complex)
+            temporal[fft_size - length:] = window / length * exp(2j * pi * f * n / self.sampling_rate)
+
+            # correlation with the atom, from the positive frequencies of the frame spectrum only:
+            # the negative frequencies of the atom are negligible
+            spectral = fft(temporal)[:n_spectrum].conj() / fft_size
+
+            magnitude = abs(spectral)
+            columns = nonzero(magnitude >= KERNEL_THRESHOLD * magnitude.max())[0]
+            rows.append((columns, spectral[columns]))
+
+        return CSRMatrix.from_rows(rows, n_spectrum), fft_size
+
+    def get_freq_scale(self):
+        return self.freq
+
+    def get_freq_weighting(self):
+        return self.A, self.B, self.C
+
+    def process(self, samples, count, step):
+        """Return the power spectra of 'count' frames, as an array of shape (count, bins).
+
+        'samples' holds count * step new samples, contiguous with the samples of the previous call,
+        and the frames end every 'step' samples. The power is normalized as for audioproc."""
+
+        x = ascontiguousarray(samples, dtype=float64)
+        first_end = self.offset + step
+        self.offset += x.shape[0]
+
+        for octave in range(self.n_octaves):
+            self.histories[octave].push(x.reshape((1, -1)))
+
+            if octave < self.n_octaves - 1 and x.shape[0] > 0:
+                order = len(self.adec) - 1
+                work = empty(x.shape[0] + order)
+                x_dec = empty((x.shape[0] + 1) // 2)
+                n, self.phases[octave] = pyx_polyphase_decimate_float64(self.bdec, self.adec, x, self.zdec[octave],
+                                                                        self.phases[octave], work, x_dec)
+                x = x_dec[:n]
+
+        ends = first_end + step * arange(count)
+        frame = arange(self.fft_size)
+        spectra = empty((count, len(self.freq)))
+
+        for octave in range(self.n_octaves):
+            # number of decimated samples before each frame end, with the even input samples kept at each stage
+            ends_octave = (ends + 2 ** octave - 1) // 2 ** octave
+            span = int(ends_octave[-1] - ends_octave[0]) + self.fft_size
+            data = self.histories[octave].data_indexed(int(ends_octave[-1]), span)[0]
+
+            frames = data[(ends_octave - ends_octave[0])[:, None] + frame]
+            cq = self.kernel.apply(rfft(frames, axis=-1))
+
+            start = (self.n_octaves - 1 - octave) * self.bins_per_octave
+            spectra[:, start:start + self.bins_per_octave] = cq.real ** 2 + cq.imag ** 2
+
+        return spectra
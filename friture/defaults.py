@@ -1,3 +1,8 @@
+# the sample rate below should be dynamic, taken from PyAudio/PortAudio
+# kept here, without any dependency, so that the headless analysis does not load the audio backend
+SAMPLING_RATE = 48000
+FRAMES_PER_BUFFER = 512
+
 DEFAULT_DOCKS = [2,  # FFT Spectrum,
                  3,  # spectrogram
                  4]  # octave spectrum
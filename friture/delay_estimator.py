@@ -211,6 +211,11 @@ class Delay_Estimator_Widget(QtWidgets.QWidget):
                 x = (slope * x) ** p
                 self.correlation = int((x / (1. + x)) * 100)
 
+    def resync(self):
+        # the correlation windows and their smoothing start over from the newest samples
+        self.old_index = self.ringbuffer0.offset
+        self.old_Xcorr = None
+
     # method
     def canvasUpdate(self):
         if not self.isVisible():
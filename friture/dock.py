@@ -17,9 +17,13 @@
 # You should have received a copy of the GNU General Public License
 # along with Friture.  If not, see <http://www.gnu.org/licenses/>.
 
-from PyQt5 import QtWidgets
+import logging
+
+from PyQt5 import QtCore, QtWidgets
 from friture.widgetdict import getWidgetById, widgetIds
 from friture.controlbar import ControlBar
+from friture.instrumentation import Instrumentation, LatencyProbe
+from friture.framescheduler import QUALITY_LEVELS
 
 
 class Dock(QtWidgets.QWidget):
@@ -27,6 +31,8 @@ class Dock(QtWidgets.QWidget):
     def __init__(self, parent, name, widgetId=None):
         super().__init__(parent)
 
+        self.logger = logging.getLogger(__name__)
+
         self.dockmanager = parent.dockmanager
         self.audiobuffer = parent.audiobuffer
 
@@ -47,10 +53,23 @@ class Dock(QtWidgets.QWidget):
         # self.setWidget(self.dockwidget)
 
         self.audiowidget = None
+        self.handle_new_data = None
+
+        # the docks that are not shown are suspended: their widget does not process the audio
+        self.active = True
+
+        # lowered by the frame scheduler when the processing and the display are over budget
+        self.quality_level = 0
+        self.display_ticks = 0
+
         self.widget_select(widgetId)
 
     # note that by default the closeEvent is accepted, no need to do it explicitely
     def closeEvent(self, event):
+        # let the audio widget release its resources (shared analysis for example)
+        if self.audiowidget is not None:
+            self.audiobuffer.new_data_available.disconnect(self.handle_new_data)
+            self.audiowidget.close()
         self.dockmanager.close_dock(self)
 
     def closeClicked(self, checked):
@@ -66,6 +85,7 @@ class Dock(QtWidgets.QWidget):
     # slot
     def widget_select(self, widgetId):
         if self.audiowidget is not None:
+            self.audiobuffer.new_data_available.disconnect(self.handle_new_data)
             self.audiowidget.close()
             self.audiowidget.deleteLater()
 
@@ -73,18 +93,107 @@ class Dock(QtWidgets.QWidget):
             widgetId = widgetIds()[0]
 
         self.widgetId = widgetId
+        # name of the timing histograms of this dock in the statistics, also used by the canvas paint events
+        self.instrumentation_name = "%s (%s)" % (self.objectName(), getWidgetById(widgetId)["Name"])
+        self.latency_probe = LatencyProbe(self.instrumentation_name)
         self.audiowidget = getWidgetById(widgetId)["Class"](self)
         self.audiowidget.set_buffer(self.audiobuffer)
-        self.audiobuffer.new_data_available.connect(self.audiowidget.handle_new_data)
+        # direct connection: the processing runs in the analysis thread, where the audio buffer lives,
+        # and the widget hands its results over to canvasUpdate through a mailbox
+        timed_handle_new_data = Instrumentation().timed_call(self.instrumentation_name, "handle_new_data",
+                                                             self.audiowidget.handle_new_data)
+
+        def handle_new_data(floatdata):
+            # the widgets that record a history keep processing when not shown, only their display is suspended
+            if self.active or self.records_history:
+                timed_handle_new_data(floatdata)
+
+        self.handle_new_data = handle_new_data
+        self.audiobuffer.new_data_available.connect(self.handle_new_data, QtCore.Qt.DirectConnection)
 
         self.layout.addWidget(self.audiowidget)
 
+        self.apply_quality()
+
         index = widgetIds().index(widgetId)
         self.control_bar.combobox_select.setCurrentIndex(index)
 
+    def is_shown(self):
+        # not hidden, not in a minimized window, and not scrolled or covered out of view
+        return self.isVisible() and not self.window().isMinimized() and not self.visibleRegion().isEmpty()
+
+    def update_activity(self):
+        shown = self.is_shown()
+        if shown and not self.active:
+            self.resume()
+        elif not shown and self.active:
+            self.suspend()
+
+    def suspend(self):
+        self.logger.info("%s is not shown, suspending its processing", self.objectName())
+        self.active = False
+
+        suspend = getattr(self.audiowidget, "suspend", None)
+        if suspend is not None:
+            suspend()
+
+    def resume(self):
+        self.logger.info("%s is shown again, resuming its processing", self.objectName())
+
+        # results from before the suspension are stale
+        # (cleared first, the widgets that record a history are still posting)
+        mailbox = getattr(self.audiowidget, "mailbox", None)
+        if mailbox is not None:
+            mailbox.clear()
+
+        # the widget jumps to the newest samples rather than processing the backlog,
+        # and its smoothing starts over
+        resync = getattr(self.audiowidget, "resync", None)
+        if resync is not None:
+            resync()
+
+        self.active = True
+
+    @property
+    def records_history(self):
+        return getattr(self.audiowidget, "records_history", False)
+
+    def set_quality_level(self, level):
+        self.quality_level = level
+        self.apply_quality()
+
+    def apply_quality(self):
+        quality = QUALITY_LEVELS[self.quality_level]
+
+        # the widgets that have STFT frames or an adjustable display resolution can be degraded further
+        set_overlap = getattr(self.audiowidget, "set_overlap", None)
+        if set_overlap is not None:
+            # the overlap sets the period of the columns, changing it would start the history over
+            if self.records_history:
+                set_overlap(QUALITY_LEVELS[0].overlap)
+            else:
+                set_overlap(quality.overlap)
+
+        set_display_resolution = getattr(self.audiowidget, "set_display_resolution", None)
+        if set_display_resolution is not None:
+            set_display_resolution(quality.resolution_divider)
+
     def canvasUpdate(self):
-        if self.audiowidget is not None:
-            self.audiowidget.canvasUpdate()
+        self.update_activity()
+
+        # at lower quality levels, the dock is drawn on one tick out of display_divider
+        self.display_ticks += 1
+        if self.display_ticks % QUALITY_LEVELS[self.quality_level].display_divider != 0:
+            return
+
+        if self.audiowidget is not None and self.active:
+            with Instrumentation().timed(self.instrumentation_name, "canvasUpdate"):
+                self.audiowidget.canvasUpdate()
+
+            # the latency is recorded when the canvas is painted with the newest result
+            mailbox = getattr(self.audiowidget, "mailbox", None)
+            if mailbox is not None:
+                self.latency_probe.drawn(mailbox.capture_time)
 
     def pause(self):
         if self.audiowidget is not None:
@@ -0,0 +1,269 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2009 Timothée Lecomte
+
+# This file is part of Friture.
+#
+# Friture is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as published by
+# the Free Software Foundation.
+#
+# Friture is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Friture.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Audio input played from a memory-mapped WAV or raw PCM file, instead of a device."""
+
+import logging
+import os
+import struct
+import time
+
+import numpy as np
+
+# speed value that plays the file as fast as the analysis can follow
+SPEED_UNLIMITED = 0.
+
+# number of frames emitted at once when the playback is not paced
+UNLIMITED_BLOCK_SIZE = 8192
+
+# longest block emitted at once when the playback is paced, in seconds of audio
+# (after a long stall, the playback is delayed rather than flooding the analysis)
+MAX_BLOCK_DURATION = 1.
+
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_IEEE_FLOAT = 3
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# 24-bit samples have no numpy type, they are mapped as 3-byte records and decoded by decode_samples()
+PCM24 = np.dtype('V3')
+
+# numpy type of the samples, by (format, bits per sample)
+WAVE_DTYPES = {
+    (WAVE_FORMAT_PCM, 8): np.dtype('u1'),
+    (WAVE_FORMAT_PCM, 16): np.dtype('<i2'),
+    (WAVE_FORMAT_PCM, 24): PCM24,
+    (WAVE_FORMAT_PCM, 32): np.dtype('<i4'),
+    (WAVE_FORMAT_IEEE_FLOAT, 32): np.dtype('<f4'),
+    (WAVE_FORMAT_IEEE_FLOAT, 64): np.dtype('<f8'),
+}
+
+
+def parse_wav_header(path):
+    """Return (dtype, channels, sampling_rate, data_offset, data_size) of a WAV file."""
+    with open(path, 'rb') as f:
+        riff, size, wave = struct.unpack('<4sI4s', f.read(12))
+        if riff != b'RIFF' or wave != b'WAVE':
+            raise ValueError("%s is not a WAV file" % path)
+
+        fmt = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError("%s has no data chunk" % path)
+            chunk_id, chunk_size = struct.unpack('<4sI', header)
+
+            if chunk_id == b'fmt ':
+                fmt = f.read(chunk_size)
+                f.seek(chunk_size % 2, os.SEEK_CUR)
+            elif chunk_id == b'data':
+                data_offset = f.tell()
+                break
+            else:
+                # chunks are padded to an even size
+                f.seek(chunk_size + chunk_size % 2, os.SEEK_CUR)
+
+    if fmt is None:
+        raise ValueError("%s has no format chunk" % path)
+
+    format_tag, channels, sampling_rate, byte_rate, block_align, bits = struct.unpack('<HHIIHH', fmt[:16])
+    if format_tag == WAVE_FORMAT_EXTENSIBLE:
+        # the actual format is at the start of the sub-format GUID
+        format_tag = struct.unpack('<H', fmt[24:26])[0]
+
+    dtype = WAVE_DTYPES.get((format_tag, bits))
+    if dtype is None:
+        raise ValueError("%s: unsupported WAV format %d with %d bits per sample" % (path, format_tag, bits))
+
+    # the size in the header can be wrong for files that were not closed properly
+    data_size = min(chunk_size, os.path.getsize(path) - data_offset)
+
+    return dtype, channels, sampling_rate, data_offset, data_size
+
+
+def parse_raw_format(raw_format):
+    """Parse a raw PCM format given as 'dtype:channels:rate', for example 'int16:2:48000' or 'int24:1:96000'."""
+    try:
+        dtype, channels, sampling_rate = raw_format.split(':')
+        dtype = PCM24 if dtype == 'int24' else np.dtype(dtype).newbyteorder('<')
+        return dtype, int(channels), int(sampling_rate)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid raw format '%s', expected dtype:channels:rate, for example int16:2:48000" % raw_format)
+
+
+def map_samples(path, dtype, channels, offset, size):
+    """Memory-map the samples of a file, as an array of shape (frames, channels)."""
+    frames = size // (dtype.itemsize * channels)
+    if frames == 0:
+        raise ValueError("%s contains no audio" % path)
+    return np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(frames, channels))
+
+
+def decode_samples(samples):
+    """Return the samples as a numeric array: 24-bit samples are decoded to int32 (in the top 24 bits), the others are returned as is."""
+    if samples.dtype != PCM24:
+        return samples
+    raw = np.ascontiguousarray(samples).view(np.uint8).reshape(samples.shape + (3,))
+    padded = np.zeros(samples.shape + (4,), dtype=np.uint8)
+    padded[..., 1:] = raw
+    return padded.view('<i4')[..., 0]
+
+
+def sample_conversion(dtype):
+    """Return (offset, scale) that convert the decoded samples to [-1, 1): (sample - offset) * scale."""
+    dtype = decode_samples(np.zeros(0, dtype=dtype)).dtype
+    if dtype.kind == 'u':
+        offset = 2. ** (8 * dtype.itemsize - 1)
+        return offset, 1. / offset
+    elif dtype.kind == 'i':
+        return 0., 2. ** -(8 * dtype.itemsize - 1)
+    return 0., 1.
+
+
+class PacedSource:
+    """Base of the sources played instead of the input device.
+
+    The playback is paced on the wall clock at 'speed' times real time,
+    or is as fast as possible with SPEED_UNLIMITED. The subclasses provide
+    read_available(), read_buffers() and is_finished()."""
+
+    # conversion of the samples to [-1, 1): (sample - offset) * scale
+    offset = 0.
+    scale = 1.
+
+    # frames emitted at once by the subclasses that play whole blocks, never held back by MAX_BLOCK_DURATION
+    block_size = 0
+
+    def __init__(self, sampling_rate, speed):
+        self.sampling_rate = sampling_rate
+        self.speed = speed
+
+        # number of frames played since the start
+        self.played = 0
+
+        # wall-clock reference of the pacing, None when paused
+        self.clock_start = None
+        self.clock_played = 0
+
+    def close(self):
+        pass
+
+    def start(self):
+        self.clock_start = time.perf_counter()
+        self.clock_played = self.played
+
+    def pause(self):
+        self.clock_start = None
+
+    def frames_due(self, unlimited_count):
+        # number of frames to play now, or unlimited_count when the playback is not paced
+        if self.clock_start is None:
+            return 0
+
+        if self.speed == SPEED_UNLIMITED:
+            return unlimited_count
+
+        elapsed = time.perf_counter() - self.clock_start
+        count = self.clock_played + int(elapsed * self.speed * self.sampling_rate) - self.played
+        max_count = max(int(MAX_BLOCK_DURATION * self.speed * self.sampling_rate), self.block_size)
+        if count > max_count:
+            # shift the clock reference, so that the playback resumes from here
+            self.clock_played -= count - max_count
+            count = max_count
+
+        return max(count, 0)
+
+    def advance_read_index(self, count):
+        self.played += count
+
+    def get_time(self):
+        # time of the end of the last block, in seconds
+        return self.played / float(self.sampling_rate)
+
+    def get_capture_time(self):
+        # wall-clock time at which the last played frame was due, on the perf_counter clock,
+        # as if it had been captured by a device
+        if self.clock_start is None or self.speed == SPEED_UNLIMITED:
+            return time.perf_counter()
+        return self.clock_start + (self.played - self.clock_played) / (self.speed * self.sampling_rate)
+
+
+class FileSource(PacedSource):
+    """Plays a file as if it was recorded live.
+
+    The file is memory-mapped, and read_buffers() returns views on it,
+    so that the only copy is the channel selection done by the backend
+    (24-bit samples are decoded into a copy)."""
+
+    def __init__(self, path, speed=1., loop=False, raw_format=None):
+        self.logger = logging.getLogger(__name__)
+
+        if raw_format is None:
+            dtype, channels, sampling_rate, offset, size = parse_wav_header(path)
+        else:
+            dtype, channels, sampling_rate = parse_raw_format(raw_format)
+            offset, size = 0, os.path.getsize(path)
+
+        super().__init__(sampling_rate, speed)
+
+        self.name = os.path.basename(path)
+        self.data = map_samples(path, dtype, channels, offset, size)
+        self.loop = loop
+
+        self.offset, self.scale = sample_conversion(dtype)
+        frames = self.data.shape[0]
+
+        # index of the next frame to play in the file
+        self.position = 0
+
+        self.logger.info("Playing '%s': %d channels, %d Hz, %.1f s, %s",
+                         path, channels, sampling_rate, frames / float(sampling_rate), dtype.name)
+
+    def close(self):
+        self.data = None
+
+    def get_nchannels(self):
+        return self.data.shape[1]
+
+    def is_finished(self):
+        return not self.loop and self.position >= self.data.shape[0]
+
+    def read_available(self):
+        if self.data is None:
+            return 0
+
+        count = self.frames_due(UNLIMITED_BLOCK_SIZE)
+
+        if self.loop:
+            return min(count, self.data.shape[0])
+        else:
+            return min(count, self.data.shape[0] - self.position)
+
+    def read_buffers(self, count):
+        """Return (count, buffer1, buffer2), two views on the file of shape (frames, channels).
+
+        buffer2 is only non-empty when the playback wraps around at the end of the file."""
+        buffer1 = self.data[self.position:self.position + count]
+        buffer2 = self.data[:count - buffer1.shape[0]]
+        return count, decode_samples(buffer1), decode_samples(buffer2)
+
+    def advance_read_index(self, count):
+        super().advance_read_index(count)
+        self.position += count
+        if self.loop:
+            self.position %= self.data.shape[0]
@@ -1,7 +1,8 @@
 # -*- coding: utf-8 -*-
-from numpy import arange, sqrt, zeros, array
+from numpy import arange, sqrt, zeros, empty, array, ascontiguousarray, float64
 from friture_extensions.lfilter import pyx_lfilter_float64_1D
-from .signal.decimate import decimate
+from friture_extensions.filterbank import pyx_sos_filter_bank_float64, pyx_polyphase_decimate_float64
+from .signal.decimate import decimate, normalize_filter
 
 NOCTAVE = 9
 
@@ -130,3 +131,78 @@ def octave_filter_bank_decimation_filtic(blow, alow, forward, feedback):
         zfs += [zeros(l)]
 
     return zfs
+
+
+class OctaveFilterBank:
+    """Block-based octave filter bank, with one decimation by 2 per octave.
+
+    All the bands of an octave are evaluated together as cascaded second-order sections
+    in one compiled call, and the decimators do not compute the discarded samples.
+    The state of all the filters is kept in contiguous arrays, so that consecutive
+    blocks are filtered seamlessly.
+
+    The bands are ordered by increasing frequency, like octave_filter_bank_decimation.
+    The returned outputs are views on preallocated buffers, valid until the next call."""
+
+    def __init__(self, blow, alow, sos):
+        # sos has shape (bands_per_octave, n_sections, 6), as generated by filter_design.py
+        self.sos = ascontiguousarray(sos, dtype=float64)
+        self.bands_per_octave = self.sos.shape[0]
+        self.filter_count = NOCTAVE * self.bands_per_octave
+
+        self.bdec, self.adec = normalize_filter(blow, alow)
+
+        n_sections = self.sos.shape[1]
+        self.zi = zeros((NOCTAVE, self.bands_per_octave, n_sections, 2))
+        self.zdec = zeros((NOCTAVE - 1, len(self.adec) - 1))
+        self.phases = [0] * (NOCTAVE - 1)
+
+        self.dec = [2 ** j for j in range(NOCTAVE)[::-1] for i in range(self.bands_per_octave)]
+
+        self.capacity = 0
+        self.allocate(4096)
+
+    def reset(self):
+        # start over from a silent input, for a discontinuous signal
+        self.zi[:] = 0.
+        self.zdec[:] = 0.
+        self.phases = [0] * (NOCTAVE - 1)
+
+    def allocate(self, capacity):
+        # preallocated outputs and work buffers, for inputs up to capacity samples
+        self.capacity = capacity
+        self.outputs = []
+        self.decimated = []
+        lengths = [capacity]
+        for j in range(NOCTAVE):
+            self.outputs += [empty((self.bands_per_octave, lengths[j]))]
+            if j < NOCTAVE - 1:
+                lengths += [lengths[j] // 2 + 1]
+                self.decimated += [empty(lengths[j + 1])]
+        self.work = empty(capacity + len(self.adec) - 1)
+
+    def filter(self, x):
+        '''filter the block x, and return the bands outputs and their decimation factors'''
+        if len(x) > self.capacity:
+            self.allocate(2 * len(x))
+
+        x_dec = ascontiguousarray(x, dtype=float64)
+
+        y = [None] * self.filter_count
+
+        for j in range(NOCTAVE):
+            n = len(x_dec)
+            out = self.outputs[j]
+            pyx_sos_filter_bank_float64(self.sos, x_dec, self.zi[j], out)
+
+            k = (NOCTAVE - 1 - j) * self.bands_per_octave
+            for i in range(self.bands_per_octave):
+                y[k + i] = out[i, :n]
+
+            # the lowest octave is not decimated further
+            if j < NOCTAVE - 1:
+                count, self.phases[j] = pyx_polyphase_decimate_float64(self.bdec, self.adec, x_dec, self.zdec[j],
+                                                                       self.phases[j], self.work, self.decimated[j])
+                x_dec = self.decimated[j][:count]
+
+        return y, self.dec
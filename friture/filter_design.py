@@ -1,5 +1,5 @@
 # -*- coding: utf-8 -*-
-from numpy import pi, exp, arange, cos, sin, sqrt, zeros, ones, log, arange, set_printoptions
+from numpy import pi, exp, arange, cos, sin, sqrt, zeros, ones, log, arange, set_printoptions, array, concatenate, savez
 # the three following lines are a workaround for a bug with scipy and py2exe
 # together. See http://www.pyinstaller.org/ticket/83 for reference.
 from scipy.special import factorial
@@ -18,7 +18,7 @@ sys.path.insert(0, '.')
 from friture.filter import (octave_frequencies, octave_filter_bank,
                             octave_filter_bank_decimation, NOCTAVE)
 
-from friture.audiobackend import SAMPLING_RATE
+from friture.defaults import SAMPLING_RATE
 
 # bank of filters for any other kind of frequency scale
 # http://cobweb.ecn.purdue.edu/~malcolm/apple/tr35/PattersonsEar.pdf
@@ -162,9 +162,32 @@ def octave_filters_oneoctave(total_band_count, bands_per_octave):
     return [B, A, fi, f_low, f_high]
 
 
+def octave_filters_oneoctave_sos(total_band_count, bands_per_octave):
+    # same filters as octave_filters_oneoctave, as cascaded second-order sections
+    pbrip = .5      # Pass band ripple
+    sbrip = 50      # Stop band rejection
+    # Filter order
+    order = 2
+
+    fi, f_low, f_high = octave_frequencies(total_band_count, bands_per_octave)
+
+    fi = fi[-bands_per_octave:]
+    f_low = f_low[-bands_per_octave:]
+    f_high = f_high[-bands_per_octave:]
+
+    fs = SAMPLING_RATE
+    w_low = f_low / (fs / 2.)
+    w_high = f_high / (fs / 2.)
+    w_high = (w_high < 1.) * w_high + (w_high >= 1.) * 1.
+
+    # (bands_per_octave, n_sections, 6)
+    sos = array([ellip(order, pbrip, sbrip, [wl, wh], btype='bandpass', output='sos') for wl, wh in zip(w_low, w_high)])
+
+    return [sos, fi, f_low, f_high]
+
+
 def generate_filters_params():
     import os
-    import json
 
     params = {}
 
@@ -182,30 +205,28 @@ def generate_filters_params():
 
     # set_printoptions(precision=24)
 
-    params['dec'] = [bdec.tolist(), adec.tolist()]
+    # the decimator is kept in transfer function form, for the polyphase decimation
+    params['dec'] = array([bdec, adec])
 
     # generate the octave filters
-    for bands_per_octave in [1, 3, 6, 12, 24]:
+    # the bands of all the resolutions are stacked, so that the artifact holds a few arrays only
+    bands_per_octave_list = [1, 3, 6, 12, 24]
+    sos_list = []
+    freqs_list = []
+    for bands_per_octave in bands_per_octave_list:
         total_band_count = NOCTAVE * bands_per_octave
-        [boct, aoct, fi, flow, fhigh] = octave_filters_oneoctave(total_band_count, bands_per_octave)
-        params['%d' % bands_per_octave] = [boct, aoct, fi.tolist(), flow.tolist(), fhigh.tolist()]
-
-    out = """\
-# Filters parameters generated from filter_design.py
-
-import json
-
-JSON_PARAMS = \"\"\"
-%s
-\"\"\"
+        [sos, fi, flow, fhigh] = octave_filters_oneoctave_sos(total_band_count, bands_per_octave)
+        sos_list += [sos]
+        freqs_list += [array([fi, flow, fhigh]).T]
 
-PARAMS = json.loads(JSON_PARAMS)
-""" % json.dumps(params, indent=4, sort_keys=True)  # repr(params)
+    params['bands_per_octave'] = array(bands_per_octave_list)
+    params['sos'] = concatenate(sos_list)
+    params['freqs'] = concatenate(freqs_list)
 
+    # compact binary artifact, loaded by generated_filters.py
     path = os.path.dirname(__file__)
-    fname = os.path.join(path, 'generated_filters.py')
-    with open(fname, 'w') as output:
-        output.write(out)
+    fname = os.path.join(path, 'generated_filters.npz')
+    savez(fname, **params)
 
 # main() is a test function
 
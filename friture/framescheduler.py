@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2009 Timothée Lecomte
+
+# This file is part of Friture.
+#
+# Friture is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as published by
+# the Free Software Foundation.
+#
+# Friture is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Friture.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Frame budget scheduler.
+
+The time spent in the processing and in the display is read from the
+instrumentation histograms. When it does not fit in the budget, the quality
+of the most expensive dock is lowered by one step, and when the load has
+been low for a while, the quality of the last degraded dock is restored."""
+
+import logging
+from time import perf_counter
+
+from friture.instrumentation import Instrumentation
+
+# fraction of the time that the processing and the display may use
+# (the analysis thread and the GUI thread share the interpreter lock, so one core at most)
+LOAD_BUDGET = 0.8
+# below this load, the quality is restored, after RESTORE_EVALUATIONS consecutive evaluations
+RESTORE_LOAD = 0.5
+RESTORE_EVALUATIONS = 5
+
+# metrics that make the load: the analysis tick includes the processing of all the docks
+BUSY_METRICS = ["fetchAudioData", "canvasUpdate", "paint"]
+DOCK_METRICS = ["handle_new_data", "canvasUpdate", "paint"]
+
+
+class Quality:
+
+    def __init__(self, display_divider, overlap, resolution_divider):
+        # the dock is drawn on one display tick out of display_divider
+        self.display_divider = display_divider
+        # overlap of the STFT frames
+        self.overlap = overlap
+        # the display resolution (points, constant-Q bins) is divided by resolution_divider
+        self.resolution_divider = resolution_divider
+
+
+# degradation steps, in order: lower display rate, then less STFT overlap, then coarser display
+QUALITY_LEVELS = [Quality(1, 3. / 4., 1),
+                  Quality(2, 3. / 4., 1),
+                  Quality(4, 3. / 4., 1),
+                  Quality(4, 1. / 2., 1),
+                  Quality(4, 0., 1),
+                  Quality(4, 0., 2),
+                  Quality(4, 0., 4)]
+
+
+def effective_quality(dock, level):
+    # the docks that record a history keep the overlap of the first level, since it sets the period of the columns
+    quality = QUALITY_LEVELS[level]
+    overlap = QUALITY_LEVELS[0].overlap if getattr(dock, "records_history", False) else quality.overlap
+    return (quality.display_divider, overlap, quality.resolution_divider)
+
+
+def next_quality_level(dock, step):
+    """Return the next level in the direction of step (+1 to degrade, -1 to restore) that changes the dock, or None."""
+    current = effective_quality(dock, dock.quality_level)
+    level = dock.quality_level + step
+    while 0 <= level < len(QUALITY_LEVELS):
+        if effective_quality(dock, level) != current:
+            return level
+        level += step
+    return None
+
+
+class FrameScheduler:
+
+    def __init__(self, dockmanager):
+        self.logger = logging.getLogger(__name__)
+
+        self.dockmanager = dockmanager
+
+        self.last_time = perf_counter()
+        self.last_totals = {}
+
+        self.low_load_evaluations = 0
+        # degraded docks, the last one is restored first
+        self.degraded = []
+
+        self.load = 0.
+
+    def busy_time(self, totals, source=None, metrics=BUSY_METRICS):
+        busy = 0.
+        for (histogram_source, metric), total in totals.items():
+            if metric in metrics and (source is None or histogram_source == source):
+                # the histograms are reset when the input changes or from the statistics
+                previous = self.last_totals.get((histogram_source, metric), 0.)
+                busy += total - previous if total >= previous else total
+        return busy
+
+    # slot
+    def evaluate(self):
+        now = perf_counter()
+        elapsed = now - self.last_time
+
+        totals = {(source, metric): histogram.total for source, metric, histogram in Instrumentation().summary()
+                  if metric in BUSY_METRICS or metric in DOCK_METRICS}
+
+        self.load = self.busy_time(totals) / elapsed if elapsed > 0. else 0.
+
+        dock_costs = {dock: self.busy_time(totals, dock.instrumentation_name, DOCK_METRICS)
+                      for dock in self.dockmanager.docks if dock.active}
+
+        self.last_time = now
+        self.last_totals = totals
+
+        if self.load > LOAD_BUDGET:
+            self.low_load_evaluations = 0
+            self.degrade(dock_costs)
+        elif self.load < RESTORE_LOAD:
+            self.low_load_evaluations += 1
+            if self.low_load_evaluations >= RESTORE_EVALUATIONS:
+                self.low_load_evaluations = 0
+                self.restore()
+        else:
+            self.low_load_evaluations = 0
+
+    def degrade(self, dock_costs):
+        # the levels that would not change a dock are skipped, so that each evaluation lowers the load
+        candidates = [dock for dock in dock_costs if next_quality_level(dock, 1) is not None]
+        if len(candidates) == 0:
+            return
+
+        dock = max(candidates, key=lambda dock: dock_costs[dock])
+        self.logger.info("Load %.0f%% over budget, lowering the quality of %s", 100. * self.load, dock.objectName())
+        dock.set_quality_level(next_quality_level(dock, 1))
+        self.degraded.append(dock)
+
+    def restore(self):
+        while len(self.degraded) > 0:
+            dock = self.degraded.pop()
+            # skip the docks that have been closed or that have changed since
+            if dock in self.dockmanager.docks and dock.quality_level > 0:
+                self.logger.info("Load %.0f%%, restoring the quality of %s", 100. * self.load, dock.objectName())
+                level = next_quality_level(dock, -1)
+                dock.set_quality_level(level if level is not None else 0)
+                return
@@ -1,884 +1,33 @@
 # Filters parameters generated from filter_design.py
+# they are stored as second-order sections in generated_filters.npz
 
-import json
+import os
 
-JSON_PARAMS = """
-{
-    "1": [
-        [
-            [
-                0.3363108965857415,
-                0.0029152307841421206,
-                -0.6666769535463926,
-                0.0029152307841421848,
-                0.3363108965857415
-            ]
-        ],
-        [
-            [
-                1.0,
-                1.5179045779899951,
-                0.6045055666013909,
-                0.3215227493617134,
-                0.2710064035996947
-            ]
-        ],
-        [
-            16000.0
-        ],
-        [
-            11313.70849898476
-        ],
-        [
-            22627.41699796952
-        ]
-    ],
-    "12": [
-        [
-            [
-                0.005448187370533621,
-                -0.0010629974182918066,
-                0.0011179842447383624,
-                -0.0010629974182918072,
-                0.005448187370533622
-            ],
-            [
-                0.0057294989899974655,
-                -1.3294967024414546e-05,
-                0.00041627290593000075,
-                -1.329496702441709e-05,
-                0.0057294989899974655
-            ],
-            [
-                0.006044169365567752,
-                0.0010905231079810897,
-                -0.0001593708003429464,
-                0.0010905231079810856,
-                0.006044169365567752
-            ],
-            [
-                0.006395997270004583,
-                0.0022402651167464202,
-                -0.0005869758405958241,
-                0.002240265116746421,
-                0.006395997270004583
-            ],
-            [
-                0.00678919046884379,
-                0.0034242005535282225,
-                -0.0008518641001138878,
-                0.003424200553528224,
-                0.006789190468843789
-            ],
-            [
-                0.007228405744478006,
-                0.0046263849048229526,
-                -0.000951575004289558,
-                0.004626384904822957,
-                0.007228405744478003
-            ],
-            [
-                0.0077187921262151455,
-                0.0058259661540583105,
-                -0.0009017980364783889,
-                0.0058259661540583044,
-                0.0077187921262151455
-            ],
-            [
-                0.008266037453436747,
-                0.0069965209582132995,
-                -0.0007429596651513413,
-                0.006996520958213299,
-                0.008266037453436747
-            ],
-            [
-                0.008876418377870737,
-                0.00810549288410933,
-                -0.0005467247118580525,
-                0.008105492884109328,
-                0.00887641837787074
-            ],
-            [
-                0.009556853883505606,
-                0.009113836080170704,
-                -0.00042115515730946286,
-                0.009113836080170705,
-                0.009556853883505608
-            ],
-            [
-                0.010314962367991136,
-                0.00997600526841957,
-                -0.0005126578498169293,
-                0.009976005268419566,
-                0.010314962367991138
-            ],
-            [
-                0.011159122286706945,
-                0.010640475627171676,
-                -0.0010022551247777344,
-                0.010640475627171674,
-                0.011159122286706943
-            ]
-        ],
-        [
-            [
-                1.0,
-                -0.3455757698750249,
-                1.9049040817797995,
-                -0.3251452278403145,
-                0.8854545339631857
-            ],
-            [
-                1.0,
-                -0.004329742412907664,
-                1.8673929698533336,
-                -0.004059001899883938,
-                0.8790853374726256
-            ],
-            [
-                1.0,
-                0.355809493563518,
-                1.8910291218906565,
-                0.3322794278490086,
-                0.8723898359431139
-            ],
-            [
-                1.0,
-                0.7323801563221735,
-                1.9851543102328835,
-                0.6811631208248549,
-                0.8653547212752689
-            ],
-            [
-                1.0,
-                1.1217603607809497,
-                2.1570676651028116,
-                1.038812348163675,
-                0.8579665785623407
-            ],
-            [
-                1.0,
-                1.5189322950483144,
-                2.410497215174818,
-                1.4001843893218722,
-                0.8502119518960387
-            ],
-            [
-                1.0,
-                1.9172347526144586,
-                2.74375546348793,
-                1.7587834241607374,
-                0.8420774207570387
-            ],
-            [
-                1.0,
-                2.308118740748637,
-                3.1476905980234013,
-                2.1064860709639897,
-                0.8335496880481317
-            ],
-            [
-                1.0,
-                2.6809291154259425,
-                3.60366685221627,
-                2.4334052946619655,
-                0.8246156808779896
-            ],
-            [
-                1.0,
-                3.0227458676372487,
-                4.0819706301906615,
-                2.7278242875840535,
-                0.8152626652452146
-            ],
-            [
-                1.0,
-                3.318331925085023,
-                4.541231919541632,
-                2.9762423529976565,
-                0.8054783758029627
-            ],
-            [
-                1.0,
-                3.550249863168939,
-                4.929638976240041,
-                3.163586225248753,
-                0.7952511619005473
-            ]
-        ],
-        [
-            11313.70849898476,
-            11986.45661501345,
-            12699.208415745596,
-            13454.342644059432,
-            14254.379490245426,
-            15101.989002907094,
-            16000.0,
-            16951.409509748722,
-            17959.392772949963,
-            19027.31384004354,
-            20158.73679831797,
-            21357.437666720543
-        ],
-        [
-            10991.629179664713,
-            11645.225462737497,
-            12337.686603263526,
-            13071.323625928799,
-            13848.584976098286,
-            14672.064691274738,
-            15544.511058457694,
-            16468.83578629587,
-            17448.12372264412,
-            18485.64314995637,
-            19584.85669287448,
-            20749.432874416147
-        ],
-        [
-            11645.2254627375,
-            12337.686603263526,
-            13071.323625928799,
-            13848.58497609829,
-            14672.064691274738,
-            15544.511058457692,
-            16468.835786295873,
-            17448.123722644123,
-            18485.643149956362,
-            19584.856692874488,
-            20749.432874416154,
-            21983.25835932942
-        ]
-    ],
-    "24": [
-        [
-            [
-                0.0037098446687558015,
-                -0.0011014902648238888,
-                0.004974974185499445,
-                -0.0011014902648238875,
-                0.0037098446687558015
-            ],
-            [
-                0.0037442760194772297,
-                -0.0005684899734384592,
-                0.0048226223636459765,
-                -0.0005684899734384589,
-                0.003744276019477229
-            ],
-            [
-                0.003780786760163355,
-                -1.9755798404434962e-05,
-                0.004711881905678835,
-                -1.9755798404434542e-05,
-                0.003780786760163355
-            ],
-            [
-                0.003819498300633509,
-                0.0005440368442486699,
-                0.004646792750729081,
-                0.0005440368442486697,
-                0.003819498300633509
-            ],
-            [
-                0.003860538925204152,
-                0.0011220263148510649,
-                0.004631236897388352,
-                0.0011220263148510649,
-                0.003860538925204152
-            ],
-            [
-                0.0039040441670499014,
-                0.0017131439129835016,
-                0.004668826386882121,
-                0.0017131439129835,
-                0.0039040441670499006
-            ],
-            [
-                0.003950157201734613,
-                0.0023160918663751875,
-                0.004762772833885405,
-                0.0023160918663751905,
-                0.003950157201734613
-            ],
-            [
-                0.0039990292607874995,
-                0.00292932026550884,
-                0.004915737899204605,
-                0.0029293202655088398,
-                0.003999029260787498
-            ],
-            [
-                0.004050820066229783,
-                0.003551003116045749,
-                0.005129664680647557,
-                0.0035510031160457495,
-                0.004050820066229783
-            ],
-            [
-                0.0041056982869879044,
-                0.004179013743824133,
-                0.00540559078125582,
-                0.004179013743824133,
-                0.0041056982869879044
-            ],
-            [
-                0.00416384201815884,
-                0.004810899861293473,
-                0.005743444830006586,
-                0.004810899861293471,
-                0.00416384201815884
-            ],
-            [
-                0.004225439284124329,
-                0.005443858691077347,
-                0.006141829509722515,
-                0.0054438586910773475,
-                0.0042254392841243275
-            ],
-            [
-                0.004290688566539671,
-                0.006074712643113597,
-                0.006597795716078649,
-                0.006074712643113597,
-                0.004290688566539674
-            ],
-            [
-                0.00435979935825286,
-                0.006699886157605847,
-                0.00710661434705972,
-                0.006699886157605846,
-                0.004359799358252859
-            ],
-            [
-                0.004432992744238069,
-                0.007315384457733258,
-                0.007661554406226111,
-                0.007315384457733256,
-                0.00443299274423807
-            ],
-            [
-                0.004510502010656045,
-                0.007916775104293922,
-                0.008253678576296681,
-                0.00791677510429392,
-                0.004510502010656045
-            ],
-            [
-                0.00459257328317966,
-                0.008499173409327404,
-                0.008871670132195447,
-                0.008499173409327404,
-                0.004592573283179659
-            ],
-            [
-                0.004679466195750027,
-                0.009057232946749743,
-                0.009501707924663764,
-                0.009057232946749741,
-                0.004679466195750027
-            ],
-            [
-                0.004771454590950996,
-                0.009585142593745799,
-                0.010127409034568078,
-                0.009585142593745799,
-                0.004771454590950994
-            ],
-            [
-                0.004868827253212928,
-                0.010076631744552133,
-                0.0107298613673249,
-                0.010076631744552136,
-                0.004868827253212928
-            ],
-            [
-                0.004971888676076138,
-                0.010524985554303723,
-                0.011287770642718176,
-                0.010524985554303729,
-                0.00497188867607614
-            ],
-            [
-                0.005080959864762281,
-                0.01092307228891862,
-                0.011777747566357424,
-                0.01092307228891862,
-                0.005080959864762281
-            ],
-            [
-                0.005196379175315515,
-                0.01126338506936376,
-                0.012174760978921107,
-                0.01126338506936376,
-                0.005196379175315515
-            ],
-            [
-                0.005318503191588221,
-                0.011538100494075746,
-                0.012452780906908935,
-                0.01153810049407575,
-                0.00531850319158822
-            ]
-        ],
-        [
-            [
-                1.0,
-                -0.3527940594968014,
-                1.9693875272603392,
-                -0.34221482451688,
-                0.9409517367141373
-            ],
-            [
-                1.0,
-                -0.18216050979508885,
-                1.9447237165602855,
-                -0.17654041987277513,
-                0.939275922699878
-            ],
-            [
-                1.0,
-                -0.0063331874444524094,
-                1.934545646619323,
-                -0.006132156862573429,
-                0.9375541944008867
-            ],
-            [
-                1.0,
-                0.17448498804322346,
-                1.9402056264869356,
-                0.16878671580978263,
-                0.9357853919734934
-            ],
-            [
-                1.0,
-                0.36003160308657306,
-                1.963010498175576,
-                0.3479349417138068,
-                0.9339683322385547
-            ],
-            [
-                1.0,
-                0.5499779130296545,
-                2.0041865332487543,
-                0.5309669460770756,
-                0.9321018085959966
-            ],
-            [
-                1.0,
-                0.7439215942314029,
-                2.0648385200198103,
-                0.7174661953192853,
-                0.930184590969224
-            ],
-            [
-                1.0,
-                0.9413791193224187,
-                2.145902850797162,
-                0.906938268190278,
-                0.9282154257819328
-            ],
-            [
-                1.0,
-                1.141777806339264,
-                2.2480946022747323,
-                1.0988036964002577,
-                0.9261930359699481
-            ],
-            [
-                1.0,
-                1.3444476124512956,
-                2.3718488491638388,
-                1.292390652149637,
-                0.9241161210309166
-            ],
-            [
-                1.0,
-                1.5486127667986689,
-                2.5172567716939294,
-                1.4869275829235713,
-                0.9219833571148017
-            ],
-            [
-                1.0,
-                1.7533833650028998,
-                2.6839975213341636,
-                1.6815359206603064,
-                0.9197933971583108
-            ],
-            [
-                1.0,
-                1.9577470806281876,
-                2.871267304150812,
-                1.8752230232603018,
-                0.9175448710665493
-            ],
-            [
-                1.0,
-                2.160561186671763,
-                3.077707732916177,
-                2.0668755416599707,
-                0.9152363859453709
-            ],
-            [
-                1.0,
-                2.360545123398933,
-                3.3013361881248757,
-                2.255253445563559,
-                0.9128665263880712
-            ],
-            [
-                1.0,
-                2.556273897777094,
-                3.539481708334622,
-                2.4389849855161962,
-                0.9104338548202684
-            ],
-            [
-                1.0,
-                2.7461726545280998,
-                3.788730786063357,
-                2.6165629182641204,
-                0.9079369119070112
-            ],
-            [
-                1.0,
-                2.928512819336991,
-                4.044888348397372,
-                2.786342376027754,
-                0.905374217026339
-            ],
-            [
-                1.0,
-                3.10141028068263,
-                4.302960106616497,
-                2.946540817874176,
-                0.9027442688137435
-            ],
-            [
-                1.0,
-                3.2628261473839877,
-                4.557163301280205,
-                3.0952405619189216,
-                0.900045545782185
-            ],
-            [
-                1.0,
-                3.4105706931042983,
-                4.800973558835779,
-                3.2303944592534473,
-                0.8972765070225422
-            ],
-            [
-                1.0,
-                3.5423111749420695,
-                5.0272159957243625,
-                3.3498353323499286,
-                0.8944355929895743
-            ],
-            [
-                1.0,
-                3.6555842883297376,
-                5.228208709090527,
-                3.45128985960155,
-                0.8915212263787494
-            ],
-            [
-                1.0,
-                3.7478140913010014,
-                5.395966202487305,
-                3.532397640127616,
-                0.8885318130994614
-            ]
-        ],
-        [
-            11313.70849898476,
-            11645.225462737499,
-            11986.45661501345,
-            12337.686603263526,
-            12699.208415745596,
-            13071.323625928797,
-            13454.342644059432,
-            13848.584976098287,
-            14254.379490245426,
-            14672.06469127474,
-            15101.989002907094,
-            15544.51105845769,
-            16000.0,
-            16468.835786295866,
-            16951.409509748722,
-            17448.123722644123,
-            17959.392772949963,
-            18485.643149956362,
-            19027.31384004354,
-            19584.856692874473,
-            20158.73679831797,
-            20749.432874416154,
-            21357.437666720543,
-            21983.258359329422
-        ],
-        [
-            11151.506107591995,
-            11478.270178488001,
-            11814.609167515993,
-            12160.803641192919,
-            12517.142387262193,
-            12883.922655594033,
-            13261.450406144699,
-            13650.040564181483,
-            14050.017282986393,
-            14461.714214257616,
-            14885.474786434343,
-            15321.652491177176,
-            15770.611178243002,
-            16232.725359000371,
-            16708.38051883862,
-            17197.973438731144,
-            17701.912526221327,
-            18220.618156107063,
-            18754.523021108023,
-            19304.07249280834,
-            19869.724993175743,
-            20451.95237696689,
-            21051.240325338196,
-            21668.08875099028
-        ],
-        [
-            11478.270178488003,
-            11814.609167515995,
-            12160.803641192919,
-            12517.142387262194,
-            12883.922655594035,
-            13261.450406144699,
-            13650.040564181485,
-            14050.017282986397,
-            14461.714214257616,
-            14885.474786434346,
-            15321.652491177178,
-            15770.611178243,
-            16232.72535900038,
-            16708.380518838618,
-            17197.973438731144,
-            17701.912526221335,
-            18220.618156107063,
-            18754.52302110802,
-            19304.07249280835,
-            19869.724993175736,
-            20451.95237696689,
-            21051.240325338204,
-            21668.08875099028,
-            22303.012215183986
-        ]
-    ],
-    "3": [
-        [
-            [
-                0.043140032193149457,
-                0.0009913017706948664,
-                -0.07667939614588672,
-                0.0009913017706948963,
-                0.04314003219314946
-            ],
-            [
-                0.06287596977873822,
-                0.0046286568564018115,
-                -0.1145356290930384,
-                0.004628656856401808,
-                0.06287596977873819
-            ],
-            [
-                0.09108072445676865,
-                0.007350607974862103,
-                -0.1674186233495754,
-                0.007350607974862224,
-                0.09108072445676862
-            ]
-        ],
-        [
-            [
-                1.0,
-                0.3561130837789026,
-                1.4443960481721407,
-                0.26937000887611384,
-                0.584477620820897
-            ],
-            [
-                1.0,
-                1.7173260282150693,
-                2.0258851827233904,
-                1.2032241926844989,
-                0.5127005259240065
-            ],
-            [
-                1.0,
-                2.8395043889825993,
-                3.212304944135884,
-                1.7985192128394694,
-                0.43884589651843153
-            ]
-        ],
-        [
-            12699.208415745596,
-            16000.0,
-            20158.73679831797
-        ],
-        [
-            11313.70849898476,
-            14254.37949024543,
-            17959.392772949966
-        ],
-        [
-            14254.379490245428,
-            17959.39277294997,
-            22627.416997969518
-        ]
-    ],
-    "6": [
-        [
-            [
-                0.012105688508488586,
-                -0.0009797415605366504,
-                -0.012937935296941714,
-                -0.0009797415605366571,
-                0.012105688508488583
-            ],
-            [
-                0.014313301761881182,
-                0.0010417989052842998,
-                -0.01751498600433224,
-                0.001041798905284295,
-                0.014313301761881178
-            ],
-            [
-                0.017036388510423252,
-                0.0031974146486836697,
-                -0.022308506772127996,
-                0.003197414648683661,
-                0.017036388510423255
-            ],
-            [
-                0.020385588043752862,
-                0.005373759246137571,
-                -0.02744337382455276,
-                0.005373759246137564,
-                0.020385588043752866
-            ],
-            [
-                0.024491896152489895,
-                0.007388805923494939,
-                -0.03335037083741435,
-                0.00738880592349492,
-                0.024491896152489895
-            ],
-            [
-                0.02950924778886837,
-                0.008980557013039462,
-                -0.040932092208741125,
-                0.008980557013039465,
-                0.02950924778886837
-            ]
-        ],
-        [
-            [
-                1.0,
-                -0.3279673214072805,
-                1.7721184363152322,
-                -0.2902216089499693,
-                0.7844913672620322
-            ],
-            [
-                1.0,
-                0.3512129030186812,
-                1.7438339316667815,
-                0.3061324386980487,
-                0.7617226485362805
-            ],
-            [
-                1.0,
-                1.0864517200453219,
-                1.9744231155784162,
-                0.9310255629390407,
-                0.7370360765300357
-            ],
-            [
-                1.0,
-                1.8420966973795174,
-                2.4943371847553397,
-                1.5485918414914146,
-                0.710394020295732
-            ],
-            [
-                1.0,
-                2.5578447237108595,
-                3.2503270745529127,
-                2.1042806922617907,
-                0.681794050106052
-            ],
-            [
-                1.0,
-                3.1431296868521974,
-                4.054722532464942,
-                2.5233451852172704,
-                0.6512793373366625
-            ]
-        ],
-        [
-            11313.70849898476,
-            12699.208415745596,
-            14254.379490245426,
-            16000.0,
-            17959.392772949963,
-            20158.73679831797
-        ],
-        [
-            10678.718833360275,
-            11986.456615013452,
-            13454.34264405943,
-            15101.989002907096,
-            16951.40950974872,
-            19027.313840043535
-        ],
-        [
-            11986.456615013452,
-            13454.342644059434,
-            15101.989002907094,
-            16951.409509748726,
-            19027.31384004353,
-            21357.437666720547
-        ]
-    ],
-    "dec": [
-        [
-            0.011536697475707477,
-            0.03863239409987755,
-            0.10808835129075559,
-            0.20611576754172498,
-            0.32963659619400776,
-            0.42517932605498265,
-            0.4661693965957637,
-            0.4251793260549823,
-            0.3296365961940077,
-            0.20611576754172484,
-            0.10808835129075547,
-            0.03863239409987752,
-            0.011536697475707474
-        ],
-        [
-            1.0,
-            -2.217799581317487,
-            6.050876867187728,
-            -8.921323656714186,
-            13.006330216820826,
-            -13.58725771157039,
-            12.99339017045834,
-            -9.673218888416496,
-            6.243626997073957,
-            -3.1439412347242843,
-            1.2640695988464932,
-            -0.35467961675541876,
-            0.060088025064203764
-        ]
-    ]
-}
-"""
+import numpy as np
 
-PARAMS = json.loads(JSON_PARAMS)
+FILTERS_PATH = os.path.join(os.path.dirname(__file__), 'generated_filters.npz')
+
+
+def load_params(path=FILTERS_PATH):
+    # 'dec': [b, a] of the decimation low-pass filter
+    # '%d' % bands_per_octave: [sos, fi, flow, fhigh] of the highest octave
+    # where sos has shape (bands_per_octave, n_sections, 6)
+    with np.load(path) as data:
+        bdec, adec = data['dec']
+        bands_per_octave_list = data['bands_per_octave']
+        sos = data['sos']
+        freqs = data['freqs']
+
+    params = {'dec': [bdec, adec]}
+
+    start = 0
+    for bands_per_octave in bands_per_octave_list:
+        stop = start + bands_per_octave
+        fi, flow, fhigh = freqs[start:stop].T
+        params['%d' % bands_per_octave] = [sos[start:stop], fi, flow, fhigh]
+        start = stop
+
+    return params
+
+
+PARAMS = load_params()
@@ -22,12 +22,14 @@ from fractions import Fraction
 import numpy as np
 from friture.audiobackend import AudioBackend
 from friture.spectrogram_image import CanvasScaledSpectrogram
+from friture.spectrogram_texture import TextureSpectrogram, opengl_spectrogram_supported
 from friture.signal.online_linear_2D_resampler import Online_Linear_2D_resampler
 from friture.signal.frequency_resampler import Frequency_Resampler
 from friture.plotting.scaleWidget import VerticalScaleWidget, HorizontalScaleWidget, ColorScaleWidget
 from friture.plotting.scaleDivision import ScaleDivision
 from friture.plotting.coordinateTransform import CoordinateTransform
 from friture.plotting.canvasWidget import CanvasWidget
+from friture.plotting.glCanvasWidget import GlCanvasWidget
 
 
 def tickFormatter(value, digits):
@@ -40,8 +42,9 @@ def tickFormatter(value, digits):
 
 class PlotImage:
 
-    def __init__(self):
-        self.canvasscaledspectrogram = CanvasScaledSpectrogram()
+    def __init__(self, opengl=False):
+        # the columns are colored on the CPU and drawn in a pixmap, or kept in an OpenGL texture
+        self.canvasscaledspectrogram = TextureSpectrogram() if opengl else CanvasScaledSpectrogram()
         self.T = 0.
         self.dT = 1.
 
@@ -63,20 +66,21 @@ class PlotImage:
     def addData(self, freq, xyzs, logfreqscale, last_data_time):
         self.frequency_resampler.setlogfreqscale(logfreqscale)
 
-        # Note: both the frequency and the time resampler work
-        # only on 1D arrays, so we loop on the columns of data.
+        # The frequency resampler works on the whole block of columns at once,
+        # while the time resampler works only on 1D arrays, so we loop on the columns.
         # However, we reassemble the 2D output before drawing
         # on the widget's pixmap, because the drawing operation
         # seems to have a costly warmup phase, so it is better
         # to invoke it the fewer number of times possible.
 
+        freq_resampled_data = self.frequency_resampler.process(freq, xyzs)
+
         n = self.resampler.processable(xyzs.shape[1])
-        resampled_data = np.zeros((self.frequency_resampler.nsamples, n))
+        resampled_data = np.zeros((self.frequency_resampler.nsamples, n), dtype=xyzs.dtype)
 
         i = 0
         for j in range(xyzs.shape[1]):
-            freq_resampled_data = self.frequency_resampler.process(freq, xyzs[:, j])
-            data = self.resampler.process(freq_resampled_data)
+            data = self.resampler.process(freq_resampled_data[:, j])
             resampled_data[:, i:i + data.shape[1]] = data
             i += data.shape[1]
 
@@ -85,6 +89,15 @@ class PlotImage:
         if i > 0:
             self.last_data_time = last_data_time
 
+    def showImage(self, freq, xyzs, logfreqscale):
+        """Replace the image with the columns of xyzs, which must be as many as the pixels of the image width."""
+        self.frequency_resampler.setlogfreqscale(logfreqscale)
+        self.canvasscaledspectrogram.showImage(self.frequency_resampler.process(freq, xyzs))
+
+    def image_width(self):
+        # the image is a bit wider than the canvas, to absorb the jitter
+        return int(self.canvasscaledspectrogram.canvas_width)
+
     def pause(self):
         self.isPlaying = False
 
@@ -93,7 +106,8 @@ class PlotImage:
         self.last_time = AudioBackend().get_stream_time()
         self.timer.restart()
 
-    def draw(self, painter, xMap, yMap, rect):
+    def scroll(self, rect):
+        """Adapt to the canvas dimensions, advance the time, and return the offset of the image, in pixels."""
         # update the spectrogram according to possibly new canvas dimensions
         self.frequency_resampler.setnsamples(rect.height())
         self.resampler.set_height(rect.height())
@@ -108,8 +122,7 @@ class PlotImage:
         # time advance
         # This function is meant to be called at paintevent time, for better time sync.
 
-        pixmap = self.canvasscaledspectrogram.getpixmap()
-        offset = self.canvasscaledspectrogram.getpixmapoffset(delay=jitter_pix / 2)
+        offset = self.canvasscaledspectrogram.getoffset(delay=jitter_pix / 2)
 
         if self.isPlaying:
             delta_t = self.timer.nsecsElapsed() * 1e-9
@@ -125,6 +138,21 @@ class PlotImage:
 
             offset += pixel_delay
 
+        return offset
+
+    def glDraw(self, xMap, yMap, rect, vbo, shader_program):
+        # the columns added since the last draw go to the texture before it is resized
+        self.canvasscaledspectrogram.upload()
+
+        offset = self.scroll(rect)
+
+        self.canvasscaledspectrogram.glDraw(offset, rect, shader_program)
+
+    def draw(self, painter, xMap, yMap, rect):
+        offset = self.scroll(rect)
+
+        pixmap = self.canvasscaledspectrogram.getpixmap()
+
         rolling = True
         if rolling:
             # draw the whole canvas with a selected portion of the pixmap
@@ -159,6 +187,12 @@ class PlotImage:
     def setlogfreqscale(self, logfreqscale):
         self.frequency_resampler.setlogfreqscale(logfreqscale)
 
+    def setfreqresampling(self, mode):
+        self.frequency_resampler.setmode(mode)
+
+    def setspecrange(self, spec_min, spec_max):
+        self.canvasscaledspectrogram.setspecrange(spec_min, spec_max)
+
     def erase(self):
         self.canvasscaledspectrogram.erase()
 
@@ -194,7 +228,9 @@ class ImagePlot(QtWidgets.QWidget):
         self.colorScale = ColorScaleWidget(self, self.colorScaleDivision, self.colorScaleTransform)
         self.colorScale.setTitle("PSD (dB A)")
 
-        self.canvasWidget = CanvasWidget(self, self.verticalScaleTransform, self.horizontalScaleTransform)
+        opengl = opengl_spectrogram_supported()
+        canvas_class = GlCanvasWidget if opengl else CanvasWidget
+        self.canvasWidget = canvas_class(self, self.verticalScaleTransform, self.horizontalScaleTransform)
         self.canvasWidget.setTrackerFormatter(lambda x, y: "%.2f s, %d Hz" % (x, y))
 
         plotLayout = QtWidgets.QGridLayout()
@@ -210,7 +246,7 @@ class ImagePlot(QtWidgets.QWidget):
         self.needfullreplot = False
 
         # attach a plot image
-        self.plotImage = PlotImage()
+        self.plotImage = PlotImage(opengl)
         self.canvasWidget.attach(self.plotImage)
 
         self.setlinfreqscale()
@@ -223,6 +259,9 @@ class ImagePlot(QtWidgets.QWidget):
     def addData(self, freq, xyzs, last_data_time):
         self.plotImage.addData(freq, xyzs, self.logfreqscale, last_data_time)
 
+    def showImage(self, freq, xyzs):
+        self.plotImage.showImage(freq, xyzs, self.logfreqscale)
+
     def draw(self):
         if self.needfullreplot:
             self.needfullreplot = False
@@ -291,9 +330,12 @@ class ImagePlot(QtWidgets.QWidget):
 
     def settimerange(self, timerange_seconds, dT_seconds):
         self.plotImage.settimerange(timerange_seconds, dT_seconds)
+        self.settimeaxis(0, timerange_seconds)
 
-        self.horizontalScaleTransform.setRange(0, timerange_seconds)
-        self.horizontalScaleDivision.setRange(0, timerange_seconds)
+    def settimeaxis(self, time_min, time_max):
+        # only the labels, the image is scrolled back from the history while paused
+        self.horizontalScaleTransform.setRange(time_min, time_max)
+        self.horizontalScaleDivision.setRange(time_min, time_max)
 
         # notify that sizeHint has changed (this should be done with a signal emitted from the scale division to the scale bar)
         self.horizontalScale.scaleBar.updateGeometry()
@@ -316,7 +358,12 @@ class ImagePlot(QtWidgets.QWidget):
         self.needfullreplot = True
         self.update()
 
+    def setfreqresampling(self, mode):
+        self.plotImage.setfreqresampling(mode)
+
     def setspecrange(self, spec_min, spec_max):
+        self.plotImage.setspecrange(spec_min, spec_max)
+
         self.colorScaleTransform.setRange(spec_min, spec_max)
         self.colorScaleDivision.setRange(spec_min, spec_max)
 
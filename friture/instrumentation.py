@@ -0,0 +1,297 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2009 Timothée Lecomte
+
+# This file is part of Friture.
+#
+# Friture is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as published by
+# the Free Software Foundation.
+#
+# Friture is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Friture.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Lightweight timing instrumentation of the hot paths.
+
+Durations are accumulated in fixed-size histograms with logarithmic bins,
+so that recording is cheap and the memory use does not grow with time.
+The histograms are keyed by source (a dock, a thread) and by metric
+(handle_new_data, canvasUpdate, paint, tick lateness...).
+
+The latency from the capture of the audio to its display is probed by
+stamping each block with its capture time: the widgets results posted to a
+Mailbox carry the stamp of the block being processed, and the dock records
+the age of the newest drawn result when its canvas is painted."""
+
+import json
+import math
+from contextlib import contextmanager
+from time import perf_counter
+
+# bins from 1 us to 10 s, plus an underflow and an overflow bin
+MIN_DURATION_S = 1e-6
+BINS_PER_DECADE = 20
+DECADES = 7
+BIN_COUNT = BINS_PER_DECADE * DECADES
+
+# the latency histograms only cover the last one or two windows,
+# so that they follow the changes of device or of settings
+ROLLING_WINDOW_S = 10.
+
+
+def bin_upper_edges():
+    # upper edges of the underflow bin and of the regular bins, the overflow bin is unbounded
+    return [MIN_DURATION_S * 10. ** (i / BINS_PER_DECADE) for i in range(BIN_COUNT + 1)]
+
+
+def instrumented_ancestor(widget):
+    """Return the widget or the ancestor (the dock) that has an instrumentation_name, or None."""
+    while widget is not None:
+        if getattr(widget, "instrumentation_name", None) is not None:
+            return widget
+        widget = widget.parentWidget()
+    return None
+
+
+def instrumentation_name(widget):
+    """Return the name under which the timings of a widget are recorded: the one of its dock."""
+    ancestor = instrumented_ancestor(widget)
+    return ancestor.instrumentation_name if ancestor is not None else "Other"
+
+
+class TimingHistogram:
+    """Histogram of durations, in seconds, with logarithmic bins.
+
+    Percentiles are read from the upper edges of the bins, so that they are
+    accurate to 1/BINS_PER_DECADE of a decade (about 12 %)."""
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        # a plain list is faster than a numpy array for single increments
+        self.counts = [0] * (BIN_COUNT + 2)
+        self.count = 0
+        self.total = 0.
+        self.max = 0.
+
+    def record(self, duration):
+        if duration <= MIN_DURATION_S:
+            index = 0
+        else:
+            index = min(int(math.log10(duration / MIN_DURATION_S) * BINS_PER_DECADE) + 1, BIN_COUNT + 1)
+
+        self.counts[index] += 1
+        self.count += 1
+        self.total += duration
+        if duration > self.max:
+            self.max = duration
+
+    def mean(self):
+        return self.total / self.count if self.count > 0 else 0.
+
+    def percentile(self, p):
+        if self.count == 0:
+            return 0.
+
+        target = p / 100. * self.count
+        cumulated = 0
+        for index, count in enumerate(self.counts):
+            cumulated += count
+            if cumulated >= target and count > 0:
+                if index > BIN_COUNT:
+                    return self.max
+                return min(MIN_DURATION_S * 10. ** (index / BINS_PER_DECADE), self.max)
+        return self.max
+
+    def to_dict(self):
+        return {'count': self.count,
+                'mean_ms': self.mean() * 1e3,
+                'p50_ms': self.percentile(50) * 1e3,
+                'p99_ms': self.percentile(99) * 1e3,
+                'max_ms': self.max * 1e3,
+                'counts': list(self.counts)}
+
+
+class RollingHistogram:
+    """Histogram of the durations recorded during the current and the previous windows."""
+
+    def __init__(self, window=ROLLING_WINDOW_S):
+        self.window = window
+        self.clear()
+
+    def clear(self):
+        self.previous = TimingHistogram()
+        self.current = TimingHistogram()
+        self.window_start = perf_counter()
+
+    def record(self, duration):
+        now = perf_counter()
+        if now - self.window_start > self.window:
+            self.previous = self.current
+            self.current = TimingHistogram()
+            self.window_start = now
+
+        self.current.record(duration)
+
+    def merged(self):
+        previous, current = self.previous, self.current
+        histogram = TimingHistogram()
+        histogram.counts = [a + b for a, b in zip(previous.counts, current.counts)]
+        histogram.count = previous.count + current.count
+        histogram.total = previous.total + current.total
+        histogram.max = max(previous.max, current.max)
+        return histogram
+
+    @property
+    def count(self):
+        return self.previous.count + self.current.count
+
+    @property
+    def max(self):
+        return max(self.previous.max, self.current.max)
+
+    def mean(self):
+        return self.merged().mean()
+
+    def percentile(self, p):
+        return self.merged().percentile(p)
+
+    def to_dict(self):
+        return self.merged().to_dict()
+
+
+class LatencyProbe:
+    """Records the latency from the capture of the audio to its display, for one dock.
+
+    drawn() is called after the widget canvasUpdate, with the capture time of the
+    newest result taken from its mailbox, and painted() after the canvas paint.
+    The latency is recorded once per new result, not for every repaint."""
+
+    def __init__(self, source):
+        self.source = source
+        self.last_capture_time = None
+        self.pending_capture_time = None
+
+    def drawn(self, capture_time):
+        if capture_time is not None and capture_time != self.last_capture_time:
+            self.last_capture_time = capture_time
+            self.pending_capture_time = capture_time
+
+    def painted(self):
+        if self.pending_capture_time is not None:
+            Instrumentation().record(self.source, "latency", perf_counter() - self.pending_capture_time,
+                                     rolling=True)
+            self.pending_capture_time = None
+
+
+class TickLateness:
+    """Records how late a periodic timer ticks compared to its nominal period."""
+
+    def __init__(self, source, period_ms):
+        self.source = source
+        self.period = period_ms * 1e-3
+        self.last_tick = None
+
+    def tick(self):
+        now = perf_counter()
+        if self.last_tick is not None:
+            Instrumentation().record(self.source, "tick lateness", max(now - self.last_tick - self.period, 0.))
+        self.last_tick = now
+
+    def reset(self):
+        # to be called when the timer is stopped, so that a pause is not counted as lateness
+        self.last_tick = None
+
+
+__instrumentationInstance = None
+
+
+def Instrumentation():
+    global __instrumentationInstance
+    if __instrumentationInstance is None:
+        __instrumentationInstance = __Instrumentation()
+    return __instrumentationInstance
+
+
+class __Instrumentation:
+    """Timing histograms of the whole application.
+
+    Each histogram is written by a single thread (the analysis thread or the
+    GUI thread) and read from the GUI thread, without locks: a reader may see
+    a histogram in the middle of an update, which is harmless for statistics."""
+
+    def __init__(self):
+        self.histograms = {}
+
+    def histogram(self, source, metric, rolling=False):
+        key = (source, metric)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms.setdefault(key, RollingHistogram() if rolling else TimingHistogram())
+        return histogram
+
+    def record(self, source, metric, duration, rolling=False):
+        self.histogram(source, metric, rolling).record(duration)
+
+    @contextmanager
+    def timed(self, source, metric):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.record(source, metric, perf_counter() - start)
+
+    @contextmanager
+    def timed_paint(self, widget):
+        """Time the paint of a canvas, and let the latency probe of its dock know that it has been painted."""
+        ancestor = instrumented_ancestor(widget)
+        name = ancestor.instrumentation_name if ancestor is not None else "Other"
+
+        with self.timed(name, "paint"):
+            yield
+
+        probe = getattr(ancestor, "latency_probe", None)
+        if probe is not None:
+            probe.painted()
+
+    def timed_call(self, source, metric, function):
+        """Return a wrapper of function that records the duration of each call."""
+        histogram = self.histogram(source, metric)
+
+        def wrapper(*args):
+            start = perf_counter()
+            try:
+                return function(*args)
+            finally:
+                histogram.record(perf_counter() - start)
+
+        return wrapper
+
+    def reset(self):
+        # wrappers from timed_call keep recording into the previous histograms,
+        # so they are emptied rather than replaced
+        for histogram in list(self.histograms.values()):
+            histogram.clear()
+
+    def summary(self):
+        """Return a list of (source, metric, histogram), sorted by source and metric."""
+        return sorted(((source, metric, histogram) for (source, metric), histogram in list(self.histograms.items())
+                       if histogram.count > 0), key=lambda item: item[:2])
+
+    def to_json(self, context=None):
+        """Export the histograms as JSON, along with a context dict (the input device for example)."""
+        sources = {}
+        for source, metric, histogram in self.summary():
+            sources.setdefault(source, {})[metric] = histogram.to_dict()
+
+        return json.dumps({'bin_upper_edges_ms': [edge * 1e3 for edge in bin_upper_edges()],
+                           'context': context if context is not None else {},
+                           'histograms': sources},
+                          indent=2, sort_keys=True)
@@ -135,6 +135,7 @@ class Levels_Widget(QtWidgets.QWidget):
         self.alpha2 = 1. - (1. - w) ** (1. / (n2 + 1))
 
         self.two_channels = False
+        self.meter_two_channels = False
 
         self.i = 0
 
@@ -143,12 +144,8 @@ class Levels_Widget(QtWidgets.QWidget):
         self.audiobuffer = buffer
 
     def handle_new_data(self, floatdata):
-        if floatdata.shape[0] > 1 and not self.two_channels:
-            self.meter.setPortCount(2)
-            self.two_channels = True
-        elif floatdata.shape[0] == 1 and self.two_channels:
-            self.meter.setPortCount(1)
-            self.two_channels = False
+        # runs in the analysis thread, the meter port count is updated in canvasUpdate
+        self.two_channels = floatdata.shape[0] > 1
 
         # first channel
         y1 = floatdata[0, :]
@@ -194,6 +191,10 @@ class Levels_Widget(QtWidgets.QWidget):
         if not self.isVisible():
             return
 
+        if self.two_channels != self.meter_two_channels:
+            self.meter_two_channels = self.two_channels
+            self.meter.setPortCount(2 if self.two_channels else 1)
+
         self.i += 1
 
         if self.i == LEVEL_TEXT_LABEL_STEPS:
@@ -19,16 +19,22 @@
 
 """Level widget that displays RMS level history."""
 
+import threading
+
 from PyQt5 import QtCore, QtGui, QtWidgets
 import numpy as np
 from friture.longlevels_settings import (LongLevels_Settings_Dialog,
                                          DEFAULT_LEVEL_MIN,
-                                         DEFAULT_LEVEL_MAX)
+                                         DEFAULT_LEVEL_MAX,
+                                         DEFAULT_TIMERANGE,
+                                         DEFAULT_HISTORY)
 from friture.audioproc import audioproc
 from friture.timeplot import TimePlot
-from .signal.decimate import decimate
-from .ringbuffer import RingBuffer
+from friture.analysisthread import Mailbox
+from .signal.decimate import normalize_filter
+from friture.pyramid import HistoryPyramid, MEAN
 from friture_extensions.lfilter import pyx_lfilter_float64_1D
+from friture_extensions.filterbank import pyx_polyphase_decimate_float64
 
 from friture.audiobackend import SAMPLING_RATE
 
@@ -46,41 +52,51 @@ def gauss(n=11, sigma=1):
 
 
 class Subsampler:
+    """Stateful decimator by 2**Ndec, in Ndec stages of decimation by 2.
+
+    The filters states and the phases are kept from one block to the next,
+    so that the blocks can be of any length: the output is the same as if
+    the whole signal had been pushed at once."""
+
     def __init__(self, Ndec):
         self.Ndec = Ndec
 
         # to maintain non-negativeness of the subsampled signal, we use a gaussian filter here
         # (IIR ringing produces negative values)
         #[self.bdec, self.adec] = generated_filters.PARAMS['dec']
-        self.bdec = np.array(gauss(11, 2.))
-        self.adec = np.zeros(self.bdec.shape)
-        self.adec[0] = 1.
-
-        # build a proper array of zero initial conditions to start the subsampler
-        self.zfs = []
+        bdec = np.array(gauss(11, 2.))
+        adec = np.zeros(bdec.shape)
+        adec[0] = 1.
+        self.bdec, self.adec = normalize_filter(bdec, adec)
+
+        # zero initial conditions, and the even input samples are kept at each stage
+        self.zdec = np.zeros((self.Ndec, len(self.adec) - 1))
+        self.phases = [0] * self.Ndec
+
+        self.capacity = 0
+        self.allocate(4096)
+
+    def allocate(self, capacity):
+        # preallocated outputs and work buffer, for inputs up to capacity samples
+        self.capacity = capacity
+        self.decimated = []
+        length = capacity
         for i in range(self.Ndec):
-            l = max(len(self.bdec), len(self.adec)) - 1
-            self.zfs += [np.zeros(l)]
+            length = length // 2 + 1
+            self.decimated += [np.empty(length)]
+        self.work = np.empty(capacity + len(self.adec) - 1)
 
     def push(self, x):
-        # FIXME problems when x is smaller than filter coeff
-
-        # do not run on empty arrays, otherwise bad artefacts on the output !!
-        if x.size == 0:
-            return x
-
-        x_dec = x
-
-        # if we do not have enough samples, we need to buffer until we have enough
-        # we need 2**self.Ndec samples in input for one in output
+        """Decimate the block x, and return a view on the decimated samples, valid until the next push."""
+        if len(x) > self.capacity:
+            self.allocate(2 * len(x))
 
-        zfs = []
-        for i, zi in zip(list(range(self.Ndec)), self.zfs):
-            x_dec, zf = decimate(self.bdec, self.adec, x_dec, zi=zi)
-            # zf can be reused to restart the filter
-            zfs.append(zf)
+        x_dec = np.ascontiguousarray(x, dtype=np.float64)
 
-        self.zfs = zfs
+        for i in range(self.Ndec):
+            count, self.phases[i] = pyx_polyphase_decimate_float64(self.bdec, self.adec, x_dec, self.zdec[i],
+                                                                   self.phases[i], self.work, self.decimated[i])
+            x_dec = self.decimated[i][:count]
 
         return x_dec
 
@@ -121,7 +137,8 @@ class LongLevelWidget(QtWidgets.QWidget):
 
         self.i = 0
 
-        self.old_index = 0
+        # cursor on the audio ring buffer
+        self.reader = None
 
         # self.response_time = 60. # 1 minute
         self.response_time = 20.
@@ -138,66 +155,92 @@ class LongLevelWidget(QtWidgets.QWidget):
         self.subsampled_sampling_rate = SAMPLING_RATE / 2 ** (self.Ndec)
         self.subsampler = Subsampler(self.Ndec)
 
-        self.length_seconds = 60.*10
-        # actually this should be linked to the pixel width of the plot area
-        self.length_samples = int(self.length_seconds * self.subsampled_sampling_rate)
+        # displayed time range, the history can be much longer
+        self.length_seconds = DEFAULT_TIMERANGE * 60.
+        # one point per pixel of the plot area, updated from the GUI thread
+        self.display_points = 2
+
+        # mean-square levels, with their decimated levels so that hours can be drawn as fast as minutes
+        self.history = self.create_history(DEFAULT_HISTORY)
+
+        # the dock keeps the processing running while not shown, so that the history has no gap
+        self.records_history = True
 
-        # ringbuffer for the subsampled data
-        self.ringbuffer = RingBuffer()
+        # handle_new_data runs in the analysis thread, while the settings are changed from the GUI thread
+        self.lock = threading.RLock()
+
+        # ready-to-draw levels history, handed over to the GUI thread
+        self.mailbox = Mailbox()
 
     # method
     def set_buffer(self, buffer):
         self.audiobuffer = buffer
+        # the input is consumed by contiguous chunks of 2**Ndec samples
+        needed = int(2**self.Ndec)
+        self.reader = self.audiobuffer.register_reader(needed, needed)
 
-    def handle_new_data(self, floatdata):
-        # we need to maintain an index of where we are in the buffer
-        index = self.audiobuffer.ringbuffer.offset
-        self.last_data_time = self.audiobuffer.lastDataTime
-
-        available = index - self.old_index
-
-        if available < 0:
-            # ringbuffer must have grown or something...
-            available = 0
-            self.old_index = index
+    def closeEvent(self, event):
+        with self.lock:
+            if self.reader is not None:
+                self.audiobuffer.unregister_reader(self.reader)
+                self.reader = None
+        super().closeEvent(event)
 
-        # if we have enough data to add a frequency column in the time-frequency plane, compute it
-        needed = int(2**self.Ndec)
-        realizable = int(np.floor(available / needed))
+    def create_history(self, hours):
+        capacity = max(int(hours * 3600. * self.subsampled_sampling_rate), 1)
+        return HistoryPyramid(capacity, 1, dtype=np.float64, reductions=(MEAN,))
 
-        if realizable > 0:
-            for i in range(realizable):
-                floatdata = self.audiobuffer.data_indexed(self.old_index, needed)
+    def handle_new_data(self, floatdata):
+        with self.lock:
+            self.process(floatdata)
 
-                # first channel
-                y0 = floatdata[0, :]
+    def process(self, floatdata):
+        # the dock may have been closed while this block was waiting for the lock
+        if self.reader is None:
+            return
 
-                y0_squared = y0**2
+        self.last_data_time = self.audiobuffer.lastDataTime
 
-                # subsample
-                y0_squared_dec = self.subsampler.push(y0_squared)
+        # if we have enough data to add a point to the levels history, compute it
+        realizable = self.reader.pending()
 
-                self.level, self.zf = pyx_lfilter_float64_1D(self.b, self.a, y0_squared_dec, self.zf)
+        if realizable > 0:
+            # the chunks of 2**Ndec samples are contiguous, so the whole block is processed at once
+            length = realizable * self.reader.step
+            # first channel
+            y0 = self.audiobuffer.data_indexed(self.reader.index + length, length)[0, :]
 
-                self.level_rms = 10. * np.log10(max(self.level, 1e-150))
+            # subsample, one point per chunk
+            y0_squared_dec = self.subsampler.push(y0**2)
 
-                l = np.array([self.level_rms])
-                l.shape = (1, 1)
+            levels, self.zf = pyx_lfilter_float64_1D(self.b, self.a, y0_squared_dec, self.zf)
 
-                self.ringbuffer.push(l)
+            self.level = levels[-1]
+            self.level_rms = 10. * np.log10(max(self.level, 1e-150))
 
-                self.old_index += needed
+            self.reader.advance(realizable)
 
-            self.time = np.arange(self.length_samples) / self.subsampled_sampling_rate
+            self.history.append(levels[:, np.newaxis])
 
-            levels = self.ringbuffer.data(self.length_samples)
+            # the newest points, averaged in power over each pixel
+            span = self.length_seconds * self.subsampled_sampling_rate
+            count = self.history.count
+            power = self.history.pooled(count - span, count, self.display_points, MEAN)[:, 0]
 
-            self.PlotZoneUp.setdata(self.time/60., levels[0, :])
+            time = np.linspace(0., self.length_seconds / 60., self.display_points)
+            self.mailbox.post((time, 10. * np.log10(np.maximum(power, 1e-150))), self.audiobuffer.lastCaptureTime)
 
     # method
     def canvasUpdate(self):
-        # nothing to do here
-        return
+        self.display_points = max(self.PlotZoneUp.canvasWidget.width() // self.PlotZoneUp.resolution_divider, 2)
+
+        result = self.mailbox.take()
+        if result is not None:
+            self.PlotZoneUp.setdata(*result)
+            self.PlotZoneUp.canvasUpdate()
+
+    def set_display_resolution(self, divider):
+        self.PlotZoneUp.set_resolution_divider(divider)
 
     def setmin(self, value):
         self.level_min = value
@@ -207,6 +250,13 @@ class LongLevelWidget(QtWidgets.QWidget):
         self.level_max = value
         self.PlotZoneUp.setverticalrange(self.level_min, self.level_max)
 
+    def settimerange(self, minutes):
+        self.length_seconds = minutes * 60.
+
+    def sethistory(self, hours):
+        with self.lock:
+            self.history = self.create_history(hours)
+
     # slot
     def settings_called(self, checked):
         self.settings_dialog.show()
@@ -24,6 +24,8 @@ from friture.audiobackend import SAMPLING_RATE
 #DEFAULT_MINTIME = 20
 DEFAULT_LEVEL_MIN = -70
 DEFAULT_LEVEL_MAX = -20
+DEFAULT_TIMERANGE = 10.  # minutes
+DEFAULT_HISTORY = 12.  # hours
 #DEFAULT_RESPONSE_TIME = 0.025
 #DEFAULT_RESPONSE_TIME_INDEX = 0
 
@@ -53,18 +55,41 @@ class LongLevels_Settings_Dialog(QtWidgets.QDialog):
         self.spinBox_specmax.setObjectName("longlevels_specmax")
         self.spinBox_specmax.setSuffix(" dB")
 
+        self.doubleSpinBox_timerange = QtWidgets.QDoubleSpinBox(self)
+        self.doubleSpinBox_timerange.setDecimals(1)
+        self.doubleSpinBox_timerange.setMinimum(0.1)
+        self.doubleSpinBox_timerange.setMaximum(24. * 60.)
+        self.doubleSpinBox_timerange.setProperty("value", DEFAULT_TIMERANGE)
+        self.doubleSpinBox_timerange.setObjectName("longlevels_timerange")
+        self.doubleSpinBox_timerange.setSuffix(" min")
+
+        self.doubleSpinBox_history = QtWidgets.QDoubleSpinBox(self)
+        self.doubleSpinBox_history.setKeyboardTracking(False)
+        self.doubleSpinBox_history.setDecimals(1)
+        self.doubleSpinBox_history.setMinimum(0.1)
+        self.doubleSpinBox_history.setMaximum(7. * 24.)
+        self.doubleSpinBox_history.setProperty("value", DEFAULT_HISTORY)
+        self.doubleSpinBox_history.setObjectName("longlevels_history")
+        self.doubleSpinBox_history.setSuffix(" h")
+
         self.formLayout.addRow("Max:", self.spinBox_specmax)
         self.formLayout.addRow("Min:", self.spinBox_specmin)
+        self.formLayout.addRow("Time range:", self.doubleSpinBox_timerange)
+        self.formLayout.addRow("History:", self.doubleSpinBox_history)
 
         self.setLayout(self.formLayout)
 
         self.spinBox_specmin.valueChanged.connect(self.parent().setmin)
         self.spinBox_specmax.valueChanged.connect(self.parent().setmax)
+        self.doubleSpinBox_timerange.valueChanged.connect(self.parent().settimerange)
+        self.doubleSpinBox_history.valueChanged.connect(self.parent().sethistory)
 
     # method
     def saveState(self, settings):
         settings.setValue("Min", self.spinBox_specmin.value())
         settings.setValue("Max", self.spinBox_specmax.value())
+        settings.setValue("timeRange", self.doubleSpinBox_timerange.value())
+        settings.setValue("history", self.doubleSpinBox_history.value())
 
     # method
     def restoreState(self, settings):
@@ -72,3 +97,7 @@ class LongLevels_Settings_Dialog(QtWidgets.QDialog):
         self.spinBox_specmin.setValue(colorMin)
         colorMax = settings.value("Max", DEFAULT_LEVEL_MAX, type=int)
         self.spinBox_specmax.setValue(colorMax)
+        timeRange = settings.value("timeRange", DEFAULT_TIMERANGE, type=float)
+        self.doubleSpinBox_timerange.setValue(timeRange)
+        history = settings.value("history", DEFAULT_HISTORY, type=float)
+        self.doubleSpinBox_history.setValue(history)
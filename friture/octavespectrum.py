@@ -17,9 +17,12 @@
 # You should have received a copy of the GNU General Public License
 # along with Friture.  If not, see <http://www.gnu.org/licenses/>.
 
+import threading
+
 from PyQt5 import QtWidgets
 from numpy import log10, array, arange, where
 from friture.histplot import HistPlot
+from friture.analysisthread import Mailbox
 from friture.octavespectrum_settings import (OctaveSpectrum_Settings_Dialog,  # settings dialog
                                              DEFAULT_SPEC_MIN,
                                              DEFAULT_SPEC_MAX,
@@ -27,8 +30,7 @@ from friture.octavespectrum_settings import (OctaveSpectrum_Settings_Dialog,  #
                                              DEFAULT_BANDSPEROCTAVE,
                                              DEFAULT_RESPONSE_TIME)
 
-from friture.filter import (octave_filter_bank_decimation, octave_frequencies,
-                            octave_filter_bank_decimation_filtic, NOCTAVE)
+from friture.filter import OctaveFilterBank, octave_frequencies, NOCTAVE
 
 from friture_extensions.exp_smoothing_conv import pyx_exp_smoothed_value
 
@@ -66,6 +68,11 @@ class OctaveSpectrum_Widget(QtWidgets.QWidget):
         self.filters = octave_filters(DEFAULT_BANDSPEROCTAVE)
         self.dispbuffers = [0] * DEFAULT_BANDSPEROCTAVE * NOCTAVE
 
+        # handle_new_data runs in the analysis thread, while the settings are changed from the GUI thread
+        self.lock = threading.RLock()
+        # ready-to-draw bands levels, handed over to the GUI thread
+        self.mailbox = Mailbox()
+
         # set kernel and parameters for the smoothing filter
         self.setresponsetime(self.response_time)
 
@@ -76,6 +83,11 @@ class OctaveSpectrum_Widget(QtWidgets.QWidget):
     def set_buffer(self, buffer):
         self.audiobuffer = buffer
 
+    def closeEvent(self, event):
+        with self.lock:
+            self.audiobuffer = None
+        super().closeEvent(event)
+
     def compute_kernels(self, alphas, Ns):
         kernels = []
         for alpha, N in zip(alphas, Ns):
@@ -97,10 +109,21 @@ class OctaveSpectrum_Widget(QtWidgets.QWidget):
             return value
 
     def handle_new_data(self, floatdata):
+        with self.lock:
+            result = self.process(floatdata)
+
+            if result is not None:
+                self.mailbox.post(result, self.audiobuffer.lastCaptureTime)
+
+    def process(self, floatdata):
+        # the dock may have been closed while this block was waiting for the lock
+        if self.audiobuffer is None:
+            return None
+
         # the behaviour of the filters functions is sometimes
         # unexpected when they are called on empty arrays
         if floatdata.shape[1] == 0:
-            return
+            return None
 
         # for now, take the first channel only
         floatdata = floatdata[0, :]
@@ -127,10 +150,14 @@ class OctaveSpectrum_Widget(QtWidgets.QWidget):
 
         epsilon = 1e-30
         db_spectrogram = 10 * log10(sp + epsilon) + w
-        self.PlotZoneSpect.setdata(self.filters.flow, self.filters.fhigh, self.filters.f_nominal, db_spectrogram)
+        return self.filters.flow, self.filters.fhigh, self.filters.f_nominal, db_spectrogram
 
     # method
     def canvasUpdate(self):
+        result = self.mailbox.take()
+        if result is not None:
+            self.PlotZoneSpect.setdata(*result)
+
         if not self.isVisible():
             return
 
@@ -153,25 +180,33 @@ class OctaveSpectrum_Widget(QtWidgets.QWidget):
         # time = 0.025 #IMPULSE setting for a sound level meter
         # time = 0.125 #FAST setting for a sound level meter
         # time = 1. #SLOW setting for a sound level meter
-        self.response_time = response_time
-
-        # an exponential smoothing filter is a simple IIR filter
-        # s_i = alpha*x_i + (1-alpha)*s_{i-1}
-        # we compute alpha so that the N most recent samples represent 100*w percent of the output
-        w = 0.65
-        decs = self.filters.get_decs()
-        ns = [self.response_time * SAMPLING_RATE / dec for dec in decs]
-        Ns = [2 * 4096 / dec for dec in decs]
-        self.alphas = [1. - (1. - w) ** (1. / (n + 1)) for n in ns]
-        # print(ns, Ns)
-        self.kernels = self.compute_kernels(self.alphas, Ns)
+        with self.lock:
+            self.response_time = response_time
+
+            # an exponential smoothing filter is a simple IIR filter
+            # s_i = alpha*x_i + (1-alpha)*s_{i-1}
+            # we compute alpha so that the N most recent samples represent 100*w percent of the output
+            w = 0.65
+            decs = self.filters.get_decs()
+            ns = [self.response_time * SAMPLING_RATE / dec for dec in decs]
+            Ns = [2 * 4096 / dec for dec in decs]
+            self.alphas = [1. - (1. - w) ** (1. / (n + 1)) for n in ns]
+            # print(ns, Ns)
+            self.kernels = self.compute_kernels(self.alphas, Ns)
+
+    def resync(self):
+        with self.lock:
+            # the filters and the smoothing start over from the newest samples
+            self.filters.bank.reset()
+            self.dispbuffers = [0] * len(self.dispbuffers)
 
     def setbandsperoctave(self, bandsperoctave):
-        self.filters.setbandsperoctave(bandsperoctave)
-        # recreate the ring buffers
-        self.dispbuffers = [0] * bandsperoctave * NOCTAVE
-        # reset kernel and parameters for the smoothing filter
-        self.setresponsetime(self.response_time)
+        with self.lock:
+            self.filters.setbandsperoctave(bandsperoctave)
+            # recreate the ring buffers
+            self.dispbuffers = [0] * bandsperoctave * NOCTAVE
+            # reset kernel and parameters for the smoothing filter
+            self.setresponsetime(self.response_time)
 
     def settings_called(self, checked):
         self.settings_dialog.show()
@@ -194,13 +229,7 @@ class octave_filters():
         self.setbandsperoctave(bandsperoctave)
 
     def filter(self, floatdata):
-        y, dec, zfs = octave_filter_bank_decimation(self.bdec, self.adec,
-                                                    self.boct, self.aoct,
-                                                    floatdata, zis=self.zfs)
-
-        self.zfs = zfs
-
-        return y, dec
+        return self.bank.filter(floatdata)
 
     def get_decs(self):
         decs = [2 ** j for j in range(0, NOCTAVE)[::-1] for i in range(0, self.bandsperoctave)]
@@ -211,10 +240,7 @@ class octave_filters():
         self.bandsperoctave = bandsperoctave
         self.nbands = NOCTAVE * self.bandsperoctave
         self.fi, self.flow, self.fhigh = octave_frequencies(self.nbands, self.bandsperoctave)
-        [self.boct, self.aoct, fi, flow, fhigh] = generated_filters.PARAMS['%d' % bandsperoctave]
-
-        self.boct = [array(f) for f in self.boct]
-        self.aoct = [array(f) for f in self.aoct]
+        [self.sos, fi, flow, fhigh] = generated_filters.PARAMS['%d' % bandsperoctave]
 
         # [self.b_nodec, self.a_nodec, fi, fl, fh] = octave_filters(self.nbands, self.bandsperoctave)
 
@@ -225,7 +251,7 @@ class octave_filters():
         self.C = 0.06 + 20. * log10(Rc)
         self.B = 0.17 + 20. * log10(Rb)
         self.A = 2.0 + 20. * log10(Ra)
-        self.zfs = octave_filter_bank_decimation_filtic(self.bdec, self.adec, self.boct, self.aoct)
+        self.bank = OctaveFilterBank(self.bdec, self.adec, self.sos)
 
         if bandsperoctave == 1:
             # with 1 band per octave, we would need the "R3.33" Renard series, but it does not exist.
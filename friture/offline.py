@@ -0,0 +1,364 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2009 Timothée Lecomte
+
+# This file is part of Friture.
+#
+# Friture is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as published by
+# the Free Software Foundation.
+#
+# Friture is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Friture.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Headless analysis of recordings, faster than real time.
+
+The files are streamed in large blocks through the same DSP code as the
+live widgets (audioproc for the spectrum, OctaveFilterBank for the octave
+bands), without any GUI. The results are averaged over fixed periods and
+written to one .npz file per recording:
+
+    friture analyze recording.wav --octave 3 --spectrum 8192
+    friture analyze recordings/ --jobs 4 --output results/
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from friture import generated_filters
+from friture.defaults import SAMPLING_RATE
+from friture.audioproc import audioproc, frequency_weightings
+from friture.filesource import parse_wav_header, map_samples, decode_samples, sample_conversion
+from friture.filter import OctaveFilterBank, octave_frequencies, NOCTAVE
+
+DEFAULT_PERIOD = 1.
+DEFAULT_FFT_SIZE = 8192
+DEFAULT_BANDS_PER_OCTAVE = 3
+DEFAULT_WEIGHTING = "none"
+WEIGHTINGS = ["none", "A", "B", "C"]
+
+# number of samples read from the file at once
+BLOCK_SIZE = 2 ** 18
+
+# the spectrum frames overlap by half
+SPECTRUM_OVERLAP = 2
+
+# floor of the power values, to avoid log10(0)
+EPSILON = 1e-30
+
+
+def read_wav_blocks(path, block_size=BLOCK_SIZE):
+    """Yield the samples of a wav file as float64 arrays of shape (frames, channels), scaled to [-1, 1).
+
+    The file is memory-mapped and read like the live file source (see friture.filesource),
+    so that both accept the same formats."""
+    dtype, channels, sampling_rate, offset, size = parse_wav_header(path)
+    data = map_samples(path, dtype, channels, offset, size)
+    sample_offset, scale = sample_conversion(dtype)
+
+    for start in range(0, data.shape[0], block_size):
+        block = decode_samples(data[start:start + block_size]).astype(np.float64)
+        if sample_offset != 0.:
+            block -= sample_offset
+        if scale != 1.:
+            block *= scale
+        yield block
+
+
+def accumulate(sums, counts, values, positions, period, reduce=np.add):
+    """Reduce the rows of 'values' into the slots of the periods that contain their 'positions'.
+
+    'positions' are increasing input sample indices, so that each period is a contiguous run of rows."""
+    if positions.shape[0] == 0:
+        return
+
+    ids = positions // period
+    starts = np.concatenate(([0], np.nonzero(np.diff(ids))[0] + 1))
+    slots = ids[starts]
+
+    reduced = reduce.reduceat(values, starts, axis=0)
+    if reduce is np.add:
+        sums[slots] += reduced
+    else:
+        sums[slots] = reduce(sums[slots], reduced)
+
+    if counts is not None:
+        counts[slots] += np.diff(np.concatenate((starts, [positions.shape[0]])))
+
+
+def to_db(sums, counts, weighting=0.):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = sums / counts.reshape(counts.shape + (1,) * (sums.ndim - 1))
+    db = 10. * np.log10(mean + EPSILON) + weighting
+    # periods without any value
+    db[counts == 0] = np.nan
+    return db
+
+
+class OfflineAnalyzer:
+    """Spectrum, octave bands and levels of a signal, averaged over periods.
+
+    The signal is given block by block to process(), in blocks of any size,
+    and the results are returned by results() once the whole signal is processed."""
+
+    def __init__(self, length, sampling_rate=SAMPLING_RATE, period=DEFAULT_PERIOD, fft_size=DEFAULT_FFT_SIZE,
+                 bands_per_octave=DEFAULT_BANDS_PER_OCTAVE, weighting=DEFAULT_WEIGHTING):
+        self.logger = logging.getLogger(__name__)
+
+        self.sampling_rate = sampling_rate
+        self.period = max(1, int(round(period * sampling_rate)))
+        self.n_periods = max(1, -(-length // self.period))
+        self.weighting = weighting
+
+        # the input sample index of the next block
+        self.offset = 0
+
+        # levels
+        self.energy = np.zeros(self.n_periods)
+        self.peak = np.zeros(self.n_periods)
+        self.level_counts = np.zeros(self.n_periods, dtype=np.int64)
+
+        # spectrum
+        self.proc = None
+        if fft_size > 0:
+            self.proc = audioproc()
+            self.proc.set_fftsize(fft_size)
+            self.hop = fft_size // SPECTRUM_OVERLAP
+            # samples kept from the previous block for the overlapping frames
+            self.tail = np.zeros(0)
+            self.freq = np.linspace(0, sampling_rate / 2, fft_size // 2 + 1)
+            self.spectrum = np.zeros((self.n_periods, self.freq.shape[0]))
+            self.spectrum_counts = np.zeros(self.n_periods, dtype=np.int64)
+
+        # octave bands
+        self.bank = None
+        if bands_per_octave > 0:
+            bdec, adec = generated_filters.PARAMS['dec']
+            sos = generated_filters.PARAMS['%d' % bands_per_octave][0]
+            self.bank = OctaveFilterBank(bdec, adec, sos)
+            self.bands_per_octave = bands_per_octave
+
+            # the filters are designed for SAMPLING_RATE, their frequencies scale with the sampling rate
+            fi, flow, fhigh = octave_frequencies(NOCTAVE * bands_per_octave, bands_per_octave)
+            scale = sampling_rate / float(SAMPLING_RATE)
+            if scale != 1.:
+                self.logger.warning("Sampling rate %d Hz differs from %d Hz: octave bands are shifted", sampling_rate, SAMPLING_RATE)
+            self.fi, self.flow, self.fhigh = fi * scale, flow * scale, fhigh * scale
+
+            self.bands = np.zeros((self.n_periods, NOCTAVE * bands_per_octave))
+            self.band_counts = np.zeros((self.n_periods, NOCTAVE), dtype=np.int64)
+            # number of samples output so far by each octave of the bank, from the highest one
+            self.octave_offsets = [0] * NOCTAVE
+
+    def process(self, x):
+        x = np.ascontiguousarray(x, dtype=np.float64)
+        positions = self.offset + np.arange(x.shape[0])
+
+        accumulate(self.energy, self.level_counts, x ** 2, positions, self.period)
+        accumulate(self.peak, None, np.abs(x), positions, self.period, reduce=np.maximum)
+
+        if self.proc is not None:
+            self.process_spectrum(x)
+
+        if self.bank is not None:
+            self.process_bands(x)
+
+        self.offset += x.shape[0]
+
+    def process_spectrum(self, x):
+        fft_size = self.proc.fft_size
+        samples = np.concatenate((self.tail, x))
+        if samples.shape[0] < fft_size:
+            self.tail = samples
+            return
+
+        count = (samples.shape[0] - fft_size) // self.hop + 1
+        spectra = self.proc.analyzelive_batch(samples, count, self.hop)
+
+        # input sample index of the last sample of each frame
+        first_start = self.offset - self.tail.shape[0]
+        ends = first_start + fft_size - 1 + self.hop * np.arange(count)
+        accumulate(self.spectrum, self.spectrum_counts, spectra, ends, self.period)
+
+        self.tail = samples[count * self.hop:].copy()
+
+    def process_bands(self, x):
+        y, decs = self.bank.filter(x)
+
+        for octave in range(NOCTAVE):
+            # bands are ordered by increasing frequency, the highest octave being the last one
+            start = (NOCTAVE - 1 - octave) * self.bands_per_octave
+            stop = start + self.bands_per_octave
+            dec = decs[start]
+            n = y[start].shape[0]
+
+            # the decimators keep the even samples, so that decimated sample m is input sample m * dec
+            positions = (self.octave_offsets[octave] + np.arange(n)) * dec
+            energy = np.stack(y[start:stop], axis=-1) ** 2
+
+            bands = self.bands[:, start:stop]
+            accumulate(bands, self.band_counts[:, NOCTAVE - 1 - octave], energy, positions, self.period)
+
+            self.octave_offsets[octave] += n
+
+    def results(self):
+        with np.errstate(divide='ignore'):
+            peak_db = 20. * np.log10(self.peak)
+        peak_db[self.level_counts == 0] = np.nan
+
+        results = {
+            'sampling_rate': self.sampling_rate,
+            'period': self.period / float(self.sampling_rate),
+            'time': np.arange(self.n_periods) * self.period / float(self.sampling_rate),
+            'rms': to_db(self.energy, self.level_counts),
+            'peak': peak_db,
+            'weighting': self.weighting,
+        }
+
+        if self.proc is not None:
+            results['spectrum_freq'] = self.freq
+            w = self.weighting_db(self.freq)
+            results['spectrum'] = to_db(self.spectrum, self.spectrum_counts, w).astype(np.float32)
+
+        if self.bank is not None:
+            results['octave_freq'] = self.fi
+            results['octave_flow'] = self.flow
+            results['octave_fhigh'] = self.fhigh
+            w = self.weighting_db(self.fi)
+            counts = np.repeat(self.band_counts, self.bands_per_octave, axis=1)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                bands_db = 10. * np.log10(self.bands / counts + EPSILON) + w
+            bands_db[counts == 0] = np.nan
+            results['octave'] = bands_db.astype(np.float32)
+
+        return results
+
+    def weighting_db(self, f):
+        if self.weighting == "none":
+            return 0.
+        A, B, C = frequency_weightings(f)
+        return {"A": A, "B": B, "C": C}[self.weighting]
+
+
+def analyze_file(path, output_dir=None, channel=0, period=DEFAULT_PERIOD, fft_size=DEFAULT_FFT_SIZE,
+                 bands_per_octave=DEFAULT_BANDS_PER_OCTAVE, weighting=DEFAULT_WEIGHTING):
+    """Analyze one wav file and save the results next to it, or in output_dir. Returns the output path."""
+    logger = logging.getLogger(__name__)
+    start_time = time.time()
+
+    dtype, channels, sampling_rate, offset, size = parse_wav_header(path)
+    length = size // (dtype.itemsize * channels)
+
+    if channel >= channels:
+        raise ValueError("%s has %d channel(s), channel %d cannot be analyzed" % (path, channels, channel))
+
+    analyzer = OfflineAnalyzer(length, sampling_rate, period, fft_size, bands_per_octave, weighting)
+    for block in read_wav_blocks(path):
+        analyzer.process(block[:, channel])
+
+    if output_dir is None:
+        output_dir = os.path.dirname(path)
+    name = os.path.splitext(os.path.basename(path))[0]
+    output_path = os.path.join(output_dir, name + ".npz")
+    np.savez(output_path, **analyzer.results())
+
+    elapsed = time.time() - start_time
+    duration = length / float(sampling_rate)
+    logger.info("%s: %.1f s analyzed in %.1f s (%.0fx real time) -> %s",
+                path, duration, elapsed, duration / max(elapsed, 1e-9), output_path)
+
+    return output_path
+
+
+def list_recordings(inputs):
+    paths = []
+    for input_path in inputs:
+        if os.path.isdir(input_path):
+            paths += sorted(os.path.join(input_path, name) for name in os.listdir(input_path)
+                            if name.lower().endswith(".wav"))
+        else:
+            paths += [input_path]
+    return paths
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="friture analyze",
+                                     description="Analyze wav recordings without the GUI, and save the results as .npz files.")
+    parser.add_argument("inputs", nargs="+", help="wav files, or directories of wav files")
+    parser.add_argument("--output", "-o", default=None, help="output directory (default: next to each input)")
+    parser.add_argument("--spectrum", type=int, default=DEFAULT_FFT_SIZE, metavar="FFT_SIZE",
+                        help="FFT size of the spectrum, 0 to disable (default: %(default)s)")
+    parser.add_argument("--octave", type=int, default=DEFAULT_BANDS_PER_OCTAVE, metavar="BANDS",
+                        choices=[0] + sorted(int(key) for key in generated_filters.PARAMS if key != 'dec'),
+                        help="bands per octave, 0 to disable (default: %(default)s)")
+    parser.add_argument("--period", type=float, default=DEFAULT_PERIOD,
+                        help="averaging period of the results, in seconds (default: %(default)s)")
+    parser.add_argument("--weighting", choices=WEIGHTINGS, default=DEFAULT_WEIGHTING,
+                        help="frequency weighting of the spectrum and octave bands (default: %(default)s)")
+    parser.add_argument("--channel", type=int, default=0, help="channel to analyze (default: %(default)s)")
+    parser.add_argument("--jobs", "-j", type=int, default=1,
+                        help="number of recordings analyzed in parallel, 0 for one per CPU (default: %(default)s)")
+
+    args = parser.parse_args(argv)
+
+    if args.spectrum < 0 or (args.spectrum > 0 and args.spectrum & (args.spectrum - 1) != 0):
+        parser.error("the FFT size must be a power of 2")
+    if args.period <= 0:
+        parser.error("the period must be positive")
+
+    return args
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    logger = logging.getLogger(__name__)
+
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+
+    paths = list_recordings(args.inputs)
+    if len(paths) == 0:
+        logger.error("No wav file to analyze")
+        return 1
+
+    if args.output is not None:
+        os.makedirs(args.output, exist_ok=True)
+
+    options = dict(output_dir=args.output, channel=args.channel, period=args.period, fft_size=args.spectrum,
+                   bands_per_octave=args.octave, weighting=args.weighting)
+
+    jobs = args.jobs if args.jobs > 0 else os.cpu_count()
+    jobs = min(jobs, len(paths))
+
+    failures = 0
+    if jobs == 1:
+        for path in paths:
+            try:
+                analyze_file(path, **options)
+            except Exception:
+                logger.exception("Failed to analyze %s", path)
+                failures += 1
+    else:
+        # one process per recording, the analysis of a file is sequential
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [(path, executor.submit(analyze_file, path, **options)) for path in paths]
+            for path, future in futures:
+                try:
+                    future.result()
+                except Exception:
+                    logger.exception("Failed to analyze %s", path)
+                    failures += 1
+
+    logger.info("%d recording(s) analyzed, %d failure(s)", len(paths) - failures, failures)
+    return 1 if failures > 0 else 0
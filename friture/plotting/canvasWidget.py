@@ -20,6 +20,7 @@
 from PyQt5 import QtCore, QtGui, QtWidgets
 
 from .grid import Grid
+from friture.instrumentation import Instrumentation
 
 
 class CanvasWidget(QtWidgets.QWidget):
@@ -61,15 +62,16 @@ class CanvasWidget(QtWidgets.QWidget):
         return QtCore.QSize(50, 50)
 
     def paintEvent(self, event):
-        painter = QtGui.QPainter(self)
+        with Instrumentation().timed_paint(self):
+            painter = QtGui.QPainter(self)
 
-        self.drawBackground(painter)
-        self.drawData(painter)
-        self.drawRuler(painter)
-        self.drawBorder(painter)
+            self.drawBackground(painter)
+            self.drawData(painter)
+            self.drawRuler(painter)
+            self.drawBorder(painter)
 
-        self.drawTrackerText(painter)
-        painter.end()
+            self.drawTrackerText(painter)
+            painter.end()
 
     def resizeEvent(self, event):
         # give the opportunity to the scales to adapt
@@ -16,14 +16,19 @@ except ImportError:
 from OpenGL.arrays import vbo
 from ctypes import sizeof, c_float, c_void_p, c_uint
 
+from friture.instrumentation import Instrumentation
 
-def compileProgram(*shaders):
+
+def compileProgram(*shaders, attributes=()):
     """Copied from the PyOpenGL codebase, as suggested in the PyOpenGL doc.
     Does not call program.check_validate() because that fails on macos
-    because the framebuffer is not ready at initialization time"""
+    because the framebuffer is not ready at initialization time.
+    The attributes, if given, are bound to the locations 0, 1, 2..."""
     program = GL.glCreateProgram()
     for shader in shaders:
         GL.shaders.glAttachShader(program, shader)
+    for location, name in enumerate(attributes):
+        GL.glBindAttribLocation(program, location, name)
     program = GL.shaders.ShaderProgram(program)
     GL.glLinkProgram(program)
     program.check_linked()
@@ -68,6 +73,16 @@ class GlCanvasWidget(QtWidgets.QOpenGLWidget):
         self.backgroundNeedsUpdating = True
         self.matrixNotSet = True
 
+        # damage tracking: the canvas is repainted only when one of its layers has changed
+        self.dataDirty = True
+        self.gridDirty = True
+        self.trackerDirty = True
+
+        # the background and the grid are static, they are cached in a framebuffer object
+        # and copied on each repaint
+        self.static_fbo = None
+        self.staticLayersDirty = True
+
         self.horizontalScaleTransform = horizontalScaleTransform
         self.verticalScaleTransform = verticalScaleTransform
 
@@ -78,6 +93,8 @@ class GlCanvasWidget(QtWidgets.QOpenGLWidget):
         self.paused = False
 
         self.quad_shader = None
+        # program for instanced bars, None when instancing is not supported
+        self.bar_shader = None
         self.background_vbo = None
         self.border_vbo = None
         self.ruler_vbo = None
@@ -94,14 +111,17 @@ class GlCanvasWidget(QtWidgets.QOpenGLWidget):
     def attach(self, item):
         self.attachedItems.append(item)
         self.reviewOpaqueItems()
+        self.invalidateData()
 
     def detach(self, item):
         self.attachedItems.remove(item)
         self.reviewOpaqueItems()
+        self.invalidateData()
 
     def detachAll(self):
         self.attachedItems.clear()
         self.reviewOpaqueItems()
+        self.invalidateData()
 
     def pause(self):
         self.paused = True
@@ -109,6 +129,34 @@ class GlCanvasWidget(QtWidgets.QOpenGLWidget):
     def restart(self):
         self.paused = False
 
+    # the data of the attached items has changed
+    def invalidateData(self):
+        self.dataDirty = True
+
+    # the scale transforms have changed: everything has to be redrawn
+    def invalidateTransform(self):
+        self.dataDirty = True
+        self.invalidateGrid()
+        self.invalidateTracker()
+        # the settings can change while no data is flowing, so do not wait for the next canvasUpdate
+        self.update()
+
+    def invalidateGrid(self):
+        self.gridDirty = True
+        self.staticLayersDirty = True
+
+    # the ruler, the tracker text or the frequency label have changed
+    def invalidateTracker(self):
+        self.trackerDirty = True
+
+    def isDirty(self):
+        return self.dataDirty or self.gridDirty or self.trackerDirty
+
+    # request a repaint, only if something has changed since the last one
+    def canvasUpdate(self):
+        if self.isDirty():
+            self.update()
+
     def reviewOpaqueItems(self):
         self.anyOpaqueItem = False
         for item in self.attachedItems:
@@ -118,10 +166,19 @@ class GlCanvasWidget(QtWidgets.QOpenGLWidget):
             except:
                 # do nothing
                 continue
+        self.staticLayersDirty = True
 
     def drawGlData(self):
         for item in self.attachedItems:
-            item.glDraw(self.horizontalScaleTransform, self.verticalScaleTransform, self.rect(), self.data_vbo, self.quad_shader)
+            glDrawInstanced = getattr(item, "glDrawInstanced", None)
+            if glDrawInstanced is not None and self.bar_shader is not None:
+                GL.glUseProgram(self.bar_shader)
+                try:
+                    glDrawInstanced(self.horizontalScaleTransform, self.verticalScaleTransform, self.rect(), self.bar_shader)
+                finally:
+                    GL.glUseProgram(self.quad_shader)
+            else:
+                item.glDraw(self.horizontalScaleTransform, self.verticalScaleTransform, self.rect(), self.data_vbo, self.quad_shader)
 
     def sizeHint(self):
         return QtCore.QSize(50, 50)
@@ -274,6 +331,9 @@ class GlCanvasWidget(QtWidgets.QOpenGLWidget):
 
         self.quad_shader = compileProgram(quad_vertex_shader, quad_fragment_shader)
 
+        if self.supportsInstancing():
+            self.bar_shader = self.compileBarShader(fragment_shader_source)
+
         vertices = np.array(
             [[0, 100, 0],
              [100, 100, 0],
@@ -291,12 +351,76 @@ class GlCanvasWidget(QtWidgets.QOpenGLWidget):
         self.grid_vbo = vbo.VBO(vertices)
         self.data_vbo = vbo.VBO(vertices)
 
+    def supportsInstancing(self):
+        # glVertexAttribDivisor is core in OpenGL 3.3, and available on older contexts with ARB_instanced_arrays
+        return bool(GL.glVertexAttribDivisor) and bool(GL.glDrawArraysInstanced)
+
+    def compileBarShader(self, fragment_shader_source):
+        # each instance is a bar (x, width, top, intensity), expanded from its corners
+        legacy_vertex_shader_source = """
+            #version 110
+
+            // input
+            attribute vec2 corner;
+            attribute vec2 in_geometry;
+            attribute vec2 in_values;
+            uniform mat4 mvp;
+            uniform float baseline;
+            uniform vec3 base_color;
+            uniform vec3 intensity_color;
+
+            // output
+            varying vec3 out_color;
+
+            void main()
+            {
+                float x = in_geometry.x + corner.x * in_geometry.y;
+                float y = mix(baseline, in_values.x, corner.y);
+                gl_Position = mvp * vec4(x, y, 0.0, 1.0);
+                out_color = base_color + in_values.y * intensity_color;
+            }"""
+
+        core_vertex_shader_source = """
+            #version 150 core
+
+            // input
+            in vec2 corner;
+            in vec2 in_geometry;
+            in vec2 in_values;
+            uniform mat4 mvp;
+            uniform float baseline;
+            uniform vec3 base_color;
+            uniform vec3 intensity_color;
+
+            // output
+            out vec3 out_color;
+
+            void main()
+            {
+                float x = in_geometry.x + corner.x * in_geometry.y;
+                float y = mix(baseline, in_values.x, corner.y);
+                gl_Position = mvp * vec4(x, y, 0.0, 1.0);
+                out_color = base_color + in_values.y * intensity_color;
+            }"""
+
+        vertex_shader_source = core_vertex_shader_source if self.is_core else legacy_vertex_shader_source
+
+        try:
+            bar_vertex_shader = GL.shaders.compileShader(vertex_shader_source, GL.GL_VERTEX_SHADER)
+            bar_fragment_shader = GL.shaders.compileShader(fragment_shader_source, GL.GL_FRAGMENT_SHADER)
+            return compileProgram(bar_vertex_shader, bar_fragment_shader,
+                                  attributes=("corner", "in_geometry", "in_values"))
+        except Exception:
+            self.logger.exception("Failed to compile the bar shader, falling back to non-instanced rendering")
+            return None
+
     def setfmax(self, fmax):
         self.fmax = fmax
 
     def setShowFreqLabel(self, showFreqLabel):
         self.showFreqLabel = showFreqLabel
         # ask for update so the the label is actually erased or painted
+        self.invalidateTracker()
         self.update()
 
     def setGrid(self, xMajorTick, xMinorTick, yMajorTick, yMinorTick):
@@ -307,6 +431,7 @@ class GlCanvasWidget(QtWidgets.QOpenGLWidget):
 
         # trigger a grid update on next paintGL call
         self.gridNeedsUpdating = True
+        self.invalidateGrid()
 
     def updateGrid(self):
         w = self.width()
@@ -383,6 +508,10 @@ class GlCanvasWidget(QtWidgets.QOpenGLWidget):
             error = GL.glGetError()
 
     def paintGL(self):
+        with Instrumentation().timed_paint(self):
+            self.drawGL()
+
+    def drawGL(self):
         if self.quad_shader is None:
             return  # not yet initiliazed
 
@@ -401,8 +530,7 @@ class GlCanvasWidget(QtWidgets.QOpenGLWidget):
         try:
             self.setupViewport(self.width(), self.height())
 
-            self.drawBackground()
-            self.drawGrid()
+            self.drawStaticLayers()
             self.drawGlData()
             self.drawRuler()
             self.drawBorder()
@@ -418,9 +546,47 @@ class GlCanvasWidget(QtWidgets.QOpenGLWidget):
 
         painter.end()
 
-        if not self.paused:
-            # schedule a repaint !
-            self.update()
+        self.dataDirty = False
+        self.gridDirty = False
+        self.trackerDirty = False
+
+    def canCacheStaticLayers(self):
+        # the cache is copied with a framebuffer blit, which cannot target a multisampled framebuffer
+        return QtGui.QOpenGLFramebufferObject.hasOpenGLFramebufferBlit() and self.format().samples() <= 1
+
+    def drawStaticLayers(self):
+        if self.anyOpaqueItem:
+            return
+
+        if not self.canCacheStaticLayers():
+            self.drawBackground()
+            self.drawGrid()
+            return
+
+        # the framebuffer of the widget is in device pixels
+        ratio = self.devicePixelRatioF()
+        size = QtCore.QSize(int(self.width() * ratio), int(self.height() * ratio))
+
+        if self.static_fbo is None or self.static_fbo.size() != size:
+            self.static_fbo = QtGui.QOpenGLFramebufferObject(size)
+            self.staticLayersDirty = True
+
+        if self.staticLayersDirty:
+            self.static_fbo.bind()
+            try:
+                GL.glClearColor(1, 1, 1, 0)
+                GL.glClear(GL.GL_COLOR_BUFFER_BIT)
+                self.drawBackground()
+                self.drawGrid()
+            finally:
+                # binds the framebuffer of the widget back
+                self.static_fbo.release()
+
+            self.staticLayersDirty = False
+
+        rect = QtCore.QRect(QtCore.QPoint(0, 0), size)
+        # a null target is the framebuffer of the widget
+        QtGui.QOpenGLFramebufferObject.blitFramebuffer(None, rect, self.static_fbo, rect)
 
     def drawFreqMaxText(self, painter):
         if not self.showFreqLabel:
@@ -516,6 +682,7 @@ class GlCanvasWidget(QtWidgets.QOpenGLWidget):
         self.gridNeedsUpdating = True
         self.backgroundNeedsUpdating = True
         self.matrixNotSet = True
+        self.staticLayersDirty = True
 
         # give the opportunity to the scales to adapt
         self.resized.emit(self.width(), self.height())
@@ -527,8 +694,14 @@ class GlCanvasWidget(QtWidgets.QOpenGLWidget):
             scale = pyrr.Vector3([1.0, 1.0, 1.0])
             mvp = self.build_model_view_projection_matrix(translation, rotation, scale)
 
-            mvp_uniform_location = GL.glGetUniformLocation(self.quad_shader, "mvp")
-            GL.glUniformMatrix4fv(mvp_uniform_location, 1, GL.GL_FALSE, mvp)
+            for program in [self.quad_shader, self.bar_shader]:
+                if program is None:
+                    continue
+                GL.glUseProgram(program)
+                mvp_uniform_location = GL.glGetUniformLocation(program, "mvp")
+                GL.glUniformMatrix4fv(mvp_uniform_location, 1, GL.GL_FALSE, mvp)
+
+            GL.glUseProgram(self.quad_shader)
 
             self.matrixNotSet = False
 
@@ -629,15 +802,18 @@ class GlCanvasWidget(QtWidgets.QOpenGLWidget):
         self.mousey = event.y()
         self.ruler = True
         # ask for update so the the ruler is actually painted
+        self.invalidateTracker()
         self.update()
 
     def mouseReleaseEvent(self, event):
         self.ruler = False
         # ask for update so the the ruler is actually erased
+        self.invalidateTracker()
         self.update()
 
     def mouseMoveEvent(self, event):
         if event.buttons() & QtCore.Qt.LeftButton:
             self.mousex = event.x()
             self.mousey = event.y()
+            self.invalidateTracker()
             self.update()
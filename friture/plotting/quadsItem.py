@@ -33,20 +33,34 @@ from ctypes import c_float, c_uint, c_void_p, sizeof
 import numpy as np
 
 
+# one bar is two triangles, whose corners are expanded by the bar shader
+BAR_CORNERS = np.array([[0, 1], [1, 1], [0, 0],
+                        [0, 0], [1, 0], [1, 1]], dtype=np.float32)
+
+
 class QuadsItem:
+    """Bars from a baseline, colored by their intensity (between 0 and 1):
+    color = base_color + intensity * intensity_color.
+
+    When the canvas has a bar shader (instanced rendering), each bar is one
+    instance: its position and width are uploaded when the transform changes,
+    its height and intensity on each frame, and the quads are expanded on the
+    GPU. Otherwise the quads are assembled here and drawn as triangles."""
 
-    def __init__(self, r, g, b, *args):
+    def __init__(self, base_color, intensity_color):
         self.x1 = np.array([0.1, 0.5, 1.])
         self.x2 = np.array([0.5, 1., 2.])
         self.y = np.array([0., 0., 0.])
         self.y_int = np.array([0., 0., 0.])
 
-        self.r = r
-        self.g = g
-        self.b = b
+        self.base_color = np.array(base_color, dtype=np.float32)
+        self.intensity_color = np.array(intensity_color, dtype=np.float32)
 
-        self.transformed_x1 = self.x1
-        self.transformed_x2 = self.x2
+        # screen coordinates of the bars, after rebinning
+        self.bar_x1 = self.x1
+        self.bar_x2 = self.x2
+        # number of bins averaged in each bar, on a linear scale
+        self.decimation = 1
 
         self.need_transform = True
 
@@ -55,6 +69,13 @@ class QuadsItem:
 
         self.vertices_data = np.array([], dtype=np.float32)
 
+        # instanced rendering
+        self.corner_buffer = None
+        self.geometry_buffer = None
+        self.values_buffer = None
+        self.geometry_changed = True
+        self.values_data = np.zeros((0, 2), dtype=np.float32)
+
     def set_baseline_displayUnits(self, baseline):
         self.baseline_transformed = False
         self.baseline = baseline
@@ -72,6 +93,12 @@ class QuadsItem:
         self.y = y
         self.y_int = y_int
 
+    def colors(self, y_int):
+        r = self.base_color[0] + self.intensity_color[0] * y_int
+        g = self.base_color[1] + self.intensity_color[1] * y_int
+        b = self.base_color[2] + self.intensity_color[2] * y_int
+        return r, g, b
+
     def prepareQuadData(self, x, y, w, baseline, r, g, b):
         h = y - baseline
         y = baseline + 0.*y
@@ -139,79 +166,70 @@ class QuadsItem:
     def transformUpdate(self):
         self.need_transform = True
 
-    def glDraw(self, xMap, yMap, rect, vbo, shader_program):
-        # transform the coordinates only when needed
-        if self.need_transform:
-            self.transformed_x1 = xMap.toScreen(self.x1)
-            self.transformed_x2 = xMap.toScreen(self.x2)
-
-            if xMap.log:
-                self.transformed_x1, self.transformed_x2, n = pre_tree_rebin(self.transformed_x1, self.transformed_x2)
-                self.n = [0] + n
-                self.N = 0
-                for i in range(len(self.n) - 1):
-                    self.N += (self.n[i + 1] - self.n[i]) // 2 ** i
-
-            self.need_transform = False
-
-        # for easier reading
-        x1 = self.transformed_x1
-        x2 = self.transformed_x2
+    def updateGeometry(self, xMap):
+        transformed_x1 = xMap.toScreen(self.x1)
+        transformed_x2 = xMap.toScreen(self.x2)
 
         if xMap.log:
-            y = tree_rebin(self.y, self.n, self.N)
-            y_int = tree_rebin(self.y_int, self.n, self.N)
+            transformed_x1, transformed_x2, n = pre_tree_rebin(transformed_x1, transformed_x2)
+            self.n = [0] + n
+            self.N = 0
+            for i in range(len(self.n) - 1):
+                self.N += (self.n[i + 1] - self.n[i]) // 2 ** i
         else:
-            delta = x2[2] - x1[1]
+            delta = transformed_x2[2] - transformed_x1[1]
 
             n = int(np.floor(1. / delta)) if delta > 0. else 0
-            if n > 1:
-                new_len = len(self.y) // n
-                rest = len(self.y) - new_len * n
-
-                if rest > 0:
-                    new_y = self.y[:-rest]
-                    new_y.shape = (new_len, n)
-                    y = np.mean(new_y, axis=1)
-
-                    new_y_int = self.y_int[:-rest]
-                    new_y_int.shape = (new_len, n)
-                    y_int = np.mean(new_y_int, axis=1)
+            self.decimation = max(n, 1)
+            if self.decimation > 1:
+                length = (len(transformed_x1) // n) * n
+                transformed_x1 = transformed_x1[:length:n]
+                transformed_x2 = transformed_x2[n-1:length:n]
 
-                    x1 = x1[:-rest:n]
-                    x2 = x2[n-1::n]
-                else:
-                    new_y = self.y.copy()
-                    new_y.shape = (new_len, n)
-                    y = np.mean(new_y, axis=1)
+        self.bar_x1 = transformed_x1
+        self.bar_x2 = transformed_x2
 
-                    new_y_int = self.y_int.copy()
-                    new_y_int.shape = (new_len, n)
-                    y_int = np.mean(new_y_int, axis=1)
+        self.need_transform = False
+        self.geometry_changed = True
 
-                    x1 = x1[::n]
-                    x2 = x2[n-1::n]
-
-            else:
-                y = self.y
-                y_int = self.y_int
+    def barValues(self, xMap):
+        """Return the values and the intensities of the bars, rebinned to the screen."""
+        if xMap.log:
+            return tree_rebin(self.y, self.n, self.N), tree_rebin(self.y_int, self.n, self.N)
 
-        transformed_y = yMap.toScreen(y)
+        if self.decimation > 1:
+            return decimate(self.y, self.decimation), decimate(self.y_int, self.decimation)
 
-        r = self.r(y_int)
-        g = self.g(y_int)
-        b = self.b(y_int)
+        return self.y, self.y_int
 
+    def screenBaseline(self, yMap):
         if self.baseline_transformed:
             # used for dual channel response measurement
-            baseline = yMap.toScreen(self.baseline)
+            return yMap.toScreen(self.baseline)
         else:
             # used for single channel analysis
-            baseline = self.baseline
+            return self.baseline
 
-        self.prepareQuadData(x1, transformed_y, x2 - x1, baseline, r, g, b)
+    def vertexData(self, xMap, yMap):
+        """Return the vertices (coordinates and colors) of the quads, for the non-instanced rendering."""
+        # transform the coordinates only when needed
+        if self.need_transform:
+            self.updateGeometry(xMap)
+
+        y, y_int = self.barValues(xMap)
+
+        transformed_y = yMap.toScreen(y)
+
+        r, g, b = self.colors(y_int)
+
+        baseline = self.screenBaseline(yMap)
+
+        self.prepareQuadData(self.bar_x1, transformed_y, self.bar_x2 - self.bar_x1, baseline, r, g, b)
+
+        return self.vertices_data
 
-        vbo.set_array(self.vertices_data)
+    def glDraw(self, xMap, yMap, rect, vbo, shader_program):
+        vbo.set_array(self.vertexData(xMap, yMap))
 
         vbo.bind()
         try:
@@ -228,6 +246,75 @@ class QuadsItem:
         finally:
             vbo.unbind()
 
+    def instanceValues(self, xMap, yMap):
+        """Return the per-frame instance data: the screen height and the intensity of each bar."""
+        # transform the coordinates only when needed
+        if self.need_transform:
+            self.updateGeometry(xMap)
+
+        y, y_int = self.barValues(xMap)
+
+        if self.values_data.shape[0] != y.shape[0]:
+            self.values_data = np.zeros((y.shape[0], 2), dtype=np.float32)
+
+        self.values_data[:, 0] = yMap.toScreen(y)
+        self.values_data[:, 1] = y_int
+        return self.values_data
+
+    def glDrawInstanced(self, xMap, yMap, rect, shader_program):
+        values = self.instanceValues(xMap, yMap)
+        count = values.shape[0]
+        if count == 0:
+            return
+
+        if self.corner_buffer is None:
+            self.corner_buffer, self.geometry_buffer, self.values_buffer = GL.glGenBuffers(3)
+            GL.glBindBuffer(GL.GL_ARRAY_BUFFER, self.corner_buffer)
+            GL.glBufferData(GL.GL_ARRAY_BUFFER, BAR_CORNERS.nbytes, BAR_CORNERS, GL.GL_STATIC_DRAW)
+            self.geometry_changed = True
+
+        # the positions and the widths only change with the transform
+        if self.geometry_changed:
+            geometry = np.zeros((count, 2), dtype=np.float32)
+            geometry[:, 0] = self.bar_x1
+            geometry[:, 1] = self.bar_x2 - self.bar_x1
+            GL.glBindBuffer(GL.GL_ARRAY_BUFFER, self.geometry_buffer)
+            GL.glBufferData(GL.GL_ARRAY_BUFFER, geometry.nbytes, geometry, GL.GL_STATIC_DRAW)
+            self.geometry_changed = False
+
+        # orphan the previous storage, so that the upload does not wait for the previous draw
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, self.values_buffer)
+        GL.glBufferData(GL.GL_ARRAY_BUFFER, values.nbytes, None, GL.GL_STREAM_DRAW)
+        GL.glBufferSubData(GL.GL_ARRAY_BUFFER, 0, values.nbytes, values)
+
+        GL.glUniform1f(GL.glGetUniformLocation(shader_program, "baseline"), self.screenBaseline(yMap))
+        GL.glUniform3fv(GL.glGetUniformLocation(shader_program, "base_color"), 1, self.base_color)
+        GL.glUniform3fv(GL.glGetUniformLocation(shader_program, "intensity_color"), 1, self.intensity_color)
+
+        # attribute locations are bound by the canvas: corner, geometry, values
+        try:
+            for location, buffer, divisor in [(0, self.corner_buffer, 0),
+                                              (1, self.geometry_buffer, 1),
+                                              (2, self.values_buffer, 1)]:
+                GL.glBindBuffer(GL.GL_ARRAY_BUFFER, buffer)
+                GL.glEnableVertexAttribArray(location)
+                GL.glVertexAttribPointer(location, 2, GL.GL_FLOAT, GL.GL_FALSE, 2 * sizeof(c_float), c_void_p(0))
+                GL.glVertexAttribDivisor(location, divisor)
+
+            GL.glDrawArraysInstanced(GL.GL_TRIANGLES, 0, BAR_CORNERS.shape[0], count)
+        finally:
+            # the divisors are part of the vertex array state, shared with the other items
+            for location in range(3):
+                GL.glVertexAttribDivisor(location, 0)
+                GL.glDisableVertexAttribArray(location)
+            GL.glBindBuffer(GL.GL_ARRAY_BUFFER, 0)
+
+
+def decimate(y, n):
+    """Average y by groups of n, dropping the incomplete last group."""
+    length = (len(y) // n) * n
+    return np.mean(y[:length].reshape((length // n, n)), axis=1)
+
 
 def pre_tree_rebin(x1, x2):
     if len(x2) == 0:
@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2009 Timothée Lecomte
+
+# This file is part of Friture.
+#
+# Friture is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as published by
+# the Free Software Foundation.
+#
+# Friture is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Friture.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Multi-resolution history of columns, for zooming out over long histories.
+
+Besides the full-resolution ring buffer, the columns are decimated in time
+by 2, 4, 8... into smaller ring buffers that cover the same duration. Each
+decimated level keeps the maximum (for peaks) and/or the mean (for energy,
+when the columns are powers) of the columns it covers, as requested. The levels are updated
+incrementally as the columns are appended, and a redraw reads from the
+coarsest level that still has one column per pixel, so that the amount of
+data read does not depend on the zoom."""
+
+import numpy as np
+
+MAXIMUM = "max"
+MEAN = "mean"
+
+# the coarsest level has at most this many columns
+MIN_LEVEL_CAPACITY = 64
+
+
+class PyramidLevel:
+
+    def __init__(self, factor, capacity, bins, dtype, allocate, reductions):
+        # each column of this level covers 'factor' full-resolution columns
+        self.factor = factor
+        self.capacity = capacity
+
+        if factor == 1:
+            # the maximum and the mean of a single column are the column itself
+            columns = allocate((capacity, bins), dtype)
+            self.columns = {reduction: columns for reduction in reductions}
+        else:
+            self.columns = {reduction: allocate((capacity, bins), dtype) for reduction in reductions}
+
+        # number of columns written since the creation
+        self.count = 0
+
+        # the last column of the finer level for each reduction, waiting for its pair
+        self.carry = None
+
+    def decimate(self, columns):
+        """Combine the columns of the finer level by pairs, for each reduction."""
+        if self.carry is not None:
+            columns = {reduction: np.concatenate((self.carry[reduction], data)) for reduction, data in columns.items()}
+
+        n = len(next(iter(columns.values())))
+        pairs = n // 2
+        if n % 2 == 1:
+            self.carry = {reduction: data[-1:].copy() for reduction, data in columns.items()}
+        else:
+            self.carry = None
+
+        decimated = {}
+        for reduction, data in columns.items():
+            even = data[0:2 * pairs:2]
+            odd = data[1:2 * pairs:2]
+            if reduction == MAXIMUM:
+                decimated[reduction] = np.maximum(even, odd)
+            else:
+                decimated[reduction] = 0.5 * (even + odd)
+        return decimated
+
+    def write(self, columns):
+        n = len(next(iter(columns.values())))
+        skipped = max(n - self.capacity, 0)
+        self.count += skipped
+        n -= skipped
+
+        start = self.count % self.capacity
+        direct = min(n, self.capacity - start)
+        for reduction, data in columns.items():
+            data = data[skipped:]
+            self.columns[reduction][start:start + direct] = data[:direct]
+            self.columns[reduction][:n - direct] = data[direct:]
+            if self.factor == 1:
+                # the same buffer for all the reductions
+                break
+
+        self.count += n
+
+    def first(self):
+        return max(self.count - self.capacity, 0)
+
+    def read(self, start, stop, reduction=MAXIMUM):
+        """Return the columns [start, stop), which must be in the ring, as an array of shape (stop - start, bins)."""
+        columns = self.columns[reduction]
+        first = start % self.capacity
+        last = first + stop - start
+        if last <= self.capacity:
+            return columns[first:last]
+        return np.concatenate((columns[first:], columns[:last - self.capacity]))
+
+
+class HistoryPyramid:
+
+    def __init__(self, capacity, bins, dtype=np.float32, allocate=np.zeros, reductions=(MAXIMUM, MEAN)):
+        """Keep the last 'capacity' columns of 'bins' values, and their decimated levels.
+
+        allocate(shape, dtype) returns the arrays of the ring buffers, so that they can be memory-mapped.
+        Only the given reductions are kept in the decimated levels, each one costs a buffer per level."""
+        self.capacity = capacity
+        self.bins = bins
+        self.dtype = dtype
+        self.reductions = tuple(reductions)
+
+        self.levels = []
+        factor = 1
+        while True:
+            level_capacity = -(-capacity // factor)
+            self.levels.append(PyramidLevel(factor, level_capacity, bins, dtype, allocate, self.reductions))
+            if level_capacity <= MIN_LEVEL_CAPACITY:
+                break
+            factor *= 2
+
+    @property
+    def count(self):
+        # number of full-resolution columns appended since the creation
+        return self.levels[0].count
+
+    def first(self):
+        """Index of the oldest full-resolution column still in the history."""
+        return self.levels[0].first()
+
+    def read(self, start, stop):
+        """Return the full-resolution columns [start, stop), as an array of shape (stop - start, bins)."""
+        return self.levels[0].read(start, stop)
+
+    def append(self, columns):
+        """Append the columns, of shape (n, bins)."""
+        reduced = {reduction: columns for reduction in self.reductions}
+        for level in self.levels:
+            if level.factor > 1:
+                reduced = level.decimate(reduced)
+            if len(reduced[self.reductions[0]]) == 0:
+                break
+            level.write(reduced)
+
+    def level_for(self, columns_per_pixel):
+        # the coarsest level that still has at least one column per pixel
+        k = int(np.floor(np.log2(max(columns_per_pixel, 1.))))
+        return self.levels[min(k, len(self.levels) - 1)]
+
+    def pooled(self, start, stop, width, reduction=MAXIMUM):
+        """Return the columns [start, stop) (fractional full-resolution indices), pooled in width pixels.
+
+        Each pixel takes the maximum or the mean of the columns that it covers, or the column under it
+        when zoomed in. The result has shape (width, bins), with zeros where there is no data.
+
+        The newest columns are not reduced yet in the decimated levels (less than 'factor' of them),
+        the pixels that cover them are pooled from the full-resolution columns."""
+        if reduction not in self.reductions:
+            raise ValueError("The history does not keep the %s reduction" % reduction)
+
+        out = np.zeros((max(width, 0), self.bins), dtype=self.dtype)
+        if width <= 0:
+            return out
+
+        level = self.level_for((stop - start) / width)
+
+        pixel_edges = np.linspace(start, stop, width + 1)
+        edges = np.floor(pixel_edges / level.factor).astype(np.int64)
+        # a pixel covers at least the column under it
+        lower = edges[:-1]
+        upper = np.maximum(edges[1:], lower + 1)
+
+        valid = (lower >= level.first()) & (upper <= level.count)
+        if np.any(valid):
+            valid_lower = lower[valid]
+            block_start = valid_lower[0]
+            block = level.read(block_start, upper[valid][-1], reduction)
+            indices = valid_lower - block_start
+
+            if reduction == MAXIMUM:
+                out[valid] = np.maximum.reduceat(block, indices, axis=0)
+            else:
+                # reduceat returns the column itself when an index is repeated, which is a length of one
+                lengths = np.maximum(np.diff(np.append(indices, block.shape[0])), 1)
+                out[valid] = np.add.reduceat(block, indices, axis=0) / lengths[:, np.newaxis]
+
+        if level.factor > 1:
+            full = self.levels[0]
+            full_lower = np.floor(pixel_edges[:-1]).astype(np.int64)
+            full_upper = np.maximum(np.floor(pixel_edges[1:]).astype(np.int64), full_lower + 1)
+            # the pixels that reach past the decimated columns, at most a few at the newest end
+            tail = (full_upper > level.count * level.factor) & (full_lower >= full.first()) & (full_lower < full.count)
+            for i in np.flatnonzero(tail):
+                block = full.read(full_lower[i], min(full_upper[i], full.count), reduction)
+                out[i] = block.max(axis=0) if reduction == MAXIMUM else block.mean(axis=0)
+
+        return out
@@ -17,34 +17,126 @@
 # You should have received a copy of the GNU General Public License
 # along with Friture.  If not, see <http://www.gnu.org/licenses/>.
 
-# FIXME problem when self.offset overflows the MAXINT limit !
+
+# The write offset is the absolute number of samples pushed since the creation
+# of the buffer. It is kept as a Python int, which has arbitrary precision, so it
+# never overflows: positions in the buffer are always taken modulo buffer_length,
+# and the readers cursors are absolute indices that compare with it directly.
 
 import logging
 
 from numpy import zeros
+from numpy.lib.stride_tricks import as_strided
+
+# samples reserved on top of what the readers declare, so that a late analysis
+# tick does not overwrite data that a reader has not consumed yet
+DEFAULT_HEADROOM = 10000
+
+
+class RingBufferReader:
+    """Cursor of one consumer of a RingBuffer.
+
+    The reader consumes frames of 'length' samples, every 'step' samples.
+    'index' is the absolute index where the last consumed frame ends, so the
+    next frame ends at index + step. The index is kept on a multiple of the step,
+    so that readers with the same step share the same frames grid.
+
+    When the reader lags so much that the samples of its next frame have
+    been overwritten, the lost frames are skipped and the overrun is counted."""
+
+    def __init__(self, ringbuffer, length, step):
+        self.logger = logging.getLogger(__name__)
+
+        self.ringbuffer = ringbuffer
+        self.length = length
+        self.step = step
+        self.overruns = 0
+        self.index = self.align(ringbuffer.offset)
+
+    def align(self, index):
+        return index - index % self.step
+
+    def pending(self):
+        """Return the number of complete frames that can be read."""
+
+        offset = self.ringbuffer.offset
+
+        if self.index > offset:
+            # the ring buffer has been reset
+            self.index = self.align(offset)
+            return 0
+
+        oldest_needed = self.index + self.step - self.length
+        oldest_kept = offset - self.ringbuffer.buffer_length
+        if oldest_needed < oldest_kept:
+            self.overruns += 1
+            skipped = (offset - self.index) // self.step
+            self.logger.info("Ring buffer reader overrun, skipping %d frames", skipped)
+            self.index = self.align(offset)
+            return 0
+
+        return (offset - self.index) // self.step
+
+    def frames(self, count):
+        """Return the next 'count' frames as a read-only view of shape (channels, count, length).
+
+        The cursor is not moved, call advance() once the frames have been used."""
+        return self.ringbuffer.frames(self.index + count * self.step, count, self.length, self.step)
+
+    def advance(self, count):
+        self.index += count * self.step
+
+    def skip_pending(self):
+        """Move the cursor to the newest samples, dropping the frames that have not been read."""
+        self.index = self.align(self.ringbuffer.offset)
 
 
 class RingBuffer():
 
-    def __init__(self):
+    def __init__(self, headroom=DEFAULT_HEADROOM):
         self.logger = logging.getLogger(__name__)
 
-        # buffer length is dynamic based on the needs
-        self.buffer_length = 10000
+        # buffer length is reserved from the readers needs, and grows dynamically for the other uses
+        self.headroom = headroom
+        self.buffer_length = headroom
         self.buffer = zeros((1, 2 * self.buffer_length))
         self.offset = 0
 
+        self.readers = []
+        self.reserved_length = self.buffer_length
+
+    def register_reader(self, length, step):
+        """Create a cursor for a consumer of frames of 'length' samples, taken every 'step' samples.
+
+        The capacity needed by the reader is reserved now, and allocated by the
+        next push, so that the readers never make the buffer grow."""
+        reader = RingBufferReader(self, length, step)
+        self.readers.append(reader)
+        self.update_reservation()
+        return reader
+
+    def unregister_reader(self, reader):
+        if reader in self.readers:
+            self.readers.remove(reader)
+
+    def update_reservation(self):
+        # the buffer is not shrunk when the needs decrease, to avoid reallocations back and forth
+        needed = max([reader.length + reader.step for reader in self.readers] + [0]) + self.headroom
+        self.reserved_length = max(self.reserved_length, needed)
+
     def push(self, floatdata):
         # update the circular buffer
 
         dim = floatdata.shape[0]
         l = floatdata.shape[1]
 
-        if dim != self.buffer.shape[0]:
-            # switched from single to dual channels or vice versa
-            self.buffer = zeros((dim, 2 * self.buffer_length))
+        if dim != self.buffer.shape[0] or floatdata.dtype != self.buffer.dtype:
+            # switched from single to dual channels or vice versa,
+            # or the processing precision was changed
+            self.buffer = zeros((dim, 2 * self.buffer_length), dtype=floatdata.dtype)
 
-        self.grow_if_needed(l)
+        # allocate what has been reserved by the readers, in the writer thread
+        self.grow_if_needed(max(l, self.reserved_length))
 
         # first copy, always complete
         offset = self.offset % self.buffer_length
@@ -95,6 +187,16 @@ class RingBuffer():
 
         return self.buffer[:, start0: stop0]
 
+    def frames(self, end, count, length, step):
+        """Return 'count' overlapping frames of 'length' samples, the last one ending at 'end'.
+
+        Frame k ends at end - (count - 1 - k) * step. The result is a read-only strided view
+        of shape (channels, count, length) on the buffer, so no data is copied."""
+        span = self.data_indexed(end, length + (count - 1) * step)
+        return as_strided(span, shape=(span.shape[0], count, length),
+                          strides=(span.strides[0], step * span.strides[1], span.strides[1]),
+                          writeable=False)
+
     def grow_if_needed(self, length):
         if length > self.buffer_length:
             # let the buffer grow according to our needs
@@ -104,7 +206,7 @@ class RingBuffer():
             self.logger.info("Ringbuffer: growing buffer for length %d", new_length)
 
             # create new buffer
-            newbuffer = zeros((self.buffer.shape[0], 2 * new_length))
+            newbuffer = zeros((self.buffer.shape[0], 2 * new_length), dtype=self.buffer.dtype)
             # copy existing data so that self.offset does not have to be changed
             old_offset_mod = self.offset % old_length
             new_offset_mod = self.offset % new_length
@@ -21,6 +21,7 @@ from PyQt5 import QtWidgets
 from numpy import log10, where, sign, arange, zeros
 from friture.timeplot import TimePlot
 from friture.audiobackend import SAMPLING_RATE
+from friture.analysisthread import Mailbox
 
 SMOOTH_DISPLAY_TIMER_PERIOD_MS = 25
 DEFAULT_TIMERANGE = 2 * SMOOTH_DISPLAY_TIMER_PERIOD_MS
@@ -48,6 +49,9 @@ class Scope_Widget(QtWidgets.QWidget):
         self.y = zeros(10)
         self.y2 = zeros(10)
 
+        # ready-to-draw curves, handed over from the analysis thread
+        self.mailbox = Mailbox()
+
     # method
     def set_buffer(self, buffer):
         self.audiobuffer = buffer
@@ -83,9 +87,10 @@ class Scope_Widget(QtWidgets.QWidget):
         datarange = width
         floatdata = floatdata[:, shift - datarange // 2: shift + datarange // 2]
 
-        self.y = floatdata[0, :]
+        # copy, since the ring buffer is overwritten before the curves are drawn
+        self.y = floatdata[0, :].copy()
         if twoChannels:
-            self.y2 = floatdata[1, :]
+            self.y2 = floatdata[1, :].copy()
         else:
             self.y2 = None
 
@@ -100,14 +105,24 @@ class Scope_Widget(QtWidgets.QWidget):
 
         self.time = (arange(len(self.y)) - datarange // 2) / float(SAMPLING_RATE)
 
-        if self.y2 is not None:
-            self.PlotZoneUp.setdataTwoChannels(self.time*1e3, self.y, self.y2)
-        else:
-            self.PlotZoneUp.setdata(self.time*1e3, self.y)
+        self.mailbox.post((self.time * 1e3, self.y, self.y2), self.audiobuffer.lastCaptureTime)
 
     # method
     def canvasUpdate(self):
-        return
+        result = self.mailbox.take()
+        if result is None:
+            return
+
+        time, y, y2 = result
+        if y2 is not None:
+            self.PlotZoneUp.setdataTwoChannels(time, y, y2)
+        else:
+            self.PlotZoneUp.setdata(time, y)
+
+        self.PlotZoneUp.canvasUpdate()
+
+    def set_display_resolution(self, divider):
+        self.PlotZoneUp.set_resolution_divider(divider)
 
     def pause(self):
         self.PlotZoneUp.pause()
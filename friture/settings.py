@@ -47,7 +47,7 @@ class Settings_Dialog(QtWidgets.QDialog, Ui_Settings_Dialog):
 
         devices = AudioBackend().get_readable_devices_list()
 
-        if devices == []:
+        if devices == [] and not AudioBackend().is_playing_source():
             # no audio input device: display a message and exit
             QtWidgets.QMessageBox.critical(self, no_input_device_title, no_input_device_message)
             QtCore.QTimer.singleShot(0, self.exitOnInit)
@@ -70,12 +70,15 @@ class Settings_Dialog(QtWidgets.QDialog, Ui_Settings_Dialog):
         second_channel = AudioBackend().get_current_second_channel()
         self.comboBox_secondChannel.setCurrentIndex(second_channel)
 
+        self.comboBox_precision.setCurrentIndex(AudioBackend().get_precision())
+
         # signals
         self.comboBox_inputDevice.currentIndexChanged.connect(self.input_device_changed)
         self.comboBox_firstChannel.activated.connect(self.first_channel_changed)
         self.comboBox_secondChannel.activated.connect(self.second_channel_changed)
         self.radioButton_single.toggled.connect(self.single_input_type_selected)
         self.radioButton_duo.toggled.connect(self.duo_input_type_selected)
+        self.comboBox_precision.currentIndexChanged.connect(self.precision_changed)
 
     # slot
     # used when no audio input device has been found, to exit immediately
@@ -162,21 +165,29 @@ class Settings_Dialog(QtWidgets.QDialog, Ui_Settings_Dialog):
             AudioBackend().set_duo_input()
             self.logger.info("Switching to difference between two inputs")
 
+    # slot
+    def precision_changed(self, index):
+        AudioBackend().set_precision(index)
+
     # method
     def saveState(self, settings):
         # for the input device, we search by name instead of index, since
         # we do not know if the device order stays the same between sessions
-        settings.setValue("deviceName", self.comboBox_inputDevice.currentText())
-        settings.setValue("firstChannel", self.comboBox_firstChannel.currentIndex())
-        settings.setValue("secondChannel", self.comboBox_secondChannel.currentIndex())
+        # a file or synthetic signal played from the command line does not replace the saved device
+        if not AudioBackend().is_playing_source():
+            settings.setValue("deviceName", self.comboBox_inputDevice.currentText())
+            settings.setValue("firstChannel", self.comboBox_firstChannel.currentIndex())
+            settings.setValue("secondChannel", self.comboBox_secondChannel.currentIndex())
         settings.setValue("duoInput", self.inputTypeButtonGroup.checkedId())
+        settings.setValue("precision", self.comboBox_precision.currentIndex())
 
     # method
     def restoreState(self, settings):
         device_name = settings.value("deviceName", "")
         device_index = self.comboBox_inputDevice.findText(device_name)
-        # change the device only if it exists in the device list
-        if device_index >= 0:
+        # change the device only if it exists in the device list,
+        # and keep the file or synthetic signal given on the command line if any
+        if device_index >= 0 and not AudioBackend().is_playing_source():
             self.comboBox_inputDevice.setCurrentIndex(device_index)
             channel = settings.value("firstChannel", 0, type=int)
             self.comboBox_firstChannel.setCurrentIndex(channel)
@@ -184,3 +195,6 @@ class Settings_Dialog(QtWidgets.QDialog, Ui_Settings_Dialog):
             self.comboBox_secondChannel.setCurrentIndex(channel)
             duo_input_id = settings.value("duoInput", 0, type=int)
             self.inputTypeButtonGroup.button(duo_input_id).setChecked(True)
+        # the precision does not depend on the device
+        precision = settings.value("precision", 0, type=int)
+        self.comboBox_precision.setCurrentIndex(precision)
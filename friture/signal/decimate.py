@@ -18,18 +18,33 @@
 # along with Friture.  If not, see <http://www.gnu.org/licenses/>.
 
 import numpy
-from friture_extensions.lfilter import pyx_lfilter_float64_1D
+from friture_extensions.filterbank import pyx_polyphase_decimate_float64
 
 
 def decimate(bdec, adec, x, zi):
     if len(x) == 0:
         raise Exception("Filter input is too small")
 
-    # could use a polyphase decimator here
-    x_dec, zf = pyx_lfilter_float64_1D(bdec, adec, x, zi)
+    # polyphase decimator: the discarded outputs are not computed
+    # zi is the direct form II state, of length max(len(adec), len(bdec)) - 1
+    bdec, adec = normalize_filter(bdec, adec)
+    zf = numpy.array(zi, dtype=numpy.float64)
+    work = numpy.empty(len(x) + len(adec) - 1)
+    x_dec = numpy.empty((len(x) + 1) // 2)
 
-    x_dec = x_dec[::2]
-    return x_dec, zf
+    count, phase = pyx_polyphase_decimate_float64(bdec, adec, numpy.ascontiguousarray(x, dtype=numpy.float64), zf, 0, work, x_dec)
+
+    return x_dec[:count], zf
+
+
+def normalize_filter(b, a):
+    '''pad b and a to the same length and normalize them so that a[0] = 1'''
+    n = max(len(b), len(a))
+    b_norm = numpy.zeros(n)
+    a_norm = numpy.zeros(n)
+    b_norm[:len(b)] = b
+    a_norm[:len(a)] = a
+    return b_norm / a_norm[0], a_norm / a_norm[0]
 
 
 def decimate_multiple(Ndec, bdec, adec, x, zis):
@@ -22,6 +22,12 @@ import logging
 
 import numpy as np
 
+from friture.signal.sparse import CSRMatrix
+
+# how the frequency bins are mapped to the pixels
+RESAMPLING_INTERPOLATION = 0  # linear interpolation at the pixel frequency
+RESAMPLING_MAX_POOLING = 1  # maximum of the bins that fall in the pixel, so that narrow peaks survive
+
 
 class Frequency_Resampler:
 
@@ -32,6 +38,13 @@ class Frequency_Resampler:
         self.minfreq = minfreq
         self.maxfreq = maxfreq
         self.nsamples = nsamples
+        self.mode = RESAMPLING_INTERPOLATION
+
+        # resampling matrices, built for a given frequency grid of the input
+        self.freq = None
+        self.interpolation = None
+        self.pooling = None
+
         self.update_xscale()
 
     def setfreqrange(self, minfreq, maxfreq):
@@ -48,6 +61,9 @@ class Frequency_Resampler:
         else:
             self.xscaled = np.linspace(self.minfreq, self.maxfreq, self.nsamples)
 
+        # the matrices are rebuilt on the next call to process
+        self.freq = None
+
     def setnsamples(self, nsamples):
         if self.nsamples != nsamples:
             self.nsamples = nsamples
@@ -60,13 +76,55 @@ class Frequency_Resampler:
             self.logfreqscale = logfreqscale
             self.update_xscale()
 
+    def setmode(self, mode):
+        self.mode = mode
+
+    def update_matrices(self, freq):
+        self.logger.info("building the frequency resampling matrices for %d bins to %d pixels", len(freq), self.nsamples)
+        self.freq = freq
+
+        # linear interpolation, clamped at the edges like numpy.interp
+        if len(freq) > 1:
+            i = np.clip(np.searchsorted(freq, self.xscaled, side='right') - 1, 0, len(freq) - 2)
+            t = np.clip((self.xscaled - freq[i]) / (freq[i + 1] - freq[i]), 0., 1.)
+            rows = [(np.array([j, j + 1]), np.array([1. - u, u])) for j, u in zip(i, t)]
+        else:
+            rows = [(np.array([0]), np.array([1.])) for x in self.xscaled]
+        self.interpolation = CSRMatrix.from_rows(rows, len(freq))
+
+        # bins that fall between the midpoints of neighbouring pixels, in the display scale
+        if self.logfreqscale != 0:
+            scaled = np.log(self.xscaled)
+            to_freq = np.exp
+        else:
+            scaled = self.xscaled
+            to_freq = np.array
+        if len(scaled) > 1:
+            half = np.diff(scaled) / 2.
+            edges = np.concatenate(([scaled[0] - half[0]], scaled[:-1] + half, [scaled[-1] + half[-1]]))
+        else:
+            edges = np.array([-np.inf, np.inf])
+        edges = to_freq(edges)
+        starts = np.searchsorted(freq, edges[:-1], side='left')
+        stops = np.searchsorted(freq, edges[1:], side='left')
+        rows = [(np.arange(start, stop), np.ones(stop - start)) for start, stop in zip(starts, stops)]
+        # the pixels that contain no bin are left to the interpolation
+        self.pooling = CSRMatrix.from_rows(rows, len(freq))
+
     def process(self, freq, data):
-        # f = interp1d(freq, data) # construct an interpolant
-        # return f(self.xscaled)
-        # s = UnivariateSpline(freq, data, s=0, k=1) # construct the spline
-        # return s(self.xscaled)
-        # Note : interp1d and UnivariateSpline are both slower than interp
-        # interp is still not optimal because it involved a search whereas
-        # the data is already completely sorted so an running interpolation
-        # could be done faster
-        return np.interp(self.xscaled, freq, data)
+        """Resample data from the frequency bins freq to the pixels.
+
+        data has shape (len(freq),) or (len(freq), columns), all the columns are resampled at once.
+        The result has shape (nsamples,) or (nsamples, columns), with the type of data."""
+
+        if self.freq is None or (freq is not self.freq and not np.array_equal(freq, self.freq)):
+            self.update_matrices(freq)
+
+        # the matrices apply on the last axis
+        columns = data.T
+        resampled = self.interpolation.apply(columns)
+
+        if self.mode == RESAMPLING_MAX_POOLING:
+            self.pooling.reduce_max(columns, resampled)
+
+        return np.ascontiguousarray(resampled.T, dtype=data.dtype)
@@ -23,7 +23,9 @@ class Online_Linear_2D_resampler:
         self.orig_index = 0.
         self.resampled_index = 0.
 
-        self.old_data = np.zeros((self.height))
+        # no previous column yet, the first one is interpolated from itself
+        # (the data are levels in dB, starting from zeros would show a bright column)
+        self.old_data = None
 
         self.resampled_data = np.zeros((self.height, 1))
 
@@ -45,7 +47,8 @@ class Online_Linear_2D_resampler:
 
             # we resample here instead of just restarting with zeros to avoid black vertical lines
             # in the spectrogram
-            self.old_data = resample(self.old_data, self.height)
+            if self.old_data is not None:
+                self.old_data = resample(self.old_data, self.height)
             self.resampled_data = resample(self.resampled_data, self.height)  # resample on the first axis
 
     def processable(self, m):
@@ -56,8 +59,15 @@ class Online_Linear_2D_resampler:
         self.orig_index += 1.
         n = int(np.ceil((self.orig_index - (self.resampled_index + self.resampling_ratio)) / self.resampling_ratio))
 
-        if self.resampled_data.shape[1] < n:
-            self.resampled_data = np.zeros((self.height, n))
+        if self.old_data is None:
+            self.old_data = data
+
+        if self.old_data.dtype != data.dtype:
+            # the processing precision was changed
+            self.old_data = self.old_data.astype(data.dtype)
+
+        if self.resampled_data.shape[1] < n or self.resampled_data.dtype != data.dtype:
+            self.resampled_data = np.zeros((self.height, n), dtype=data.dtype)
 
         self.resampled_index = pyx_linear_interp_2D(self.resampled_data, data, self.old_data, self.orig_index, self.resampled_index, self.resampling_ratio, n)
 
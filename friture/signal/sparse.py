@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2009 Timothée Lecomte
+
+# This file is part of Friture.
+#
+# Friture is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as published by
+# the Free Software Foundation.
+#
+# Friture is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Friture.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np
+
+
+class CSRMatrix:
+    """Sparse matrix in compressed sparse row format, with numpy only.
+
+    Friture does not depend on scipy at runtime, so this implements the only
+    operation needed by the analysis code: applying the matrix to a batch of vectors."""
+
+    def __init__(self, indptr, indices, data, shape):
+        self.indptr = np.asarray(indptr, dtype=np.intp)
+        self.indices = np.asarray(indices, dtype=np.intp)
+        self.data = np.asarray(data)
+        self.shape = shape
+
+        # reduceat does not handle empty rows, they are skipped and left to zero
+        self.nonempty = np.nonzero(np.diff(self.indptr) > 0)[0]
+        self.starts = self.indptr[self.nonempty]
+
+    @classmethod
+    def from_rows(cls, rows, n_columns):
+        """Build the matrix from a list of (columns, values) pairs, one per row."""
+        indptr = np.zeros(len(rows) + 1, dtype=np.intp)
+        indptr[1:] = np.cumsum([len(columns) for columns, values in rows])
+
+        if len(rows) > 0 and indptr[-1] > 0:
+            indices = np.concatenate([columns for columns, values in rows])
+            data = np.concatenate([values for columns, values in rows])
+        else:
+            indices = np.zeros(0, dtype=np.intp)
+            data = np.zeros(0)
+
+        return cls(indptr, indices, data, (len(rows), n_columns))
+
+    def nnz(self):
+        return self.indices.shape[0]
+
+    def apply(self, x):
+        """Return x . M^T, for x of shape (..., n_columns). The result has shape (..., n_rows)."""
+        out_dtype = np.result_type(x.dtype, self.data.dtype)
+        out = np.zeros(x.shape[:-1] + (self.shape[0],), dtype=out_dtype)
+
+        if self.nonempty.shape[0] > 0:
+            products = x[..., self.indices] * self.data
+            out[..., self.nonempty] = np.add.reduceat(products, self.starts, axis=-1)
+
+        return out
+
+    def reduce_max(self, x, out):
+        """Write the maximum of the entries of x selected by each non-empty row into out[..., row].
+
+        The values of the matrix are ignored, only its sparsity pattern is used.
+        The rows without entries are left untouched in out."""
+        if self.nonempty.shape[0] > 0:
+            out[..., self.nonempty] = np.maximum.reduceat(x[..., self.indices], self.starts, axis=-1)
+        return out
+
+    def todense(self):
+        dense = np.zeros(self.shape, dtype=self.data.dtype)
+        for i in range(self.shape[0]):
+            start, stop = self.indptr[i], self.indptr[i + 1]
+            dense[i, self.indices[start:stop]] = self.data[start:stop]
+        return dense
@@ -19,10 +19,17 @@
 
 """Spectrogram widget, that displays a rolling 2D image of the time-frequency spectrum."""
 
-from PyQt5 import QtWidgets
-from numpy import log10, floor, zeros, float64, tile, array
+import threading
+
+from PyQt5 import QtCore, QtWidgets
+from numpy import log10, tile, array
 from friture.imageplot import ImagePlot
 from friture.audioproc import audioproc  # audio processing class
+from friture.analysiscache import AnalysisCache
+from friture.analysisthread import Mailbox
+from friture.spectrogram_history import SpectrogramHistory
+from friture.framescheduler import QUALITY_LEVELS
+from friture.constantq import ConstantQTransform, bins_per_octave_for_pixels, ANALYSIS_CQT
 from friture.spectrogram_settings import (Spectrogram_Settings_Dialog,  # settings dialog
                                           DEFAULT_FFT_SIZE,
                                           DEFAULT_FREQ_SCALE,
@@ -31,11 +38,19 @@ from friture.spectrogram_settings import (Spectrogram_Settings_Dialog,  # settin
                                           DEFAULT_SPEC_MIN,
                                           DEFAULT_SPEC_MAX,
                                           DEFAULT_TIMERANGE,
-                                          DEFAULT_WEIGHTING)
+                                          DEFAULT_WEIGHTING,
+                                          DEFAULT_ANALYSIS,
+                                          DEFAULT_HISTORY)
 
 from friture.audiobackend import SAMPLING_RATE, FRAMES_PER_BUFFER, AudioBackend
 from fractions import Fraction
 
+# scroll-back: a wheel step moves by this fraction of the view, or zooms by this factor with Ctrl
+HISTORY_SCROLL_STEP = 0.1
+HISTORY_ZOOM_STEP = 1.25
+# narrowest view, in columns
+HISTORY_MIN_SPAN = 8
+
 
 class Spectrogram_Widget(QtWidgets.QWidget):
 
@@ -62,6 +77,9 @@ class Spectrogram_Widget(QtWidgets.QWidget):
         self.spec_min = DEFAULT_SPEC_MIN
         self.spec_max = DEFAULT_SPEC_MAX
         self.weighting = DEFAULT_WEIGHTING
+        self.analysis_type = DEFAULT_ANALYSIS
+        # constant-Q engine, when selected instead of the FFT
+        self.cqt = None
 
         self.update_weighting()
         self.freq = self.proc.get_freq_scale()
@@ -69,10 +87,14 @@ class Spectrogram_Widget(QtWidgets.QWidget):
         self.timerange_s = DEFAULT_TIMERANGE
         self.canvas_width = 100.
 
-        self.old_index = 0
+        # cursor on the audio ring buffer
+        self.reader = None
         self.overlap = 3. / 4.
+        self.analysis = None
         self.overlap_frac = Fraction(3, 4)
         self.dT_s = self.fft_size * (1. - self.overlap) / float(SAMPLING_RATE)
+        # the constant-Q bins match the pixels divided by this, lowered by the frame scheduler
+        self.resolution_divider = 1
 
         self.PlotZoneImage.setlog10freqscale()  # DEFAULT_FREQ_SCALE = 1 #log10
         self.PlotZoneImage.setfreqrange(self.minfreq, self.maxfreq)
@@ -93,10 +115,49 @@ class Spectrogram_Widget(QtWidgets.QWidget):
 
         self.mustRestart = False
 
+        # handle_new_data runs in the analysis thread, while the settings are changed from the GUI thread
+        self.lock = threading.RLock()
+        # spectrogram columns, handed over to the GUI thread
+        # every column must be drawn, so they are queued instead of overwritten
+        self.mailbox = Mailbox(single_slot=False)
+
+        # full-resolution power columns, scrolled back when paused
+        self.history = SpectrogramHistory(DEFAULT_HISTORY * 60.)
+        # while paused: index of the history column at the right of the canvas, and number of columns across it
+        self.review_end = None
+        self.review_span = None
+        # the image shows the history instead of the live columns
+        self.history_shown = False
+        # while the dock is not shown, the columns are only recorded in the history
+        self.suspended = False
+
     # method
     def set_buffer(self, buffer):
         self.audiobuffer = buffer
-        self.old_index = self.audiobuffer.ringbuffer.offset
+        self.subscribe_analysis()
+
+    def subscribe_analysis(self):
+        # the FFT frames are computed by the shared analysis cache,
+        # so that docks with the same settings do not compute them twice
+        AnalysisCache().unsubscribe(self.analysis)
+
+        step = int(self.fft_size * (1. - self.overlap))
+        self.analysis = AnalysisCache().subscribe(self.audiobuffer, self.fft_size, step, channel=0)
+
+        # the reader cursor is aligned on the step, which is the frames grid shared by all the docks
+        if self.reader is not None:
+            self.audiobuffer.unregister_reader(self.reader)
+        self.reader = self.audiobuffer.register_reader(self.fft_size, step)
+
+    def closeEvent(self, event):
+        with self.lock:
+            AnalysisCache().unsubscribe(self.analysis)
+            self.analysis = None
+            if self.reader is not None:
+                self.audiobuffer.unregister_reader(self.reader)
+                self.reader = None
+            self.history.close()
+        super().closeEvent(event)
 
     def log_spectrogram(self, sp):
         # Note: implementing the log10 of the array in Cython did not bring
@@ -106,47 +167,50 @@ class Spectrogram_Widget(QtWidgets.QWidget):
         epsilon = 1e-30
         return 10. * log10(sp + epsilon)
 
-    # scale the db spectrum from [- spec_range db ... 0 db] to [0..1] (do not clip, will be down after resampling)
-    def scale_spectrogram(self, sp):
-        return (sp - self.spec_min) / (self.spec_max - self.spec_min)
-
     def handle_new_data(self, floatdata):
-        # we need to maintain an index of where we are in the buffer
-        index = self.audiobuffer.ringbuffer.offset
-        self.last_data_time = self.audiobuffer.lastDataTime
+        with self.lock:
+            result = self.process(floatdata)
+
+            if result is not None:
+                self.mailbox.post(result, self.audiobuffer.lastCaptureTime)
 
-        available = index - self.old_index
+    def process(self, floatdata):
+        # the dock may have been closed while this block was waiting for the lock
+        if self.reader is None:
+            return None
 
-        if available < 0:
-            # ringbuffer must have grown or something...
-            available = 0
-            self.old_index = index
+        self.last_data_time = self.audiobuffer.lastDataTime
 
         # if we have enough data to add a frequency column in the time-frequency plane, compute it
-        needed = self.fft_size * (1. - self.overlap)
-        realizable = int(floor(available / needed))
+        realizable = self.reader.pending()
 
         if realizable > 0:
-            spn = zeros((len(self.freq), realizable), dtype=float64)
-
-            for i in range(realizable):
-                floatdata = self.audiobuffer.data_indexed(self.old_index, self.fft_size)
-
+            # frames end on the reader grid, right after the cursor
+            first_end = self.reader.index + self.reader.step
+
+            if self.cqt is not None:
+                # the constant-Q engine keeps its own history, it only needs the new samples
+                length = realizable * self.reader.step
+                samples = self.audiobuffer.data_indexed(self.reader.index + length, length)
+                spn = self.cqt.process(samples[0, :], realizable, self.reader.step).T
+            else:
                 # for now, take the first channel only
-                floatdata = floatdata[0, :]
+                # spectra are shared with the other docks, transposed to (frequency, frames)
+                spn = self.analysis.frames(first_end, realizable).T
 
-                # FFT transform
-                spn[:, i] = self.proc.analyzelive(floatdata)
+            self.reader.advance(realizable)
 
-                self.old_index += int(needed)
+            self.history.append(self.freq, self.dT_s, spn)
 
-            w = tile(self.w, (1, realizable))
-            norm_spectrogram = self.scale_spectrogram(self.log_spectrogram(spn) + w)
-            self.PlotZoneImage.addData(self.freq, norm_spectrogram, self.last_data_time)
+            if self.suspended:
+                # the image is redrawn from the history when the dock is shown again
+                return None
 
-            if self.mustRestart:
-                self.PlotZoneImage.restart()
-                self.mustRestart = False
+            # keep the precision of the spectra
+            w = tile(self.w.astype(spn.dtype, copy=False), (1, realizable))
+            # the scaling to the color range is done by the image, so that it applies to the whole history on OpenGL
+            dB_spectrogram = self.log_spectrogram(spn) + w
+            return self.freq, dB_spectrogram, self.last_data_time
 
         # thickness of a frequency column depends on FFT size and window overlap
         # hamming window with 75% overlap provides good quality (Perfect reconstruction,
@@ -156,10 +220,25 @@ class Spectrogram_Widget(QtWidgets.QWidget):
 
         # actual displayed spectrogram is a scaled version of the time-frequency plane
 
+        return None
+
     def canvasUpdate(self):
+        # the pending columns are added even when hidden, so that the history is complete when shown again
+        for freq, dB_spectrogram, last_data_time in self.mailbox.take_all():
+            self.PlotZoneImage.addData(freq, dB_spectrogram, last_data_time)
+
+            if self.mustRestart:
+                self.PlotZoneImage.restart()
+                self.mustRestart = False
+
         if not self.isVisible():
             return
 
+        if self.cqt is not None and self.cqt_bins_per_octave() != self.cqt.bins_per_octave:
+            # the plot has been resized, match the bins to the new pixel resolution
+            with self.lock:
+                self.update_analysis()
+
         self.PlotZoneImage.draw()
 
     def update_jitter(self):
@@ -169,32 +248,159 @@ class Spectrogram_Widget(QtWidgets.QWidget):
         # print audio_jitter, analysis_jitter, canvas_jitter
         self.PlotZoneImage.plotImage.set_jitter(canvas_jitter)
 
+    @property
+    def records_history(self):
+        # the dock keeps the processing running while not shown, so that the history has no gap
+        return self.history.retention_s > 0
+
+    def suspend(self):
+        with self.lock:
+            self.suspended = True
+
+    def resync(self):
+        if self.records_history:
+            # the processing went on, only the image is behind
+            with self.lock:
+                self.suspended = False
+            self.show_latest()
+            self.mustRestart = True
+            return
+
+        with self.lock:
+            # jump to the newest samples, and start the constant-Q history over
+            self.reader.skip_pending()
+            self.update_analysis()
+
+        # the image scrolls from the time of the next column
+        self.mustRestart = True
+
     def pause(self):
         self.PlotZoneImage.pause()
 
+        with self.lock:
+            self.review_end = self.history.count
+            self.review_span = self.timerange_s / self.dT_s
+
     def restart(self):
+        if self.history_shown:
+            self.show_latest()
+
+        self.review_end = None
+
         # defer the restart until we get data from the audio source (so that a fresh lastdatatime is passed to the spectrogram image)
         self.mustRestart = True
 
+    def wheelEvent(self, event):
+        # while paused, the wheel scrolls back in the history, and zooms in time with Ctrl
+        if self.review_end is None or self.history.count == 0:
+            super().wheelEvent(event)
+            return
+
+        steps = event.angleDelta().y() / 120.
+        if event.modifiers() & QtCore.Qt.ControlModifier:
+            self.review_span *= HISTORY_ZOOM_STEP ** -steps
+        else:
+            self.review_end -= steps * HISTORY_SCROLL_STEP * self.review_span
+
+        with self.lock:
+            first, count = self.history.first(), self.history.count
+            max_span = max(self.history.capacity, self.timerange_s / self.history.period_s)
+
+        self.review_span = min(max(self.review_span, HISTORY_MIN_SPAN), max_span)
+        self.review_end = min(max(self.review_end, first + min(self.review_span, count - first)), count)
+
+        self.show_history(self.review_end, self.review_span)
+        event.accept()
+
+    def show_latest(self):
+        # back to the newest columns, that the live ones will follow
+        self.show_history(self.history.count, self.timerange_s / self.dT_s)
+        self.history_shown = False
+        self.PlotZoneImage.settimerange(self.timerange_s, self.dT_s)
+
+    def show_history(self, end, span):
+        """Replace the image with the history columns [end - span, end)."""
+        # the image is a bit wider than the canvas, the extra columns follow the view
+        canvas_width = max(self.PlotZoneImage.canvasWidget.width(), 1)
+        width = self.PlotZoneImage.plotImage.image_width()
+        start = end - span
+        stop = start + span * width / canvas_width
+
+        with self.lock:
+            power = self.history.pooled(start, stop, width)
+            freq = self.history.freq
+            period_s = self.history.period_s
+            count = self.history.count
+            # the weighting may have been computed for other bins since
+            w = self.w if self.w.shape[0] in (1, power.shape[0]) else 0.
+
+        if freq is None:
+            return
+
+        self.PlotZoneImage.showImage(freq, self.log_spectrogram(power) + w)
+        self.history_shown = True
+
+        # the time axis keeps the live convention, where the newest column is at the time range
+        end_s = self.timerange_s + (end - count) * period_s
+        self.PlotZoneImage.settimeaxis(end_s - span * period_s, end_s)
+
+        # the display timer is stopped while paused
+        self.PlotZoneImage.draw()
+
     def setminfreq(self, freq):
         self.minfreq = freq
         self.PlotZoneImage.setfreqrange(self.minfreq, self.maxfreq)
+        with self.lock:
+            self.update_analysis()
 
     def setmaxfreq(self, freq):
         self.maxfreq = freq
         self.PlotZoneImage.setfreqrange(self.minfreq, self.maxfreq)
-        self.proc.set_maxfreq(freq)
-        self.update_weighting()
-        self.freq = self.proc.get_freq_scale()
+        with self.lock:
+            self.proc.set_maxfreq(freq)
+            self.update_analysis()
 
     def setfftsize(self, fft_size):
-        self.fft_size = fft_size
+        with self.lock:
+            self.fft_size = fft_size
 
-        self.proc.set_fftsize(fft_size)
-        self.update_weighting()
-        self.freq = self.proc.get_freq_scale()
+            self.proc.set_fftsize(fft_size)
+            self.update_analysis()
+            if self.audiobuffer is not None:
+                self.subscribe_analysis()
+            # the columns are appended to the history with their period, which must match the new step
+            self.update_column_period()
+
+        self.update_frame_rate()
+
+    def set_overlap(self, overlap):
+        if overlap == self.overlap:
+            return
+
+        with self.lock:
+            self.overlap = overlap
+            self.overlap_frac = Fraction(overlap)
+            if self.audiobuffer is not None:
+                self.subscribe_analysis()
+            self.update_column_period()
+
+        self.update_frame_rate()
+
+    def set_display_resolution(self, divider):
+        if divider == self.resolution_divider:
+            return
 
+        with self.lock:
+            self.resolution_divider = divider
+            if self.analysis_type == ANALYSIS_CQT:
+                self.update_analysis()
+
+    def update_column_period(self):
+        # to be called with the lock held
         self.dT_s = self.fft_size * (1. - self.overlap) / float(SAMPLING_RATE)
+
+    def update_frame_rate(self):
+        # the columns width and the scrolling follow the FFT size and the overlap
         self.PlotZoneImage.settimerange(self.timerange_s, self.dT_s)
 
         sfft_rate_frac = Fraction(SAMPLING_RATE, self.fft_size) / (Fraction(1) - self.overlap_frac) / 1000
@@ -211,12 +417,37 @@ class Spectrogram_Widget(QtWidgets.QWidget):
         self.PlotZoneImage.setspecrange(self.spec_min, self.spec_max)
 
     def setweighting(self, weighting):
-        self.weighting = weighting
         self.PlotZoneImage.setweighting(weighting)
+        with self.lock:
+            self.weighting = weighting
+            self.update_weighting()
+
+    def setanalysis(self, analysis_type):
+        with self.lock:
+            self.analysis_type = analysis_type
+            self.update_analysis()
+
+    def cqt_bins_per_octave(self):
+        # one bin per pixel of the plot height, on a log frequency scale
+        return bins_per_octave_for_pixels(self.PlotZoneImage.canvasWidget.height() // self.resolution_divider,
+                                          min(self.minfreq, self.maxfreq), max(self.minfreq, self.maxfreq))
+
+    def update_analysis(self):
+        # to be called with the lock held
+        if self.analysis_type == ANALYSIS_CQT:
+            self.cqt = ConstantQTransform(min(self.minfreq, self.maxfreq), max(self.minfreq, self.maxfreq),
+                                          self.cqt_bins_per_octave())
+            self.freq = self.cqt.get_freq_scale()
+        else:
+            self.cqt = None
+            self.freq = self.proc.get_freq_scale()
         self.update_weighting()
 
     def update_weighting(self):
-        A, B, C = self.proc.get_freq_weighting()
+        if self.cqt is not None:
+            A, B, C = self.cqt.get_freq_weighting()
+        else:
+            A, B, C = self.proc.get_freq_weighting()
         if self.weighting is 0:
             self.w = array([0.])
         elif self.weighting is 1:
@@ -236,6 +467,15 @@ class Spectrogram_Widget(QtWidgets.QWidget):
     def restoreState(self, settings):
         self.settings_dialog.restoreState(settings)
 
+    # slot
+    def sethistory(self, minutes):
+        with self.lock:
+            self.history.set_retention(minutes * 60.)
+
+        if self.records_history:
+            # the overlap may have been lowered by the frame scheduler before, it is not for a history
+            self.set_overlap(QUALITY_LEVELS[0].overlap)
+
     # slot
     def timerangechanged(self, value):
         self.timerange_s = value
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2009 Timothée Lecomte
+
+# This file is part of Friture.
+#
+# Friture is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as published by
+# the Free Software Foundation.
+#
+# Friture is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Friture.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Full-resolution and decimated history of the spectrogram columns.
+
+The raw power columns, and their levels decimated by the maximum only (see
+friture.pyramid), are kept in ring buffers that live in memory-mapped
+temporary files, so that long retentions (an hour of 8192-point FFTs is
+several GB) are paged by the OS instead of held in RAM. The history is
+appended from the analysis thread and read when a paused spectrogram is
+scrolled back or zoomed."""
+
+import logging
+import tempfile
+
+import numpy as np
+
+from friture.pyramid import HistoryPyramid, MAXIMUM
+
+
+class SpectrogramHistory:
+
+    def __init__(self, retention_s):
+        self.logger = logging.getLogger(__name__)
+
+        self.retention_s = retention_s
+
+        # frequencies of the rows and time between the columns, the history is reset when they change
+        self.freq = None
+        self.period_s = None
+
+        # temporary files of the memory-mapped ring buffers
+        self.files = []
+        self.mapped_bytes = 0
+        # full-resolution and decimated columns, None when the history is disabled
+        self.pyramid = None
+
+    @property
+    def capacity(self):
+        return self.pyramid.capacity if self.pyramid is not None else 0
+
+    @property
+    def count(self):
+        # number of columns appended since the last reset, the newest one has index count - 1
+        return self.pyramid.count if self.pyramid is not None else 0
+
+    def set_retention(self, retention_s):
+        if retention_s != self.retention_s:
+            self.retention_s = retention_s
+            self.reset()
+
+    def reset(self):
+        self.close()
+        self.freq = None
+        self.period_s = None
+
+    def close(self):
+        # the temporary files are deleted when closed
+        self.pyramid = None
+        for file in self.files:
+            file.close()
+        self.files = []
+        self.mapped_bytes = 0
+
+    def memmap(self, shape, dtype):
+        file = tempfile.TemporaryFile(prefix="friture-history-")
+        self.files.append(file)
+        columns = np.memmap(file, dtype=dtype, mode='w+', shape=shape)
+        self.mapped_bytes += columns.nbytes
+        return columns
+
+    def allocate(self, freq, period_s):
+        self.close()
+
+        self.freq = freq
+        self.period_s = period_s
+
+        capacity = int(self.retention_s / period_s)
+        if capacity <= 0:
+            return
+
+        # the columns are rows of the ring buffers, so that a time range is contiguous
+        self.pyramid = HistoryPyramid(capacity, len(freq), allocate=self.memmap, reductions=(MAXIMUM,))
+
+        self.logger.info("Spectrogram history: %d columns of %d bins, %d levels, %.0f MB", capacity, len(freq),
+                         len(self.pyramid.levels), self.mapped_bytes / 1e6)
+
+    def append(self, freq, period_s, power):
+        """Append the columns of power, of shape (len(freq), n)."""
+        if period_s != self.period_s or (freq is not self.freq and not np.array_equal(freq, self.freq)):
+            self.allocate(freq, period_s)
+
+        if self.pyramid is not None:
+            self.pyramid.append(power.T)
+
+    def first(self):
+        """Index of the oldest column still in the history."""
+        return self.pyramid.first() if self.pyramid is not None else 0
+
+    def read(self, start, stop):
+        """Return the columns [start, stop), which must be in the history, as an array of shape (stop - start, bins)."""
+        return self.pyramid.read(start, stop)
+
+    def pooled(self, start, stop, width):
+        """Return the power over the columns [start, stop) (fractional indices), in width pixels.
+
+        Each pixel takes the maximum of the columns that it covers, so that short events stay visible,
+        read from the decimated level that matches the zoom. The result has shape (bins, width),
+        with zeros where there is no data."""
+        if self.pyramid is None:
+            return np.zeros((len(self.freq) if self.freq is not None else 1, width), dtype=np.float32)
+        return self.pyramid.pooled(start, stop, width).T
@@ -22,7 +22,7 @@ import logging
 import numpy
 from PyQt5 import QtCore, QtGui
 from friture.plotting import generated_cmrmap
-from friture_extensions.lookup_table import pyx_color_from_float_2D
+from friture_extensions.lookup_table import pyx_color_from_level_2D
 
 
 class CanvasScaledSpectrogram(QtCore.QObject):
@@ -43,14 +43,16 @@ class CanvasScaledSpectrogram(QtCore.QObject):
         self.offset = 0
         self.time_offset = 0
 
+        self.spec_min = -140.
+        self.spec_max = 0.
+
+        # the new columns are colored in place in this image, reallocated when it is too small
+        self.image = None
+        self.image_pixels = None
+
         # prepare a custom colormap
         self.prepare_palette()
 
-        # performance timer
-        self.time = QtCore.QTime()
-        self.time.start()
-        # self.logfile = open("latency_log.txt",'w')
-
         self.resetBound = 20
 
     def erase(self):
@@ -81,6 +83,10 @@ class CanvasScaledSpectrogram(QtCore.QObject):
             self.canvasWidthChanged.emit(canvas_width)
             self.logger.info("Spectrogram image: canvas_width changed, now: %d", canvas_width)
 
+    def setspecrange(self, spec_min, spec_max):
+        self.spec_min = spec_min
+        self.spec_max = spec_max
+
     def addPixelAdvance(self, pixel_advance):
         self.time_offset += pixel_advance
 
@@ -89,17 +95,15 @@ class CanvasScaledSpectrogram(QtCore.QObject):
         self.time_offset = alpha * self.time_offset + (1. - alpha) * self.offset
 
     def addData(self, xyzs):
-        # revert the frequency axis so that the larger frequencies
-        # are at the top of the widget
-        xyzs = xyzs[::-1, :]
-
         width = xyzs.shape[1]
+        height = xyzs.shape[0]
 
-        # convert the data to colors, and then to a data string
-        # that QImage can understand
-        byteString = self.floats_to_bytes(xyzs)
+        pixels = self.prepare_image(width, height)
 
-        myimage = self.prepare_image(byteString, width, xyzs.shape[0])
+        # convert the levels to colors, directly in the image
+        # revert the frequency axis so that the larger frequencies
+        # are at the top of the widget
+        pyx_color_from_level_2D(self.colors, xyzs[::-1, :], self.spec_min, self.spec_max, pixels[:, :width])
 
         # Now, draw the image onto the widget pixmap, which has
         # the structure of a 2D ringbuffer
@@ -107,38 +111,45 @@ class CanvasScaledSpectrogram(QtCore.QObject):
         offset = self.offset % self.canvas_width
 
         # first copy, always complete
-        source1 = QtCore.QRectF(0, 0, width, xyzs.shape[0])
-        target1 = QtCore.QRectF(offset, 0, width, xyzs.shape[0])
+        source1 = QtCore.QRectF(0, 0, width, height)
+        target1 = QtCore.QRectF(offset, 0, width, height)
         # second copy, can be folded
         direct = min(width, self.canvas_width - offset)
         folded = width - direct
-        source2a = QtCore.QRectF(0, 0, direct, xyzs.shape[0])
-        target2a = QtCore.QRectF(offset + self.canvas_width, 0, direct, xyzs.shape[0])
-        source2b = QtCore.QRectF(direct, 0, folded, xyzs.shape[0])
-        target2b = QtCore.QRectF(0, 0, folded, xyzs.shape[0])
+        source2a = QtCore.QRectF(0, 0, direct, height)
+        target2a = QtCore.QRectF(offset + self.canvas_width, 0, direct, height)
+        source2b = QtCore.QRectF(direct, 0, folded, height)
+        target2b = QtCore.QRectF(0, 0, folded, height)
 
         self.painter.begin(self.pixmap)
-        self.painter.drawImage(target1, myimage, source1)
-        self.painter.drawImage(target2a, myimage, source2a)
-        self.painter.drawImage(target2b, myimage, source2b)
+        self.painter.drawImage(target1, self.image, source1)
+        self.painter.drawImage(target2a, self.image, source2a)
+        self.painter.drawImage(target2b, self.image, source2b)
         self.painter.end()
 
         # updating the offset
         self.offset += width
 
-    def floats_to_bytes(self, data):
-        # dat1 = (255. * data).astype(numpy.uint8)
-        # dat4 = dat1.repeat(4)
-
-        dat4 = self.color_from_float(data)
-        return dat4.tostring()
+    def showImage(self, xyzs):
+        """Replace the image with the columns of xyzs, the first one at the left of the canvas."""
+        self.erase()
+        self.addData(xyzs)
+        # the ring starts at the first column, so that the image is drawn in one piece
+        self.offset = 0
+        self.time_offset = 0
 
     # defined as a separate function so that it appears in the profiler
     # NOTE: QImage with a colormap is slower (by a factor of 2) than the custom
     # colormap code here.
-    def prepare_image(self, byteString, width, height):
-        myimage = QtGui.QImage(byteString, width, height, QtGui.QImage.Format_RGB32)
-        return myimage
+    def prepare_image(self, width, height):
+        """Return the pixels of the image, as a (height, image width) array, with room for width columns."""
+        if self.image is None or self.image.width() < width or self.image.height() != height:
+            # room for a few blocks, so that the image is not reallocated when the block size varies
+            self.image = QtGui.QImage(max(2 * width, 16), height, QtGui.QImage.Format_RGB32)
+            bits = self.image.bits()
+            bits.setsize(self.image.byteCount())
+            self.image_pixels = numpy.frombuffer(bits, dtype=numpy.uint32).reshape(height, self.image.bytesPerLine() // 4)
+        return self.image_pixels
 
     def prepare_palette(self):
         self.logger.info("palette preparation")
@@ -150,13 +161,6 @@ class CanvasScaledSpectrogram(QtCore.QObject):
         for i in range(cmap.shape[0]):
             self.colors[i] = QtGui.QColor(cmap[i, 0] * 255, cmap[i, 1] * 255, cmap[i, 2] * 255).rgb()
 
-    def color_from_float(self, v):
-        # clip in [0..1] before using the fast lookup function
-        v = numpy.clip(v, 0., 1.)
-        return pyx_color_from_float_2D(self.colors, v)
-        # d = (v*255).astype(numpy.uint8)
-        # return self.colors[d]
-
     # def interpolate_colors(colors, flat=False, num_colors=256):
         # colors =
         # """ given a list of colors, create a larger list of colors interpolating
@@ -190,7 +194,7 @@ class CanvasScaledSpectrogram(QtCore.QObject):
     def getpixmap(self):
         return self.pixmap
 
-    def getpixmapoffset(self, delay=0):
+    def getoffset(self, delay=0):
         return self.offset % self.canvas_width
 
     # this is used when there is an underflow in the audio input
@@ -31,6 +31,9 @@ DEFAULT_SPEC_MIN = -140
 DEFAULT_SPEC_MAX = 0
 DEFAULT_TIMERANGE = 10.
 DEFAULT_WEIGHTING = 0  # None
+DEFAULT_ANALYSIS = 0  # FFT
+DEFAULT_FREQ_RESAMPLING = 0  # interpolation
+DEFAULT_HISTORY = 0.  # minutes, 0 to disable
 
 
 class Spectrogram_Settings_Dialog(QtWidgets.QDialog):
@@ -112,9 +115,36 @@ class Spectrogram_Settings_Dialog(QtWidgets.QDialog):
         self.comboBox_weighting.addItem("C")
         self.comboBox_weighting.setCurrentIndex(DEFAULT_WEIGHTING)
 
+        self.comboBox_analysis = QtWidgets.QComboBox(self)
+        self.comboBox_analysis.setObjectName("analysis")
+        self.comboBox_analysis.addItem("FFT (linear frequency bins)")
+        self.comboBox_analysis.addItem("Constant-Q (log frequency bins)")
+        self.comboBox_analysis.setCurrentIndex(DEFAULT_ANALYSIS)
+
+        self.comboBox_freqresampling = QtWidgets.QComboBox(self)
+        self.comboBox_freqresampling.setObjectName("freqresampling")
+        self.comboBox_freqresampling.addItem("Interpolation")
+        self.comboBox_freqresampling.addItem("Peaks (maximum of the bins)")
+        self.comboBox_freqresampling.setCurrentIndex(DEFAULT_FREQ_RESAMPLING)
+
+        self.doubleSpinBox_history = QtWidgets.QDoubleSpinBox(self)
+        self.doubleSpinBox_history.setKeyboardTracking(False)
+        self.doubleSpinBox_history.setDecimals(1)
+        self.doubleSpinBox_history.setMinimum(0.)
+        self.doubleSpinBox_history.setMaximum(600.)
+        self.doubleSpinBox_history.setProperty("value", DEFAULT_HISTORY)
+        self.doubleSpinBox_history.setObjectName("doubleSpinBox_history")
+        self.doubleSpinBox_history.setSuffix(" min")
+        self.doubleSpinBox_history.setToolTip("Full-resolution history that can be scrolled back with the mouse wheel "
+                                              "when paused (Ctrl + wheel to zoom). Kept in a temporary file. "
+                                              "While recording, the dock keeps processing when it is not shown.")
+
         self.formLayout.addRow("Time range:", self.doubleSpinBox_timerange)
+        self.formLayout.addRow("History:", self.doubleSpinBox_history)
+        self.formLayout.addRow("Analysis:", self.comboBox_analysis)
         self.formLayout.addRow("FFT Size:", self.comboBox_fftsize)
         self.formLayout.addRow("Frequency scale:", self.comboBox_freqscale)
+        self.formLayout.addRow("Frequency resampling:", self.comboBox_freqresampling)
         self.formLayout.addRow("Min frequency:", self.spinBox_minfreq)
         self.formLayout.addRow("Max frequency:", self.spinBox_maxfreq)
         self.formLayout.addRow("Min color:", self.spinBox_specmin)
@@ -130,7 +160,10 @@ class Spectrogram_Settings_Dialog(QtWidgets.QDialog):
         self.spinBox_specmin.valueChanged.connect(self.parent().setmin)
         self.spinBox_specmax.valueChanged.connect(self.parent().setmax)
         self.doubleSpinBox_timerange.valueChanged.connect(self.parent().timerangechanged)
+        self.doubleSpinBox_history.valueChanged.connect(self.parent().sethistory)
         self.comboBox_weighting.currentIndexChanged.connect(self.parent().setweighting)
+        self.comboBox_analysis.currentIndexChanged.connect(self.parent().setanalysis)
+        self.comboBox_freqresampling.currentIndexChanged.connect(self.parent().PlotZoneImage.setfreqresampling)
 
     # slot
     def fftsizechanged(self, index):
@@ -149,6 +182,7 @@ class Spectrogram_Settings_Dialog(QtWidgets.QDialog):
     # method
     def saveState(self, settings):
         settings.setValue("timeRange", self.doubleSpinBox_timerange.value())
+        settings.setValue("history", self.doubleSpinBox_history.value())
         settings.setValue("fftSize", self.comboBox_fftsize.currentIndex())
         settings.setValue("freqScale", self.comboBox_freqscale.currentIndex())
         settings.setValue("freqMin", self.spinBox_minfreq.value())
@@ -156,11 +190,15 @@ class Spectrogram_Settings_Dialog(QtWidgets.QDialog):
         settings.setValue("colorMin", self.spinBox_specmin.value())
         settings.setValue("colorMax", self.spinBox_specmax.value())
         settings.setValue("weighting", self.comboBox_weighting.currentIndex())
+        settings.setValue("analysis", self.comboBox_analysis.currentIndex())
+        settings.setValue("freqResampling", self.comboBox_freqresampling.currentIndex())
 
     # method
     def restoreState(self, settings):
         timeRange = settings.value("timeRange", DEFAULT_TIMERANGE, type=float)
         self.doubleSpinBox_timerange.setValue(timeRange)
+        history = settings.value("history", DEFAULT_HISTORY, type=float)
+        self.doubleSpinBox_history.setValue(history)
         fft_size = settings.value("fftSize", DEFAULT_FFT_SIZE, type=int)  # 7th index is 1024 points
         self.comboBox_fftsize.setCurrentIndex(fft_size)
         freqscale = settings.value("freqScale", DEFAULT_FREQ_SCALE, type=int)
@@ -175,3 +213,7 @@ class Spectrogram_Settings_Dialog(QtWidgets.QDialog):
         self.spinBox_specmax.setValue(colorMax)
         weighting = settings.value("weighting", DEFAULT_WEIGHTING, type=int)
         self.comboBox_weighting.setCurrentIndex(weighting)
+        analysis = settings.value("analysis", DEFAULT_ANALYSIS, type=int)
+        self.comboBox_analysis.setCurrentIndex(analysis)
+        freq_resampling = settings.value("freqResampling", DEFAULT_FREQ_RESAMPLING, type=int)
+        self.comboBox_freqresampling.setCurrentIndex(freq_resampling)
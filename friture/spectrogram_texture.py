@@ -0,0 +1,370 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2009 Timothée Lecomte
+
+# This file is part of Friture.
+#
+# Friture is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as published by
+# the Free Software Foundation.
+#
+# Friture is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Friture.  If not, see <http://www.gnu.org/licenses/>.
+
+"""OpenGL counterpart of CanvasScaledSpectrogram.
+
+The columns of the spectrogram, in dB, are kept in a single-channel float
+texture used as a ring buffer along the time axis (it wraps with GL_REPEAT).
+The scaling to the color range and the colormap are applied in a fragment
+shader, so that the CPU only copies the new columns, and so that a change
+of the color range applies to the whole history."""
+
+import logging
+
+import numpy as np
+from PyQt5 import QtCore, QtGui
+from OpenGL import GL
+from OpenGL.GL import shaders
+from OpenGL.arrays import vbo
+from ctypes import sizeof, c_float, c_void_p
+
+from friture.plotting import generated_cmrmap
+from friture.plotting.glCanvasWidget import compileProgram
+
+# level of the texels that have not received any data, below any computed level (10*log10(1e-30))
+EMPTY_LEVEL = -400.
+
+__supported = None
+
+
+def opengl_spectrogram_supported():
+    """Return True if the default OpenGL context has float textures and framebuffer blits (OpenGL 3.0)."""
+    global __supported
+    if __supported is None:
+        context = QtGui.QOpenGLContext()
+        context.setFormat(QtGui.QSurfaceFormat.defaultFormat())
+        if context.create():
+            version = context.format().version()
+            __supported = version >= (3, 0)
+            logging.getLogger(__name__).info("OpenGL %d.%d, spectrogram rendered %s", version[0], version[1],
+                                             "with OpenGL" if __supported else "in software")
+        else:
+            __supported = False
+    return __supported
+
+
+class TextureSpectrogram(QtCore.QObject):
+    canvasWidthChanged = QtCore.pyqtSignal(int)
+
+    def __init__(self, canvas_height=2, canvas_width=2):
+        super().__init__()
+
+        self.logger = logging.getLogger(__name__)
+
+        self.canvas_height = canvas_height
+        self.canvas_width = canvas_width
+
+        self.offset = 0
+        self.time_offset = 0
+
+        self.spec_min = -140.
+        self.spec_max = 0.
+
+        # columns waiting for the OpenGL context, as (offset, columns)
+        self.pending = []
+        self.pending_width = 0
+        self.must_clear = True
+
+        # OpenGL objects, created on the first draw, when the context is current
+        self.texture = None
+        self.texture_width = 0
+        self.texture_height = 0
+        self.colormap_texture = None
+        self.program = None
+        self.quad_vbo = None
+
+    def erase(self):
+        self.pending = []
+        self.pending_width = 0
+        self.must_clear = True
+        self.offset = 0
+        self.time_offset = 0
+
+    # update the offsets, the texture is resized on the next draw
+    def resize(self, width, height):
+        oldWidth = self.canvas_width
+        if width != oldWidth:
+            self.offset = (self.offset % oldWidth) * width / oldWidth
+            self.offset = self.offset % width  # to handle negative values
+            self.time_offset = (self.time_offset % oldWidth) * width / oldWidth
+
+    def setcanvas_height(self, canvas_height):
+        if self.canvas_height != canvas_height:
+            self.canvas_height = canvas_height
+            self.resize(self.canvas_width, self.canvas_height)
+            self.logger.info("Spectrogram texture: canvas_height changed, now: %d", canvas_height)
+
+    def setcanvas_width(self, canvas_width):
+        canvas_width = int(canvas_width)
+        if self.canvas_width != canvas_width:
+            self.resize(canvas_width, self.canvas_height)
+            self.canvas_width = canvas_width
+            self.canvasWidthChanged.emit(canvas_width)
+            self.logger.info("Spectrogram texture: canvas_width changed, now: %d", canvas_width)
+
+    def setspecrange(self, spec_min, spec_max):
+        self.spec_min = spec_min
+        self.spec_max = spec_max
+
+    def addPixelAdvance(self, pixel_advance):
+        self.time_offset += pixel_advance
+
+        # avoid long-run drift between self.offset and self.time_offset
+        alpha = 0.98
+        self.time_offset = alpha * self.time_offset + (1. - alpha) * self.offset
+
+    def addData(self, xyzs):
+        # the rows are the frequencies, from the lowest, which is at the bottom of the texture
+        columns = np.ascontiguousarray(xyzs, dtype=np.float32)
+
+        self.pending.append((self.offset, columns))
+        self.pending_width += columns.shape[1]
+        self.offset += columns.shape[1]
+
+        # when the canvas is not painted, only the columns that fit in the ring are kept
+        while len(self.pending) > 1 and self.pending_width - self.pending[0][1].shape[1] >= self.canvas_width:
+            self.pending_width -= self.pending.pop(0)[1].shape[1]
+
+    def showImage(self, xyzs):
+        """Replace the image with the columns of xyzs, the first one at the left of the canvas."""
+        self.erase()
+        self.addData(xyzs)
+        # the ring starts at the first column, so that the image is drawn in one piece
+        self.offset = 0
+        self.time_offset = 0
+
+    def getoffset(self, delay=0):
+        return self.offset % self.canvas_width
+
+    # this is used when there is an underflow in the audio input
+    def syncOffsets(self):
+        self.time_offset = self.offset
+
+    def createTexture(self, width, height):
+        texture = GL.glGenTextures(1)
+        GL.glBindTexture(GL.GL_TEXTURE_2D, texture)
+        GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_MIN_FILTER, GL.GL_LINEAR)
+        GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_MAG_FILTER, GL.GL_LINEAR)
+        # the time axis is a ring
+        GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_WRAP_S, GL.GL_REPEAT)
+        GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_WRAP_T, GL.GL_CLAMP_TO_EDGE)
+        empty = np.full((height, width), EMPTY_LEVEL, dtype=np.float32)
+        GL.glTexImage2D(GL.GL_TEXTURE_2D, 0, GL.GL_R32F, width, height, 0, GL.GL_RED, GL.GL_FLOAT, empty)
+        GL.glBindTexture(GL.GL_TEXTURE_2D, 0)
+        return texture
+
+    def resizeTexture(self, width, height):
+        texture = self.createTexture(width, height)
+
+        if self.texture is not None and not self.must_clear:
+            # scale the history on the GPU, with a linear filter
+            read_fbo, draw_fbo = GL.glGenFramebuffers(2)
+            try:
+                GL.glBindFramebuffer(GL.GL_READ_FRAMEBUFFER, read_fbo)
+                GL.glFramebufferTexture2D(GL.GL_READ_FRAMEBUFFER, GL.GL_COLOR_ATTACHMENT0, GL.GL_TEXTURE_2D, self.texture, 0)
+                GL.glBindFramebuffer(GL.GL_DRAW_FRAMEBUFFER, draw_fbo)
+                GL.glFramebufferTexture2D(GL.GL_DRAW_FRAMEBUFFER, GL.GL_COLOR_ATTACHMENT0, GL.GL_TEXTURE_2D, texture, 0)
+                GL.glBlitFramebuffer(0, 0, self.texture_width, self.texture_height, 0, 0, width, height,
+                                     GL.GL_COLOR_BUFFER_BIT, GL.GL_LINEAR)
+            finally:
+                # bind the framebuffer of the widget back
+                GL.glBindFramebuffer(GL.GL_FRAMEBUFFER, QtGui.QOpenGLContext.currentContext().defaultFramebufferObject())
+                GL.glDeleteFramebuffers(2, [read_fbo, draw_fbo])
+
+        if self.texture is not None:
+            GL.glDeleteTextures([self.texture])
+
+        self.texture = texture
+        self.texture_width = width
+        self.texture_height = height
+        self.must_clear = False
+
+    def upload(self):
+        """Copy the pending columns into the texture ring. The OpenGL context must be current."""
+        if self.texture is None or self.must_clear:
+            self.resizeTexture(self.canvas_width, self.canvas_height)
+
+        width = self.texture_width
+
+        GL.glBindTexture(GL.GL_TEXTURE_2D, self.texture)
+        try:
+            for offset, columns in self.pending:
+                # columns computed for another height, before a resize
+                if columns.shape[0] != self.texture_height:
+                    continue
+
+                if columns.shape[1] > width:
+                    offset += columns.shape[1] - width
+                    columns = columns[:, -width:]
+
+                start = int(offset) % width
+                direct = min(columns.shape[1], width - start)
+                self.texSubImage(start, columns[:, :direct])
+                if direct < columns.shape[1]:
+                    self.texSubImage(0, columns[:, direct:])
+        finally:
+            GL.glBindTexture(GL.GL_TEXTURE_2D, 0)
+
+        self.pending = []
+        self.pending_width = 0
+
+    def texSubImage(self, x, columns):
+        columns = np.ascontiguousarray(columns)
+        GL.glTexSubImage2D(GL.GL_TEXTURE_2D, 0, x, 0, columns.shape[1], columns.shape[0], GL.GL_RED, GL.GL_FLOAT, columns)
+
+    def initializeGL(self):
+        # True for OpenGL Core profile, False for Compatibility profile
+        is_core = QtGui.QOpenGLContext.currentContext().format().profile() == QtGui.QSurfaceFormat.CoreProfile
+
+        legacy_vertex_shader_source = """
+            #version 110
+
+            // input
+            attribute vec2 in_position;
+            attribute vec2 in_texcoord;
+
+            // output
+            varying vec2 texcoord;
+
+            void main()
+            {
+                gl_Position = vec4(in_position, 0.0, 1.0);
+                texcoord = in_texcoord;
+            }"""
+
+        core_vertex_shader_source = """
+            #version 150 core
+
+            // input
+            in vec2 in_position;
+            in vec2 in_texcoord;
+
+            // output
+            out vec2 texcoord;
+
+            void main()
+            {
+                gl_Position = vec4(in_position, 0.0, 1.0);
+                texcoord = in_texcoord;
+            }"""
+
+        legacy_fragment_shader_source = """
+            #version 110
+
+            // input
+            varying vec2 texcoord;
+            uniform sampler2D spectrogram;
+            uniform sampler1D colormap;
+            uniform float colormap_size;
+            uniform float spec_min;
+            uniform float spec_max;
+
+            void main()
+            {
+                float level = texture2D(spectrogram, texcoord).r;
+                float v = clamp((level - spec_min) / (spec_max - spec_min), 0.0, 1.0);
+                // sample the colormap at the centers of its first and last texels
+                gl_FragColor = vec4(texture1D(colormap, (v * (colormap_size - 1.0) + 0.5) / colormap_size).rgb, 1.0);
+            }"""
+
+        core_fragment_shader_source = """
+            #version 150 core
+
+            // input
+            in vec2 texcoord;
+            uniform sampler2D spectrogram;
+            uniform sampler1D colormap;
+            uniform float colormap_size;
+            uniform float spec_min;
+            uniform float spec_max;
+
+            // output
+            out vec4 frag_color;
+
+            void main()
+            {
+                float level = texture(spectrogram, texcoord).r;
+                float v = clamp((level - spec_min) / (spec_max - spec_min), 0.0, 1.0);
+                // sample the colormap at the centers of its first and last texels
+                frag_color = vec4(texture(colormap, (v * (colormap_size - 1.0) + 0.5) / colormap_size).rgb, 1.0);
+            }"""
+
+        vertex_shader_source = core_vertex_shader_source if is_core else legacy_vertex_shader_source
+        fragment_shader_source = core_fragment_shader_source if is_core else legacy_fragment_shader_source
+
+        vertex_shader = GL.shaders.compileShader(vertex_shader_source, GL.GL_VERTEX_SHADER)
+        fragment_shader = GL.shaders.compileShader(fragment_shader_source, GL.GL_FRAGMENT_SHADER)
+        self.program = compileProgram(vertex_shader, fragment_shader, attributes=("in_position", "in_texcoord"))
+
+        cmap = generated_cmrmap.CMAP.astype(np.float32)
+        self.colormap_texture = GL.glGenTextures(1)
+        GL.glBindTexture(GL.GL_TEXTURE_1D, self.colormap_texture)
+        GL.glTexParameteri(GL.GL_TEXTURE_1D, GL.GL_TEXTURE_MIN_FILTER, GL.GL_LINEAR)
+        GL.glTexParameteri(GL.GL_TEXTURE_1D, GL.GL_TEXTURE_MAG_FILTER, GL.GL_LINEAR)
+        GL.glTexParameteri(GL.GL_TEXTURE_1D, GL.GL_TEXTURE_WRAP_S, GL.GL_CLAMP_TO_EDGE)
+        GL.glTexImage1D(GL.GL_TEXTURE_1D, 0, GL.GL_RGB, cmap.shape[0], 0, GL.GL_RGB, GL.GL_FLOAT, cmap)
+        GL.glBindTexture(GL.GL_TEXTURE_1D, 0)
+
+        self.quad_vbo = vbo.VBO(np.zeros((4, 4), dtype=np.float32))
+
+    def glDraw(self, offset, rect, shader_program):
+        if self.program is None:
+            self.initializeGL()
+
+        # new size after an upload, so that the columns already computed fill the previous texture
+        if self.texture_width != self.canvas_width or self.texture_height != self.canvas_height:
+            self.resizeTexture(self.canvas_width, self.canvas_height)
+
+        # the whole canvas shows a window of the ring, starting at offset
+        s0 = offset / self.texture_width
+        s1 = (offset + rect.width()) / self.texture_width
+        quad = np.array([[-1., -1., s0, 0.],
+                         [1., -1., s1, 0.],
+                         [-1., 1., s0, 1.],
+                         [1., 1., s1, 1.]], dtype=np.float32)
+        self.quad_vbo.set_array(quad)
+
+        GL.glUseProgram(self.program)
+        self.quad_vbo.bind()
+        try:
+            GL.glActiveTexture(GL.GL_TEXTURE0)
+            GL.glBindTexture(GL.GL_TEXTURE_2D, self.texture)
+            GL.glActiveTexture(GL.GL_TEXTURE1)
+            GL.glBindTexture(GL.GL_TEXTURE_1D, self.colormap_texture)
+
+            GL.glUniform1i(GL.glGetUniformLocation(self.program, "spectrogram"), 0)
+            GL.glUniform1i(GL.glGetUniformLocation(self.program, "colormap"), 1)
+            GL.glUniform1f(GL.glGetUniformLocation(self.program, "colormap_size"), float(generated_cmrmap.CMAP.shape[0]))
+            GL.glUniform1f(GL.glGetUniformLocation(self.program, "spec_min"), self.spec_min)
+            GL.glUniform1f(GL.glGetUniformLocation(self.program, "spec_max"), self.spec_max)
+
+            GL.glEnableVertexAttribArray(0)
+            GL.glEnableVertexAttribArray(1)
+            stride = quad.shape[1] * sizeof(c_float)
+            GL.glVertexAttribPointer(0, 2, GL.GL_FLOAT, GL.GL_FALSE, stride, c_void_p(0))
+            GL.glVertexAttribPointer(1, 2, GL.GL_FLOAT, GL.GL_FALSE, stride, c_void_p(2 * sizeof(c_float)))
+            GL.glDrawArrays(GL.GL_TRIANGLE_STRIP, 0, quad.shape[0])
+            GL.glDisableVertexAttribArray(0)
+            GL.glDisableVertexAttribArray(1)
+        finally:
+            GL.glBindTexture(GL.GL_TEXTURE_1D, 0)
+            GL.glActiveTexture(GL.GL_TEXTURE0)
+            GL.glBindTexture(GL.GL_TEXTURE_2D, 0)
+            self.quad_vbo.unbind()
+            GL.glUseProgram(shader_program)
@@ -17,9 +17,14 @@
 # You should have received a copy of the GNU General Public License
 # along with Friture.  If not, see <http://www.gnu.org/licenses/>.
 
+import threading
+
 from PyQt5 import QtWidgets
-from numpy import log10, argmax, zeros, arange, floor, float64
+from numpy import log10, argmax, zeros, arange, float64
 from friture.audioproc import audioproc  # audio processing class
+from friture.analysiscache import AnalysisCache
+from friture.analysisthread import Mailbox
+from friture.constantq import ConstantQTransform, bins_per_octave_for_pixels, ANALYSIS_CQT
 from friture.spectrum_settings import (Spectrum_Settings_Dialog,  # settings dialog
                                        DEFAULT_FFT_SIZE,
                                        DEFAULT_FREQ_SCALE,
@@ -29,7 +34,8 @@ from friture.spectrum_settings import (Spectrum_Settings_Dialog,  # settings dia
                                        DEFAULT_SPEC_MAX,
                                        DEFAULT_WEIGHTING,
                                        DEFAULT_RESPONSE_TIME,
-                                       DEFAULT_SHOW_FREQ_LABELS)
+                                       DEFAULT_SHOW_FREQ_LABELS,
+                                       DEFAULT_ANALYSIS)
 
 from friture.audiobackend import SAMPLING_RATE
 from friture.spectrumPlotWidget import SpectrumPlotWidget
@@ -63,12 +69,27 @@ class Spectrum_Widget(QtWidgets.QWidget):
         self.weighting = DEFAULT_WEIGHTING
         self.dual_channels = False
         self.response_time = DEFAULT_RESPONSE_TIME
+        self.analysis_type = DEFAULT_ANALYSIS
+        # constant-Q engines of the two channels, when selected instead of the FFT
+        self.cqt1 = None
+        self.cqt2 = None
 
         self.update_weighting()
         self.freq = self.proc.get_freq_scale()
 
-        self.old_index = 0
+        # cursor on the audio ring buffer
+        self.reader = None
         self.overlap = 3. / 4.
+        # the constant-Q bins match the pixels divided by this, lowered by the frame scheduler
+        self.resolution_divider = 1
+
+        self.analysis1 = None
+        self.analysis2 = None
+
+        # handle_new_data runs in the analysis thread, while the settings are changed from the GUI thread
+        self.lock = threading.RLock()
+        # ready-to-draw spectrum, handed over to the GUI thread
+        self.mailbox = Mailbox()
 
         self.update_display_buffers()
 
@@ -89,7 +110,33 @@ class Spectrum_Widget(QtWidgets.QWidget):
     # method
     def set_buffer(self, buffer):
         self.audiobuffer = buffer
-        self.old_index = self.audiobuffer.ringbuffer.offset
+        self.subscribe_analysis()
+
+    def subscribe_analysis(self):
+        # the FFT frames are computed by the shared analysis cache,
+        # so that docks with the same settings do not compute them twice
+        AnalysisCache().unsubscribe(self.analysis1)
+        AnalysisCache().unsubscribe(self.analysis2)
+
+        step = int(self.fft_size * (1. - self.overlap))
+        self.analysis1 = AnalysisCache().subscribe(self.audiobuffer, self.fft_size, step, channel=0)
+        self.analysis2 = AnalysisCache().subscribe(self.audiobuffer, self.fft_size, step, channel=1)
+
+        # the reader cursor is aligned on the step, which is the frames grid shared by all the docks
+        if self.reader is not None:
+            self.audiobuffer.unregister_reader(self.reader)
+        self.reader = self.audiobuffer.register_reader(self.fft_size, step)
+
+    def closeEvent(self, event):
+        with self.lock:
+            AnalysisCache().unsubscribe(self.analysis1)
+            AnalysisCache().unsubscribe(self.analysis2)
+            self.analysis1 = None
+            self.analysis2 = None
+            if self.reader is not None:
+                self.audiobuffer.unregister_reader(self.reader)
+                self.reader = None
+        super().closeEvent(event)
 
     def log_spectrogram(self, sp):
         # Note: implementing the log10 of the array in Cython did not bring
@@ -100,36 +147,44 @@ class Spectrum_Widget(QtWidgets.QWidget):
         return 10. * log10(sp + epsilon)
 
     def handle_new_data(self, floatdata):
-        # we need to maintain an index of where we are in the buffer
-        index = self.audiobuffer.ringbuffer.offset
+        with self.lock:
+            result = self.process(floatdata)
 
-        available = index - self.old_index
+            if result is not None:
+                self.mailbox.post(result, self.audiobuffer.lastCaptureTime)
 
-        if available < 0:
-            # ringbuffer must have grown or something...
-            available = 0
-            self.old_index = index
+    def process(self, floatdata):
+        # the dock may have been closed while this block was waiting for the lock
+        if self.reader is None:
+            return None
 
-        # if we have enough data to add a frequency column in the time-frequency plane, compute it
-        needed = self.fft_size * (1. - self.overlap)
-        realizable = int(floor(available / needed))
+        # number of new frames since the last call
+        realizable = self.reader.pending()
 
         if realizable > 0:
-            sp1n = zeros((len(self.freq), realizable), dtype=float64)
-            sp2n = zeros((len(self.freq), realizable), dtype=float64)
-
-            for i in range(realizable):
-                floatdata = self.audiobuffer.data_indexed(self.old_index, self.fft_size)
-
+            # frames end on the reader grid, right after the cursor
+            first_end = self.reader.index + self.reader.step
+
+            if self.cqt1 is not None:
+                # the constant-Q engines keep their own history, they only need the new samples
+                length = realizable * self.reader.step
+                samples = self.audiobuffer.data_indexed(self.reader.index + length, length)
+                sp1n = self.cqt1.process(samples[0, :], realizable, self.reader.step).T
+            else:
                 # first channel
-                # FFT transform
-                sp1n[:, i] = self.proc.analyzelive(floatdata[0, :])
+                # spectra are shared with the other docks, transposed to (frequency, frames)
+                sp1n = self.analysis1.frames(first_end, realizable).T
 
-                if self.dual_channels and floatdata.shape[0] > 1:
-                    # second channel for comparison
-                    sp2n[:, i] = self.proc.analyzelive(floatdata[1, :])
+            if self.dual_channels and floatdata.shape[0] > 1:
+                # second channel for comparison
+                if self.cqt2 is not None:
+                    sp2n = self.cqt2.process(samples[1, :], realizable, self.reader.step).T
+                else:
+                    sp2n = self.analysis2.frames(first_end, realizable).T
+            else:
+                sp2n = zeros((len(self.freq), realizable), dtype=float64)
 
-                self.old_index += int(needed)
+            self.reader.advance(realizable)
 
             # compute the widget data
             sp1 = pyx_exp_smoothed_value_numpy(self.kernel, self.alpha, sp1n, self.dispbuffers1)
@@ -153,10 +208,21 @@ class Spectrum_Widget(QtWidgets.QWidget):
             i = argmax(dB_spectrogram)
             fmax = self.freq[i]
 
-            self.PlotZoneSpect.setdata(self.freq, dB_spectrogram, fmax)
+            return self.freq, dB_spectrogram, fmax
+
+        return None
 
     # method
     def canvasUpdate(self):
+        result = self.mailbox.take()
+        if result is not None:
+            self.PlotZoneSpect.setdata(*result)
+
+        if self.cqt1 is not None and self.cqt_bins_per_octave() != self.cqt1.bins_per_octave:
+            # the plot has been resized, match the bins to the new pixel resolution
+            with self.lock:
+                self.update_analysis()
+
         self.PlotZoneSpect.canvasUpdate()
 
     def pause(self):
@@ -165,22 +231,29 @@ class Spectrum_Widget(QtWidgets.QWidget):
     def restart(self):
         self.PlotZoneSpect.restart()
 
+    def resync(self):
+        with self.lock:
+            # jump to the newest samples, and start the smoothing and the constant-Q history over
+            self.reader.skip_pending()
+            self.update_analysis()
+
     def setresponsetime(self, response_time):
-        # time = SMOOTH_DISPLAY_TIMER_PERIOD_MS/1000. #DISPLAY
-        # time = 0.025 #IMPULSE setting for a sound level meter
-        # time = 0.125 #FAST setting for a sound level meter
-        # time = 1. #SLOW setting for a sound level meter
-        self.response_time = response_time
-
-        # an exponential smoothing filter is a simple IIR filter
-        # s_i = alpha*x_i + (1-alpha)*s_{i-1}
-        # we compute alpha so that the N most recent samples represent 100*w percent of the output
-        w = 0.65
-        delta_n = self.fft_size * (1. - self.overlap)
-        n = self.response_time * SAMPLING_RATE / delta_n
-        N = 2 * 4096
-        self.alpha = 1. - (1. - w) ** (1. / (n + 1))
-        self.kernel = self.compute_kernel(self.alpha, N)
+        with self.lock:
+            # time = SMOOTH_DISPLAY_TIMER_PERIOD_MS/1000. #DISPLAY
+            # time = 0.025 #IMPULSE setting for a sound level meter
+            # time = 0.125 #FAST setting for a sound level meter
+            # time = 1. #SLOW setting for a sound level meter
+            self.response_time = response_time
+
+            # an exponential smoothing filter is a simple IIR filter
+            # s_i = alpha*x_i + (1-alpha)*s_{i-1}
+            # we compute alpha so that the N most recent samples represent 100*w percent of the output
+            w = 0.65
+            delta_n = self.fft_size * (1. - self.overlap)
+            n = self.response_time * SAMPLING_RATE / delta_n
+            N = 2 * 4096
+            self.alpha = 1. - (1. - w) ** (1. / (n + 1))
+            self.kernel = self.compute_kernel(self.alpha, N)
 
     def compute_kernel(self, alpha, N):
         kernel = (1. - alpha) ** arange(N - 1, -1, -1)
@@ -197,30 +270,26 @@ class Spectrum_Widget(QtWidgets.QWidget):
         self.setMinMaxFreq(self.minfreq, maxfreq)
 
     def setMinMaxFreq(self, minfreq, maxfreq):
-        self.minfreq = minfreq
-        self.maxfreq = maxfreq
+        with self.lock:
+            self.minfreq = minfreq
+            self.maxfreq = maxfreq
 
-        realmin = min(self.minfreq, self.maxfreq)
-        realmax = max(self.minfreq, self.maxfreq)
+            realmin = min(self.minfreq, self.maxfreq)
+            realmax = max(self.minfreq, self.maxfreq)
 
-        self.proc.set_maxfreq(realmax)
+            self.proc.set_maxfreq(realmax)
 
-        self.freq = self.proc.get_freq_scale()
-        self.update_display_buffers()
-        self.update_weighting()
-        # reset kernel and parameters for the smoothing filter
-        self.setresponsetime(self.response_time)
+            self.update_analysis()
 
         self.PlotZoneSpect.setfreqrange(realmin, realmax)
 
     def setfftsize(self, fft_size):
-        self.fft_size = fft_size
-        self.proc.set_fftsize(self.fft_size)
-        self.freq = self.proc.get_freq_scale()
-        self.update_display_buffers()
-        self.update_weighting()
-        # reset kernel and parameters for the smoothing filter
-        self.setresponsetime(self.response_time)
+        with self.lock:
+            self.fft_size = fft_size
+            self.proc.set_fftsize(self.fft_size)
+            if self.audiobuffer is not None:
+                self.subscribe_analysis()
+            self.update_analysis()
 
     def setmin(self, value):
         self.spec_min = value
@@ -231,12 +300,64 @@ class Spectrum_Widget(QtWidgets.QWidget):
         self.PlotZoneSpect.setspecrange(self.spec_min, self.spec_max)
 
     def setweighting(self, weighting):
-        self.weighting = weighting
-        self.PlotZoneSpect.setweighting(weighting)
+        with self.lock:
+            self.weighting = weighting
+            self.PlotZoneSpect.setweighting(weighting)
+            self.update_weighting()
+
+    def setanalysis(self, analysis_type):
+        with self.lock:
+            self.analysis_type = analysis_type
+            self.update_analysis()
+
+    def set_overlap(self, overlap):
+        if overlap == self.overlap:
+            return
+
+        with self.lock:
+            self.overlap = overlap
+            if self.audiobuffer is not None:
+                self.subscribe_analysis()
+            # the smoothing depends on the frames rate
+            self.setresponsetime(self.response_time)
+
+    def set_display_resolution(self, divider):
+        if divider == self.resolution_divider:
+            return
+
+        with self.lock:
+            self.resolution_divider = divider
+            if self.analysis_type == ANALYSIS_CQT:
+                self.update_analysis()
+
+    def cqt_bins_per_octave(self):
+        # one bin per pixel of the plot width, on a log frequency scale
+        return bins_per_octave_for_pixels(self.PlotZoneSpect.canvasWidget.width() // self.resolution_divider,
+                                          min(self.minfreq, self.maxfreq), max(self.minfreq, self.maxfreq))
+
+    def update_analysis(self):
+        # to be called with the lock held
+        if self.analysis_type == ANALYSIS_CQT:
+            realmin = min(self.minfreq, self.maxfreq)
+            realmax = max(self.minfreq, self.maxfreq)
+            bins_per_octave = self.cqt_bins_per_octave()
+            self.cqt1 = ConstantQTransform(realmin, realmax, bins_per_octave)
+            self.cqt2 = ConstantQTransform(realmin, realmax, bins_per_octave)
+            self.freq = self.cqt1.get_freq_scale()
+        else:
+            self.cqt1 = None
+            self.cqt2 = None
+            self.freq = self.proc.get_freq_scale()
+        self.update_display_buffers()
         self.update_weighting()
+        # reset kernel and parameters for the smoothing filter
+        self.setresponsetime(self.response_time)
 
     def update_weighting(self):
-        A, B, C = self.proc.get_freq_weighting()
+        if self.cqt1 is not None:
+            A, B, C = self.cqt1.get_freq_weighting()
+        else:
+            A, B, C = self.proc.get_freq_weighting()
         if self.weighting is 0:
             self.w = zeros(A.shape)
         elif self.weighting is 1:
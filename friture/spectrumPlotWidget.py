@@ -51,18 +51,12 @@ class SpectrumPlotWidget(QtWidgets.QWidget):
         self.canvasWidget.setTrackerFormatter(lambda x, y: "%d Hz, %.1f dB" % (x, y))
         self.canvasWidget.resized.connect(self.canvasResized)
 
-        def r_peak(p): return 1. + 0.*p
-        def g_peak(p): return 1. - p
-        def b_peak(p): return 1. - p
-
-        self.peakQuadsItem = QuadsItem(r_peak, g_peak, b_peak)
+        # white to red
+        self.peakQuadsItem = QuadsItem((1., 1., 1.), (0., -1., -1.))
         self.canvasWidget.attach(self.peakQuadsItem)
 
-        def r_signal(p): return 0.*p
-        def g_signal(p): return 0.3 + 0.5*p
-        def b_signal(p): return 0.*p
-
-        self.quadsItem = QuadsItem(r_signal, g_signal, b_signal)
+        # dark to light green
+        self.quadsItem = QuadsItem((0., 0.3, 0.), (0., 0.5, 0.))
         self.canvasWidget.attach(self.quadsItem)
 
         plotLayout = QtWidgets.QGridLayout()
@@ -153,7 +147,8 @@ class SpectrumPlotWidget(QtWidgets.QWidget):
         x2[:-1] = x1[1:]
         x2[-1] = float(SAMPLING_RATE / 2)
 
-        if len(x1) != len(self.x1):
+        # the bins change with the FFT size and with the analysis engine
+        if not np.array_equal(x1, self.x1):
             self.needtransform = True
             self.x1 = x1
             self.x2 = x2
@@ -171,6 +166,8 @@ class SpectrumPlotWidget(QtWidgets.QWidget):
                 self.compute_peaks(y)
                 self.peakQuadsItem.setData(x1, x2, self.peak, self.peak_int)
 
+            self.canvasWidget.invalidateData()
+
     def draw(self):
         if self.needtransform:
             self.verticalScaleDivision.setLength(self.canvasWidget.height())
@@ -194,6 +191,7 @@ class SpectrumPlotWidget(QtWidgets.QWidget):
 
             self.quadsItem.transformUpdate()
             self.peakQuadsItem.transformUpdate()
+            self.canvasWidget.invalidateTransform()
 
             self.needtransform = False
 
@@ -212,7 +210,7 @@ class SpectrumPlotWidget(QtWidgets.QWidget):
         self.draw()
 
     def canvasUpdate(self):
-        self.canvasWidget.update()
+        self.canvasWidget.canvasUpdate()
 
     def compute_peaks(self, y):
         if len(self.peak) != len(y):
@@ -33,6 +33,7 @@ DEFAULT_WEIGHTING = 1  # A
 DEFAULT_SHOW_FREQ_LABELS = True
 DEFAULT_RESPONSE_TIME = 0.025
 DEFAULT_RESPONSE_TIME_INDEX = 0
+DEFAULT_ANALYSIS = 0  # FFT
 
 
 class Spectrum_Settings_Dialog(QtWidgets.QDialog):
@@ -124,7 +125,14 @@ class Spectrum_Settings_Dialog(QtWidgets.QDialog):
         self.checkBox_showFreqLabels.setObjectName("showFreqLabels")
         self.checkBox_showFreqLabels.setChecked(DEFAULT_SHOW_FREQ_LABELS)
 
+        self.comboBox_analysis = QtWidgets.QComboBox(self)
+        self.comboBox_analysis.setObjectName("analysis")
+        self.comboBox_analysis.addItem("FFT (linear frequency bins)")
+        self.comboBox_analysis.addItem("Constant-Q (log frequency bins)")
+        self.comboBox_analysis.setCurrentIndex(DEFAULT_ANALYSIS)
+
         self.formLayout.addRow("Measurement type:", self.comboBox_dual_channel)
+        self.formLayout.addRow("Analysis:", self.comboBox_analysis)
         self.formLayout.addRow("FFT Size:", self.comboBox_fftsize)
         self.formLayout.addRow("Frequency scale:", self.comboBox_freqscale)
         self.formLayout.addRow("Min frequency:", self.spinBox_minfreq)
@@ -147,6 +155,7 @@ class Spectrum_Settings_Dialog(QtWidgets.QDialog):
         self.comboBox_weighting.currentIndexChanged.connect(self.parent().setweighting)
         self.comboBox_response_time.currentIndexChanged.connect(self.responsetimechanged)
         self.checkBox_showFreqLabels.toggled.connect(self.parent().setShowFreqLabel)
+        self.comboBox_analysis.currentIndexChanged.connect(self.parent().setanalysis)
 
     # slot
     def dualchannelchanged(self, index):
@@ -194,6 +203,7 @@ class Spectrum_Settings_Dialog(QtWidgets.QDialog):
         settings.setValue("weighting", self.comboBox_weighting.currentIndex())
         settings.setValue("responseTime", self.comboBox_response_time.currentIndex())
         settings.setValue("showFreqLabels", self.checkBox_showFreqLabels.isChecked())
+        settings.setValue("analysis", self.comboBox_analysis.currentIndex())
 
     # method
     def restoreState(self, settings):
@@ -215,3 +225,5 @@ class Spectrum_Settings_Dialog(QtWidgets.QDialog):
         self.comboBox_response_time.setCurrentIndex(responseTime)
         showFreqLabels = settings.value("showFreqLabels", DEFAULT_SHOW_FREQ_LABELS, type=bool)
         self.checkBox_showFreqLabels.setChecked(showFreqLabels)
+        analysis = settings.value("analysis", DEFAULT_ANALYSIS, type=int)
+        self.comboBox_analysis.setCurrentIndex(analysis)
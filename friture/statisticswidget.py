@@ -17,8 +17,12 @@
 # You should have received a copy of the GNU General Public License
 # along with Friture.  If not, see <http://www.gnu.org/licenses/>.
 
+import html
+import logging
+
 from PyQt5 import QtCore, QtWidgets
 from friture.audiobackend import AudioBackend
+from friture.instrumentation import Instrumentation
 
 
 class StatisticsWidget(QtWidgets.QWidget):
@@ -26,6 +30,8 @@ class StatisticsWidget(QtWidgets.QWidget):
     def __init__(self, parent, timer):
         super().__init__(parent)
 
+        self.logger = logging.getLogger(__name__)
+
         self.setObjectName("tab_stats")
 
         self.stats_scrollarea = QtWidgets.QScrollArea(self)
@@ -43,14 +49,27 @@ class StatisticsWidget(QtWidgets.QWidget):
         self.LabelStats.setTextInteractionFlags(QtCore.Qt.LinksAccessibleByKeyboard | QtCore.Qt.LinksAccessibleByMouse |
                                                 QtCore.Qt.TextBrowserInteraction | QtCore.Qt.TextSelectableByKeyboard | QtCore.Qt.TextSelectableByMouse)
         self.LabelStats.setObjectName("LabelStats")
+        self.LabelStats.setTextFormat(QtCore.Qt.RichText)
 
         self.stats_layout = QtWidgets.QVBoxLayout(self.scrollAreaWidgetContents)
         self.stats_layout.setObjectName("stats_layout")
         self.stats_layout.addWidget(self.LabelStats)
         self.stats_scrollarea.setWidget(self.scrollAreaWidgetContents)
 
+        self.reset_button = QtWidgets.QPushButton("Reset timings", self)
+        self.reset_button.clicked.connect(self.reset_clicked)
+
+        self.export_button = QtWidgets.QPushButton("Export timings as JSON...", self)
+        self.export_button.clicked.connect(self.export_clicked)
+
+        self.buttons_layout = QtWidgets.QHBoxLayout()
+        self.buttons_layout.addWidget(self.reset_button)
+        self.buttons_layout.addWidget(self.export_button)
+        self.buttons_layout.addStretch()
+
         self.tab_stats_layout = QtWidgets.QGridLayout(self)
         self.tab_stats_layout.addWidget(self.stats_scrollarea)
+        self.tab_stats_layout.addLayout(self.buttons_layout, 1, 0)
 
         timer.timeout.connect(self.stats_update)
 
@@ -59,9 +78,50 @@ class StatisticsWidget(QtWidgets.QWidget):
         if not self.LabelStats.isVisible():
             return
 
-        label = "Chunk #%d\n"\
+        label = "Chunk #%d<br/>"\
             "Number of overflowed inputs (XRUNs): %d"\
             % (AudioBackend().chunk_number,
                AudioBackend().xruns)
 
+        description = AudioBackend().describe_input()
+        label += "<br/>Input: %s" % (html.escape(str(description['device'])))
+        if 'host_api' in description:
+            label += " (%s)" % (html.escape(description['host_api']))
+        if 'reported_latency_ms' in description:
+            label += "<br/>Input latency reported by the device: %.1f ms" % (description['reported_latency_ms'])
+
+        label += self.timings_table()
+
         self.LabelStats.setText(label)
+
+    # method
+    def timings_table(self):
+        rows = ""
+        for source, metric, histogram in Instrumentation().summary():
+            rows += "<tr><td>%s</td><td>%s</td><td align=right>%d</td>"\
+                "<td align=right>%.2f</td><td align=right>%.2f</td><td align=right>%.2f</td></tr>"\
+                % (source, metric, histogram.count,
+                   histogram.percentile(50) * 1e3, histogram.percentile(99) * 1e3, histogram.max * 1e3)
+
+        if len(rows) == 0:
+            return ""
+
+        return "<p>Timings (ms), the latency is measured from the capture of the audio to the display:</p>"\
+            "<table cellspacing=4><tr><th align=left>Source</th><th align=left>Metric</th><th>Count</th>"\
+            "<th>p50</th><th>p99</th><th>max</th></tr>%s</table>" % (rows)
+
+    # slot
+    def reset_clicked(self):
+        Instrumentation().reset()
+        self.stats_update()
+
+    # slot
+    def export_clicked(self):
+        path, _ = QtWidgets.QFileDialog.getSaveFileName(self, "Export timings", "friture-timings.json", "JSON files (*.json)")
+        if not path:
+            return
+
+        with open(path, "w") as f:
+            f.write(Instrumentation().to_json(AudioBackend().describe_input()))
+
+        self.logger.info("Timings exported to %s", path)
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2009 Timothée Lecomte
+
+# This file is part of Friture.
+#
+# Friture is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as published by
+# the Free Software Foundation.
+#
+# Friture is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Friture.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Deterministic synthetic audio input, for reproducible profiling sessions.
+
+The signal only depends on its parameters and on the seed, and is delivered
+in blocks of a fixed size, so that two runs give the same workload."""
+
+import logging
+
+import numpy as np
+
+from friture.filesource import PacedSource
+
+SIGNALS = ["noise", "tones", "sweep", "silence", "bursts"]
+
+DEFAULT_SIGNAL = "noise"
+DEFAULT_DURATION = 30.
+DEFAULT_BLOCK_SIZE = 512
+DEFAULT_SEED = 0
+
+NOISE_RMS = 0.1
+TONES_FREQUENCIES = [100., 1000., 5000.]
+TONES_AMPLITUDE = 0.5
+SWEEP_MIN_FREQUENCY = 20.
+SWEEP_MAX_FREQUENCY = 20000.
+SWEEP_PERIOD = 10.
+SWEEP_AMPLITUDE = 0.5
+BURST_PERIOD = 1.
+BURST_DURATION = 0.1
+BURST_RMS = 0.3
+
+# the second channel is the first one delayed, for the delay estimator
+CHANNEL_DELAY = 0.001
+
+
+class SyntheticSource(PacedSource):
+    """Plays a synthetic signal on two channels, for a fixed duration, in blocks of a fixed size.
+
+    The second channel is a copy of the first one, delayed by CHANNEL_DELAY."""
+
+    def __init__(self, sampling_rate, signal=DEFAULT_SIGNAL, duration=DEFAULT_DURATION, block_size=DEFAULT_BLOCK_SIZE,
+                 seed=DEFAULT_SEED, speed=1.):
+        super().__init__(sampling_rate, speed)
+
+        self.logger = logging.getLogger(__name__)
+
+        if signal not in SIGNALS:
+            raise ValueError("Unknown synthetic signal '%s', expected one of %s" % (signal, ", ".join(SIGNALS)))
+
+        self.name = "%s (synthetic)" % signal
+        self.signal = signal
+        self.block_size = block_size
+        self.length = int(duration * sampling_rate)
+        self.random = np.random.RandomState(seed)
+
+        self.delay = int(round(CHANNEL_DELAY * sampling_rate))
+        # the delayed samples of the first channel are kept between blocks
+        self.history = np.zeros(self.delay, dtype=np.float32)
+        self.block = np.zeros((block_size, 2), dtype=np.float32)
+
+        self.logger.info("Playing a synthetic %s signal: %.1f s in blocks of %d samples, seed %d",
+                         signal, duration, block_size, seed)
+
+    def get_nchannels(self):
+        return 2
+
+    def is_finished(self):
+        return self.played >= self.length
+
+    def read_available(self):
+        # whole blocks only, except for the end of the signal
+        count = min(self.block_size, self.length - self.played)
+        if self.frames_due(self.block_size) < count:
+            return 0
+        return count
+
+    def read_buffers(self, count):
+        """Return (count, block, empty), where block has shape (count, 2) and is valid until the next call."""
+        t = (self.played + np.arange(count)) / float(self.sampling_rate)
+        x = self.generate(t)
+
+        block = self.block[:count]
+        block[:, 0] = x
+
+        delayed = np.concatenate((self.history, x))
+        block[:, 1] = delayed[:count]
+        self.history[:] = delayed[count:]
+
+        return count, block, self.block[:0]
+
+    def generate(self, t):
+        n = t.shape[0]
+
+        if self.signal == "noise":
+            return NOISE_RMS * self.random.standard_normal(n)
+        elif self.signal == "tones":
+            x = np.zeros(n)
+            for f in TONES_FREQUENCIES:
+                x += np.sin(2. * np.pi * f * t)
+            return TONES_AMPLITUDE / len(TONES_FREQUENCIES) * x
+        elif self.signal == "sweep":
+            # exponential sweep, restarted every SWEEP_PERIOD
+            k = np.log(SWEEP_MAX_FREQUENCY / SWEEP_MIN_FREQUENCY) / SWEEP_PERIOD
+            tau = t % SWEEP_PERIOD
+            phase = 2. * np.pi * SWEEP_MIN_FREQUENCY * (np.exp(k * tau) - 1.) / k
+            return SWEEP_AMPLITUDE * np.sin(phase)
+        elif self.signal == "bursts":
+            # the noise is drawn for every sample, so that the bursts do not depend on the block size
+            noise = BURST_RMS * self.random.standard_normal(n)
+            return np.where(t % BURST_PERIOD < BURST_DURATION, noise, 0.)
+        else:
+            return np.zeros(n)
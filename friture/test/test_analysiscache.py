@@ -0,0 +1,41 @@
+import numpy as np
+
+import sys
+sys.path.insert(0, '.')
+
+from friture.audiobuffer import AudioBuffer
+from friture.audioproc import audioproc
+from friture.analysiscache import AnalysisCache
+
+
+def test_subscribers_share_frames():
+    audiobuffer = AudioBuffer()
+    rng = np.random.RandomState(0)
+    for i in range(20):
+        audiobuffer.handle_new_data(rng.randn(1, 512), 0., False)
+
+    fft_size = 1024
+    step = 256
+    entry1 = AnalysisCache().subscribe(audiobuffer, fft_size, step)
+    entry2 = AnalysisCache().subscribe(audiobuffer, fft_size, step)
+    assert entry1 is entry2
+
+    index = entry1.align(4000)
+    first = entry1.frames(index, 10)
+    second = entry2.frames(index + 5 * step, 5)
+
+    # the second request is served from the cache
+    assert np.shares_memory(first, second)
+    assert not first.flags.writeable
+
+    proc = audioproc()
+    proc.set_fftsize(fft_size)
+    for i in range(10):
+        samples = audiobuffer.data_indexed(index + i * step, fft_size)[0, :]
+        np.testing.assert_allclose(first[i], proc.analyzelive(samples), rtol=1e-10, atol=1e-20)
+
+    AnalysisCache().unsubscribe(entry1)
+    assert entry1.key == (fft_size, step, 0)
+    assert entry1.key in AnalysisCache().entries
+    AnalysisCache().unsubscribe(entry2)
+    assert (fft_size, step, 0) not in AnalysisCache().entries
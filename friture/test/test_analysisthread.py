@@ -0,0 +1,35 @@
+import threading
+
+import sys
+sys.path.insert(0, '.')
+
+from friture.analysisthread import Mailbox
+
+
+def test_single_slot_keeps_latest():
+    mailbox = Mailbox()
+    assert mailbox.take() is None
+
+    mailbox.post(1)
+    mailbox.post(2)
+    assert mailbox.take() == 2
+    assert mailbox.take() is None
+
+
+def test_queue_keeps_everything_across_threads():
+    mailbox = Mailbox(single_slot=False)
+
+    def produce():
+        for i in range(10000):
+            mailbox.post(i)
+
+    producer = threading.Thread(target=produce)
+    producer.start()
+
+    received = []
+    while producer.is_alive() or len(mailbox.slot) > 0:
+        received += mailbox.take_all()
+
+    producer.join()
+    received += mailbox.take_all()
+    assert received == list(range(10000))
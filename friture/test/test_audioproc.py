@@ -0,0 +1,23 @@
+import numpy as np
+
+import sys
+sys.path.insert(0, '.')
+
+from friture.audioproc import audioproc
+
+
+def test_analyzelive_batch_matches_analyzelive():
+    proc = audioproc()
+    fft_size = 256
+    step = 64
+    count = 7
+    proc.set_fftsize(fft_size)
+
+    samples = np.random.RandomState(0).randn(fft_size + (count - 1) * step)
+
+    expected = np.array([proc.analyzelive(samples[i * step: i * step + fft_size]) for i in range(count)])
+    out = np.zeros((count, fft_size // 2 + 1))
+    result = proc.analyzelive_batch(samples, count, step, out=out)
+
+    assert result is out
+    np.testing.assert_allclose(result, expected, rtol=1e-10, atol=1e-20)
@@ -0,0 +1,25 @@
+import numpy as np
+
+import sys
+sys.path.insert(0, '.')
+
+from friture.benchmark import Benchmark, measure, compare
+
+
+def test_measure_reports_time_and_allocations():
+    benchmark = Benchmark("alloc", 1000, lambda: np.ones(100000))
+    result = measure(benchmark, min_duration=0.01)
+
+    assert result['ticks'] > 0
+    assert result['ns_per_sample'] > 0.
+    # one array of 100000 doubles per tick
+    assert result['alloc_bytes_per_tick'] >= 800000
+
+
+def test_compare_flags_regressions():
+    environment = {'date': '', 'commit': None}
+    baseline = {'environment': environment, 'results': {'a': {'ns_per_sample': 10.}, 'b': {'ns_per_sample': 10.}}}
+    results = {name: {'ns_per_sample': value, 'us_per_tick': 1., 'alloc_bytes_per_tick': 0}
+               for name, value in [('a', 11.), ('b', 20.), ('c', 5.)]}
+
+    assert compare(baseline, results, threshold=1.25) == ['b']
@@ -0,0 +1,35 @@
+import numpy as np
+
+import sys
+sys.path.insert(0, '.')
+
+from friture.constantq import ConstantQTransform
+from friture.signal.sparse import CSRMatrix
+
+SAMPLING_RATE = 48000
+
+
+def test_csr_matrix_matches_dense():
+    rows = [(np.array([0, 3]), np.array([1., 2.])), (np.array([], dtype=int), np.array([])), (np.array([1]), np.array([-1.]))]
+    matrix = CSRMatrix.from_rows(rows, 4)
+    x = np.random.RandomState(0).randn(5, 4)
+
+    np.testing.assert_allclose(matrix.apply(x), x.dot(matrix.todense().T))
+
+
+def test_sine_peaks_at_its_bin_in_every_octave():
+    for bin_index in [3, 100, 200]:
+        cqt = ConstantQTransform(20., 20000., 24)
+        f0 = cqt.freq[bin_index]
+
+        t = np.arange(4 * SAMPLING_RATE) / SAMPLING_RATE
+        x = np.sin(2. * np.pi * f0 * t)
+        # odd hop, to exercise the decimation phases
+        step = 1001
+        count = x.shape[0] // step
+        spectra = cqt.process(x[:count * step], count, step)
+
+        last = spectra[-1]
+        assert np.argmax(last) == bin_index
+        # same power as the FFT spectrum for a unit sine: (1/4)**2
+        np.testing.assert_allclose(last[bin_index], 1. / 16., rtol=0.15)
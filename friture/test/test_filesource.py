@@ -0,0 +1,89 @@
+import numpy as np
+
+import sys
+sys.path.insert(0, '.')
+
+import wave
+
+from friture.filesource import FileSource, SPEED_UNLIMITED, UNLIMITED_BLOCK_SIZE
+
+
+def write_wav(path, samples, sampling_rate=48000):
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(samples.shape[1])
+        f.setsampwidth(2)
+        f.setframerate(sampling_rate)
+        f.writeframes(samples.astype('<i2').tobytes())
+
+
+def play(source, count):
+    read, buffer1, buffer2 = source.read_buffers(count)
+    source.advance_read_index(read)
+    return np.concatenate((buffer1, buffer2))
+
+
+def test_wav_is_memory_mapped(tmpdir):
+    samples = np.random.RandomState(0).randint(-2 ** 15, 2 ** 15, size=(10000, 2))
+    path = str(tmpdir.join("noise.wav"))
+    write_wav(path, samples, 44100)
+
+    source = FileSource(path, speed=SPEED_UNLIMITED)
+    assert source.sampling_rate == 44100
+    assert source.get_nchannels() == 2
+    assert isinstance(source.data, np.memmap)
+
+    source.start()
+    blocks = []
+    while not source.is_finished():
+        count = source.read_available()
+        assert count <= UNLIMITED_BLOCK_SIZE
+        blocks.append(play(source, count))
+
+    np.testing.assert_array_equal(np.concatenate(blocks), samples)
+    assert source.read_available() == 0
+    assert source.get_time() == 10000 / 44100.
+
+
+def test_raw_loop_wraps_around(tmpdir):
+    samples = np.arange(3000, dtype=np.float32).reshape((1000, 3))
+    path = str(tmpdir.join("ramp.raw"))
+    samples.tofile(path)
+
+    source = FileSource(path, speed=SPEED_UNLIMITED, loop=True, raw_format="float32:3:48000")
+    assert source.scale == 1.
+
+    play(source, 900)
+    wrapped = play(source, 300)
+    np.testing.assert_array_equal(wrapped, np.concatenate((samples[900:], samples[:200])))
+    assert source.position == 200
+    assert source.played == 1200
+
+
+def test_paused_source_does_not_play(tmpdir):
+    path = str(tmpdir.join("silence.wav"))
+    write_wav(path, np.zeros((48000, 1)))
+
+    source = FileSource(path, speed=1.)
+    assert source.read_available() == 0
+
+    source.start()
+    source.clock_start -= 0.5
+    assert 0.5 * 48000 <= source.read_available() < 48000
+
+    source.pause()
+    assert source.read_available() == 0
+
+
+def test_24_bit_wav_is_decoded(tmpdir):
+    samples = np.array([[0, -1], [2 ** 23 - 1, -2 ** 23], [1234567, -7654321]])
+    path = str(tmpdir.join("24bit.wav"))
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(2)
+        f.setsampwidth(3)
+        f.setframerate(96000)
+        f.writeframes(samples.astype('<i4').view(np.uint8).reshape(-1, 4)[:, :3].tobytes())
+
+    source = FileSource(path, speed=SPEED_UNLIMITED)
+    assert source.get_nchannels() == 2
+    played = play(source, 3)
+    np.testing.assert_array_equal((played - source.offset) * source.scale, samples * 2. ** -23)
@@ -0,0 +1,87 @@
+import numpy as np
+
+import sys
+sys.path.insert(0, '.')
+
+from friture import generated_filters
+from friture.filter import OctaveFilterBank, NOCTAVE
+from friture_extensions.lfilter import pyx_lfilter_float64_1D
+from friture.signal.decimate import decimate
+
+
+def reference_filter_bank(bdec, adec, sos, x, state):
+    # one lfilter per section and per band, lfilter then [::2] for decimation
+    bands_per_octave = sos.shape[0]
+    y = [None] * (NOCTAVE * bands_per_octave)
+    x_dec = x
+    for j in range(NOCTAVE):
+        for i in range(bands_per_octave):
+            band = x_dec
+            for s in range(sos.shape[1]):
+                band, state[(j, i, s)] = pyx_lfilter_float64_1D(sos[i, s, :3], sos[i, s, 3:], band, state[(j, i, s)])
+            y[(NOCTAVE - 1 - j) * bands_per_octave + i] = band
+        filtered, state[j] = pyx_lfilter_float64_1D(bdec, adec, x_dec, state[j])
+        x_dec = filtered[::2]
+    return y
+
+
+def test_decimate_matches_filter_then_subsample():
+    bdec, adec = generated_filters.PARAMS['dec']
+    x = np.random.RandomState(0).randn(1000)
+
+    expected, _ = pyx_lfilter_float64_1D(bdec, adec, x, np.zeros(len(adec) - 1))
+    x_dec, zf = decimate(bdec, adec, x, np.zeros(len(adec) - 1))
+
+    np.testing.assert_allclose(x_dec, expected[::2], rtol=1e-7, atol=1e-9)
+
+
+def test_filter_bank_matches_reference():
+    bdec, adec = generated_filters.PARAMS['dec']
+    sos = generated_filters.PARAMS['3'][0]
+
+    bank = OctaveFilterBank(bdec, adec, sos)
+
+    state = {j: np.zeros(len(adec) - 1) for j in range(NOCTAVE)}
+    state.update({(j, i, s): np.zeros(2) for j in range(NOCTAVE) for i in range(sos.shape[0]) for s in range(sos.shape[1])})
+
+    rng = np.random.RandomState(0)
+    for i in range(8):
+        x = rng.randn(1024)
+        y, dec = bank.filter(x)
+        y_ref = reference_filter_bank(bdec, adec, sos, x, state)
+
+        for band, band_ref, d in zip(y, y_ref, dec):
+            assert len(band) == len(x) // d
+            np.testing.assert_allclose(band, band_ref, rtol=1e-6, atol=1e-9)
+
+
+def test_filter_bank_is_seamless_across_odd_blocks():
+    bdec, adec = generated_filters.PARAMS['dec']
+    sos = generated_filters.PARAMS['1'][0]
+
+    x = np.random.RandomState(0).randn(4096)
+    y_whole = [band.copy() for band in OctaveFilterBank(bdec, adec, sos).filter(x)[0]]
+
+    bank = OctaveFilterBank(bdec, adec, sos)
+    chunks = [[] for band in y_whole]
+    for block in np.split(x, [333, 1000, 1001, 2500]):
+        for chunk, band in zip(chunks, bank.filter(block)[0]):
+            chunk.append(band.copy())
+
+    for band, chunk in zip(y_whole, chunks):
+        np.testing.assert_allclose(np.concatenate(chunk), band, rtol=1e-10, atol=1e-12)
+
+
+def test_filter_bank_reset_starts_over():
+    bdec, adec = generated_filters.PARAMS['dec']
+    sos = generated_filters.PARAMS['3'][0]
+
+    x = np.random.RandomState(0).randn(1000)
+    y_fresh = [band.copy() for band in OctaveFilterBank(bdec, adec, sos).filter(x)[0]]
+
+    bank = OctaveFilterBank(bdec, adec, sos)
+    bank.filter(np.random.RandomState(1).randn(777))
+    bank.reset()
+
+    for band, band_fresh in zip(bank.filter(x)[0], y_fresh):
+        np.testing.assert_array_equal(band, band_fresh)
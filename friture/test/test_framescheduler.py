@@ -0,0 +1,84 @@
+import sys
+sys.path.insert(0, '.')
+
+from friture.framescheduler import FrameScheduler, QUALITY_LEVELS, RESTORE_EVALUATIONS
+from friture.instrumentation import Instrumentation
+
+
+class FakeDock:
+
+    def __init__(self, name):
+        self.instrumentation_name = name
+        self.active = True
+        self.quality_level = 0
+
+    def objectName(self):
+        return self.instrumentation_name
+
+    def set_quality_level(self, level):
+        self.quality_level = level
+
+
+class FakeDockManager:
+
+    def __init__(self, docks):
+        self.docks = docks
+
+
+def run(scheduler, costs):
+    # costs per dock, in seconds, spent since the last evaluation
+    for name, cost in costs.items():
+        Instrumentation().record(name, "handle_new_data", cost)
+    Instrumentation().record("Analysis thread", "fetchAudioData", sum(costs.values()))
+    scheduler.last_time -= 1.
+    scheduler.evaluate()
+
+
+def test_most_expensive_dock_is_degraded_then_restored():
+    Instrumentation().reset()
+    cheap = FakeDock("Dock 1 (Cheap)")
+    expensive = FakeDock("Dock 2 (Expensive)")
+    scheduler = FrameScheduler(FakeDockManager([cheap, expensive]))
+
+    for i in range(len(QUALITY_LEVELS)):
+        run(scheduler, {cheap.instrumentation_name: 0.1, expensive.instrumentation_name: 0.8})
+    assert expensive.quality_level == len(QUALITY_LEVELS) - 1
+    # the expensive dock cannot be degraded further, the other one is next
+    assert cheap.quality_level == 1
+
+    # in-between loads keep the quality as it is
+    run(scheduler, {cheap.instrumentation_name: 0.3, expensive.instrumentation_name: 0.3})
+    assert cheap.quality_level == 1
+
+    for i in range(RESTORE_EVALUATIONS):
+        run(scheduler, {cheap.instrumentation_name: 0.01, expensive.instrumentation_name: 0.01})
+    assert cheap.quality_level == 0
+    assert expensive.quality_level == len(QUALITY_LEVELS) - 1
+
+    for i in range(RESTORE_EVALUATIONS * len(QUALITY_LEVELS)):
+        run(scheduler, {cheap.instrumentation_name: 0.01, expensive.instrumentation_name: 0.01})
+    assert expensive.quality_level == 0
+
+
+def test_overlap_levels_are_skipped_for_the_docks_that_record_a_history():
+    Instrumentation().reset()
+    recording = FakeDock("Dock 1 (Recording)")
+    recording.records_history = True
+    scheduler = FrameScheduler(FakeDockManager([recording]))
+
+    levels = []
+    for i in range(len(QUALITY_LEVELS)):
+        run(scheduler, {recording.instrumentation_name: 0.9})
+        levels.append(recording.quality_level)
+
+    # each evaluation over budget changes something, the overlap steps do not
+    overlap_steps = [level for level in range(1, len(QUALITY_LEVELS))
+                     if QUALITY_LEVELS[level].display_divider == QUALITY_LEVELS[level - 1].display_divider
+                     and QUALITY_LEVELS[level].resolution_divider == QUALITY_LEVELS[level - 1].resolution_divider]
+    assert len(overlap_steps) > 0
+    assert not set(levels) & set(overlap_steps)
+    assert recording.quality_level == len(QUALITY_LEVELS) - 1
+
+    for i in range(RESTORE_EVALUATIONS * len(QUALITY_LEVELS)):
+        run(scheduler, {recording.instrumentation_name: 0.01})
+    assert recording.quality_level == 0
@@ -0,0 +1,33 @@
+import numpy as np
+
+import sys
+sys.path.insert(0, '.')
+
+from friture.signal.frequency_resampler import Frequency_Resampler, RESAMPLING_MAX_POOLING
+
+
+def test_matches_interp_on_a_block_of_columns():
+    freq = np.linspace(0, 24000, 2049)
+    data = np.random.RandomState(0).rand(2049, 7)
+
+    for logfreqscale in [0, 1]:
+        resampler = Frequency_Resampler(logfreqscale, 20., 22000., 300)
+        resampled = resampler.process(freq, data)
+
+        assert resampled.shape == (300, 7)
+        for j in range(7):
+            np.testing.assert_allclose(resampled[:, j], np.interp(resampler.xscaled, freq, data[:, j]))
+
+
+def test_max_pooling_keeps_narrow_peaks():
+    freq = np.linspace(0, 24000, 32769)
+    data = np.zeros((32769, 1))
+    # a single-bin peak, between two pixels
+    peak = np.argmin(np.abs(freq - 10012.))
+    data[peak, 0] = 1.
+
+    resampler = Frequency_Resampler(0, 0., 24000., 100)
+    assert resampler.process(freq, data).max() < 1.
+
+    resampler.setmode(RESAMPLING_MAX_POOLING)
+    assert resampler.process(freq, data).max() == 1.
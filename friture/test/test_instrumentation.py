@@ -0,0 +1,92 @@
+import numpy as np
+
+import sys
+sys.path.insert(0, '.')
+
+import json
+
+from friture.instrumentation import TimingHistogram, RollingHistogram, LatencyProbe, Instrumentation, BIN_COUNT
+from friture.analysisthread import Mailbox
+
+
+def test_percentiles_are_within_one_bin():
+    durations = np.random.RandomState(0).lognormal(np.log(1e-3), 1., size=10000)
+
+    histogram = TimingHistogram()
+    for duration in durations:
+        histogram.record(duration)
+
+    for p in [50, 99]:
+        exact = np.percentile(durations, p)
+        assert exact <= histogram.percentile(p) <= exact * 1.13
+    assert histogram.max == durations.max()
+    assert histogram.percentile(100) == durations.max()
+
+
+def test_out_of_range_durations():
+    histogram = TimingHistogram()
+    histogram.record(0.)
+    histogram.record(100.)
+
+    assert histogram.counts[0] == 1
+    assert histogram.counts[BIN_COUNT + 1] == 1
+    assert histogram.percentile(99) == 100.
+
+
+def test_timed_call_and_export():
+    instrumentation = Instrumentation()
+    instrumentation.reset()
+
+    wrapped = instrumentation.timed_call("Dock 1 (Test)", "handle_new_data", lambda x: 2 * x)
+    assert wrapped(3) == 6
+    with instrumentation.timed("Dock 1 (Test)", "canvasUpdate"):
+        pass
+
+    exported = json.loads(instrumentation.to_json())
+    metrics = exported['histograms']["Dock 1 (Test)"]
+    assert metrics['handle_new_data']['count'] == 1
+    assert metrics['canvasUpdate']['count'] == 1
+    assert len(metrics['canvasUpdate']['counts']) == len(exported['bin_upper_edges_ms']) + 1
+
+    # the wrappers keep recording after a reset
+    instrumentation.reset()
+    wrapped(1)
+    assert instrumentation.histogram("Dock 1 (Test)", "handle_new_data").count == 1
+    assert instrumentation.histogram("Dock 1 (Test)", "canvasUpdate").count == 0
+
+
+def test_rolling_histogram_forgets_old_windows():
+    histogram = RollingHistogram(window=10.)
+    histogram.record(1.)
+
+    histogram.window_start -= 11.
+    histogram.record(1e-3)
+    assert histogram.count == 2
+    assert histogram.max == 1.
+
+    histogram.window_start -= 11.
+    histogram.record(1e-3)
+    assert histogram.count == 2
+    assert histogram.max == 1e-3
+
+
+def test_latency_is_recorded_once_per_result():
+    instrumentation = Instrumentation()
+    instrumentation.reset()
+
+    mailbox = Mailbox()
+    mailbox.post("result", 123.)
+    assert mailbox.take() == "result"
+    assert mailbox.capture_time == 123.
+
+    probe = LatencyProbe("Dock 2 (Test)")
+    probe.drawn(None)
+    probe.painted()
+    probe.drawn(mailbox.capture_time)
+    probe.painted()
+    # repaints of the same result and redraws without a new result are ignored
+    probe.painted()
+    probe.drawn(mailbox.capture_time)
+    probe.painted()
+
+    assert instrumentation.histogram("Dock 2 (Test)", "latency").count == 1
@@ -0,0 +1,28 @@
+import numpy as np
+
+import sys
+sys.path.insert(0, '.')
+
+from friture.longlevels import Subsampler, gauss
+from friture.signal.decimate import decimate
+
+
+def test_subsampler_blocks_match_the_chained_decimation():
+    Ndec = 5
+    x = np.random.RandomState(0).randn(64 * 2 ** Ndec) ** 2
+
+    # reference: Ndec decimations by 2 of the whole signal
+    bdec = np.array(gauss(11, 2.))
+    adec = np.zeros(bdec.shape)
+    adec[0] = 1.
+    expected = x
+    for i in range(Ndec):
+        expected, zf = decimate(bdec, adec, expected, np.zeros(len(bdec) - 1))
+
+    # blocks of arbitrary lengths, not aligned on the decimation factor
+    subsampler = Subsampler(Ndec)
+    edges = [0, 1, 38, 70, 570, 1595, len(x)]
+    result = np.concatenate([subsampler.push(x[start:stop]).copy() for start, stop in zip(edges[:-1], edges[1:])])
+
+    assert len(result) == len(expected)
+    np.testing.assert_allclose(result, expected, rtol=1e-12, atol=1e-15)
@@ -0,0 +1,40 @@
+import numpy as np
+
+import sys
+sys.path.insert(0, '.')
+
+from friture_extensions.lookup_table import pyx_color_from_float_2D, pyx_color_from_level_2D
+
+
+def test_color_from_level_matches_scale_clip_lookup():
+    lut = np.arange(256, dtype=np.uint32) * 3
+    levels = np.random.RandomState(0).uniform(-160., 20., (50, 7))
+    levels[0, 0] = np.nan
+
+    for dtype in [np.float32, np.float64]:
+        values = levels.astype(dtype)
+        # NaN maps to the first color
+        expected = pyx_color_from_float_2D(lut, np.nan_to_num(np.clip((values + 140.) / 140., 0., 1.)))
+
+        # write into a strided view, with the rows reversed as for an image
+        pixels = np.zeros((50, 16), dtype=np.uint32)
+        pyx_color_from_level_2D(lut, values[::-1, :], -140., 0., pixels[:, :7])
+
+        np.testing.assert_array_equal(pixels[:, :7], expected[::-1, :])
+        assert np.all(pixels[:, 7:] == 0)
+
+
+def test_color_from_level_degenerate_range_and_small_output():
+    lut = np.arange(256, dtype=np.uint32)
+    levels = np.array([[-10., 0., 10.]])
+
+    pixels = np.zeros((1, 3), dtype=np.uint32)
+    pyx_color_from_level_2D(lut, levels, 0., 0., pixels)
+    np.testing.assert_array_equal(pixels, [[0, 0, 255]])
+
+    try:
+        pyx_color_from_level_2D(lut, levels, -140., 0., np.zeros((1, 2), dtype=np.uint32))
+    except ValueError:
+        pass
+    else:
+        assert False, "out of bounds write"
@@ -0,0 +1,110 @@
+import numpy as np
+
+import sys
+sys.path.insert(0, '.')
+
+import os
+import struct
+import subprocess
+import wave
+
+from friture.offline import OfflineAnalyzer, analyze_file, read_wav_blocks
+
+
+def sine(length, f, amplitude, sampling_rate=48000):
+    return amplitude * np.sin(2. * np.pi * f * np.arange(length) / sampling_rate)
+
+
+def test_results_do_not_depend_on_block_size():
+    x = np.random.RandomState(0).randn(48000 * 3 + 1234)
+
+    whole = OfflineAnalyzer(x.shape[0], period=0.5, fft_size=4096)
+    whole.process(x)
+
+    blocks = OfflineAnalyzer(x.shape[0], period=0.5, fft_size=4096)
+    for block in np.split(x, [1000, 1001, 30000, 100000]):
+        blocks.process(block)
+
+    a, b = whole.results(), blocks.results()
+    for key in ['rms', 'peak', 'spectrum', 'octave']:
+        np.testing.assert_allclose(a[key], b[key], rtol=1e-4, atol=1e-4)
+
+
+def test_levels_and_bands_of_a_sine():
+    x = sine(48000 * 2, 1000., 0.5)
+
+    analyzer = OfflineAnalyzer(x.shape[0], period=1., fft_size=8192, bands_per_octave=3)
+    analyzer.process(x)
+    results = analyzer.results()
+
+    # RMS of a sine of amplitude 0.5, and its peak
+    np.testing.assert_allclose(results['rms'], 20. * np.log10(0.5 / np.sqrt(2.)), atol=1e-3)
+    np.testing.assert_allclose(results['peak'], 20. * np.log10(0.5), atol=1e-3)
+
+    # the spectrum peaks at 1 kHz
+    peak_bins = np.argmax(results['spectrum'], axis=1)
+    np.testing.assert_allclose(results['spectrum_freq'][peak_bins], 1000., atol=48000. / 8192)
+
+    # the 1 kHz third-octave band holds the energy of the sine, after the filters settled
+    band = np.argmin(abs(results['octave_freq'] - 1000.))
+    assert np.argmax(results['octave'][1]) == band
+    np.testing.assert_allclose(results['octave'][1, band], results['rms'][1], atol=1.)
+
+
+def test_analyze_file(tmpdir):
+    x = sine(48000 + 100, 440., 0.25)
+    path = str(tmpdir.join("sine.wav"))
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(2)
+        f.setsampwidth(2)
+        f.setframerate(48000)
+        f.writeframes((np.stack([x, -x], axis=-1) * 2 ** 15).astype('<i2').tobytes())
+
+    blocks = list(read_wav_blocks(path, block_size=10000))
+    assert sum(block.shape[0] for block in blocks) == x.shape[0]
+    np.testing.assert_allclose(np.concatenate(blocks)[:, 1], -x, atol=2. ** -15)
+
+    output = analyze_file(path, str(tmpdir), channel=1, period=0.5)
+    assert os.path.basename(output) == "sine.npz"
+    with np.load(output) as results:
+        assert results['rms'].shape == (3,)
+        assert results['spectrum'].shape[0] == 3
+        assert results['octave'].shape == (3, 27)
+
+
+def test_float_and_24_bit_wav_files_are_read(tmpdir):
+    x = sine(1000, 440., 0.5)
+
+    # IEEE float, which the wave module does not read
+    float_path = str(tmpdir.join("float.wav"))
+    data = x.astype('<f4').tobytes()
+    with open(float_path, 'wb') as f:
+        f.write(struct.pack('<4sI4s', b'RIFF', 36 + len(data), b'WAVE'))
+        f.write(struct.pack('<4sIHHIIHH', b'fmt ', 16, 3, 1, 48000, 48000 * 4, 4, 32))
+        f.write(struct.pack('<4sI', b'data', len(data)))
+        f.write(data)
+
+    pcm24_path = str(tmpdir.join("pcm24.wav"))
+    with wave.open(pcm24_path, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(3)
+        f.setframerate(48000)
+        f.writeframes((x * 2 ** 23).astype('<i4').view(np.uint8).reshape(-1, 4)[:, :3].tobytes())
+
+    for path, tolerance in ((float_path, 1e-7), (pcm24_path, 2. ** -23)):
+        blocks = list(read_wav_blocks(path, block_size=300))
+        np.testing.assert_allclose(np.concatenate(blocks)[:, 0], x, atol=tolerance)
+        assert os.path.exists(analyze_file(path, str(tmpdir), period=0.01, fft_size=256))
+
+
+def test_offline_does_not_load_the_audio_backend():
+    # on a headless box without PortAudio, importing sounddevice raises OSError
+    code = ("import sys\n"
+            "class Blocker:\n"
+            "    def find_spec(self, name, path, target=None):\n"
+            "        if name.split('.')[0] in ('sounddevice', 'rtmixer', 'PyQt5'):\n"
+            "            raise OSError('PortAudio library not found')\n"
+            "sys.meta_path.insert(0, Blocker())\n"
+            "import friture.offline\n")
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    subprocess.run([sys.executable, "-c", code], check=True, cwd=root)
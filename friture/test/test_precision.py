@@ -0,0 +1,53 @@
+import numpy as np
+
+import sys
+sys.path.insert(0, '.')
+
+from friture.audioproc import audioproc
+from friture.ringbuffer import RingBuffer
+from friture_extensions.lfilter import pyx_lfilter_1D
+from friture_extensions.exp_smoothing_conv import pyx_exp_smoothed_value_numpy
+
+
+def test_lfilter_keeps_single_precision():
+    b = np.array([0.2, 0.3, 0.2])
+    a = np.array([1., -0.5, 0.2])
+    x = np.random.RandomState(0).randn(1000)
+
+    y64, z64 = pyx_lfilter_1D(b, a, x, np.zeros(2))
+    y32, z32 = pyx_lfilter_1D(b, a, x.astype(np.float32), np.zeros(2))
+
+    assert y32.dtype == np.float32
+    assert z32.dtype == np.float64
+    np.testing.assert_allclose(y32, y64, rtol=1e-5, atol=1e-6)
+
+
+def test_exp_smoothing_single_precision_data():
+    kernel = 0.1 * (0.9 ** np.arange(100.))[::-1]
+    data = np.random.RandomState(0).rand(10, 50)
+    previous = np.ones(10)
+
+    v64 = pyx_exp_smoothed_value_numpy(kernel, 0.1, data, previous)
+    v32 = pyx_exp_smoothed_value_numpy(kernel, 0.1, data.astype(np.float32), previous)
+
+    np.testing.assert_allclose(v32, v64, rtol=1e-6)
+
+
+def test_batch_analysis_follows_samples_type():
+    proc = audioproc()
+    proc.set_fftsize(1024)
+    samples = np.random.RandomState(0).randn(1024 + 7 * 256)
+
+    sp64 = proc.analyzelive_batch(samples, 8, 256)
+    sp32 = proc.analyzelive_batch(samples.astype(np.float32), 8, 256)
+
+    assert sp32.dtype == np.float32
+    np.testing.assert_allclose(sp32, sp64, rtol=1e-3, atol=1e-8)
+
+
+def test_ringbuffer_follows_data_type():
+    ringbuffer = RingBuffer()
+    ringbuffer.push(np.ones((1, 100)))
+    ringbuffer.push(np.ones((1, 100), dtype=np.float32))
+
+    assert ringbuffer.data(100).dtype == np.float32
@@ -0,0 +1,105 @@
+import numpy as np
+
+import sys
+sys.path.insert(0, '.')
+
+from friture.pyramid import HistoryPyramid, MAXIMUM, MEAN
+
+
+def test_levels_match_the_decimation_of_the_whole_history():
+    rng = np.random.RandomState(0)
+    data = rng.uniform(0., 1., (1000, 3)).astype(np.float32)
+
+    pyramid = HistoryPyramid(4096, 3)
+    # blocks of odd sizes, so that the pairs straddle the blocks
+    start = 0
+    for size in rng.randint(1, 30, 200):
+        pyramid.append(data[start:start + size])
+        start += size
+        if start >= data.shape[0]:
+            break
+
+    assert pyramid.count == data.shape[0]
+
+    for level in pyramid.levels[1:]:
+        f = level.factor
+        n = data.shape[0] // f
+        assert level.count == n
+        blocks = data[:n * f].reshape(n, f, 3)
+        np.testing.assert_allclose(level.read(0, n, MAXIMUM), blocks.max(axis=1))
+        np.testing.assert_allclose(level.read(0, n, MEAN), blocks.mean(axis=1), rtol=1e-5)
+
+
+def test_pooled_reads_a_bounded_amount_of_data():
+    data = np.arange(100000, dtype=np.float32)[:, np.newaxis]
+    pyramid = HistoryPyramid(100000, 1)
+    pyramid.append(data)
+
+    # 1000 columns per pixel, read from the level decimated by 512
+    level = pyramid.level_for(1000.)
+    assert level.factor == 512
+
+    pooled = pyramid.pooled(0, 100000, 100, MAXIMUM)
+    assert pooled.shape == (100, 1)
+    # the last pixel covers the newest columns, including those not decimated yet
+    assert pooled[-1, 0] == 99999
+
+    means = pyramid.pooled(0, 1024, 1, MEAN)
+    np.testing.assert_allclose(means[0, 0], data[:1024].mean())
+
+
+def test_ring_keeps_the_retention_at_every_level():
+    pyramid = HistoryPyramid(1000, 1)
+    pyramid.append(np.ones((5000, 1), dtype=np.float32))
+
+    assert pyramid.first() == 4000
+    for level in pyramid.levels:
+        assert level.capacity * level.factor >= 1000
+        assert level.first() == max(level.count - level.capacity, 0)
+
+
+def test_only_the_requested_reductions_are_kept():
+    allocated = []
+
+    def allocate(shape, dtype):
+        allocated.append(shape)
+        return np.zeros(shape, dtype)
+
+    data = np.arange(1000, dtype=np.float32)[:, np.newaxis]
+    pyramid = HistoryPyramid(1000, 1, allocate=allocate, reductions=(MAXIMUM,))
+    pyramid.append(data[:333])
+    pyramid.append(data[333:])
+
+    # a single buffer per level
+    assert len(allocated) == len(pyramid.levels)
+    for level in pyramid.levels[1:]:
+        assert list(level.columns) == [MAXIMUM]
+        n = level.count
+        blocks = data[:n * level.factor].reshape(n, level.factor, 1)
+        np.testing.assert_array_equal(level.read(0, n), blocks.max(axis=1))
+
+    try:
+        pyramid.pooled(0, 1000, 10, MEAN)
+        assert False, "the mean is not kept"
+    except ValueError:
+        pass
+
+
+def test_the_newest_columns_are_pooled_before_they_are_decimated():
+    # 1000 columns is not a multiple of the factors, the coarse levels lag behind the full resolution
+    data = np.arange(1, 1001, dtype=np.float32)[:, np.newaxis]
+    pyramid = HistoryPyramid(1000, 1, reductions=(MAXIMUM, MEAN))
+    pyramid.append(data)
+
+    level = pyramid.level_for(1000 / 10.)
+    assert level.count * level.factor < 1000
+
+    # the last pixel reaches the newest column, and the pixels past the history stay blank
+    maxima = pyramid.pooled(0, 1200, 12, MAXIMUM)
+    assert np.all(maxima[:10, 0] > 0.)
+    assert maxima[9, 0] == 1000.
+    np.testing.assert_array_equal(maxima[10:, 0], 0.)
+
+    means = pyramid.pooled(0, 1000, 10, MEAN)
+    assert np.all(means[:, 0] > 0.)
+    np.testing.assert_allclose(means[-1, 0], data[900:].mean())
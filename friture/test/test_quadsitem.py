@@ -0,0 +1,39 @@
+import numpy as np
+
+import sys
+sys.path.insert(0, '.')
+
+from friture.plotting.coordinateTransform import CoordinateTransform
+from friture.plotting.quadsItem import QuadsItem, decimate
+
+
+def make_item(bins):
+    x = np.linspace(0., 1000., bins + 1)
+    y = np.random.RandomState(0).rand(bins) * -100.
+    item = QuadsItem((0., 0.3, 0.), (0., 0.5, 0.))
+    item.setData(x[:-1], x[1:], y, (y + 100.) / 100.)
+    return item
+
+
+def test_instances_match_quads():
+    yMap = CoordinateTransform(-100., 0., 200, 0, 0)
+
+    for log in [False, True]:
+        # more bins than pixels, so that the bars are rebinned
+        xMap = CoordinateTransform(1., 1000., 250, 0, 0)
+        if log:
+            xMap.setLogarithmic()
+
+        item = make_item(1000)
+        vertices = item.vertexData(xMap, yMap).copy()
+        values = item.instanceValues(xMap, yMap)
+
+        assert values.shape[0] == len(item.bar_x1) == vertices.shape[0] // 6
+        # first vertex of each quad: top left
+        np.testing.assert_allclose(vertices[0::6, 0], item.bar_x1, rtol=1e-5)
+        np.testing.assert_allclose(vertices[0::6, 1], values[:, 0], rtol=1e-5)
+        np.testing.assert_allclose(vertices[0::6, 4], 0.3 + 0.5 * values[:, 1], rtol=1e-5)
+
+
+def test_decimate_drops_incomplete_group():
+    np.testing.assert_array_equal(decimate(np.arange(7.), 3), [1., 4.])
@@ -0,0 +1,88 @@
+import numpy as np
+
+import sys
+sys.path.insert(0, '.')
+
+from friture.ringbuffer import RingBuffer
+
+
+def test_reader_frames_are_overlapping_views():
+    ringbuffer = RingBuffer()
+    reader = ringbuffer.register_reader(8, 4)
+
+    x = np.arange(30.)
+    ringbuffer.push(x.reshape(1, -1))
+
+    count = reader.pending()
+    assert count == 7
+
+    frames = reader.frames(count)
+    assert frames.shape == (1, count, 8)
+    assert not frames.flags.writeable
+    # frame k ends at (k + 1) * step
+    for k in range(1, count):
+        end = (k + 1) * 4
+        np.testing.assert_array_equal(frames[0, k], x[end - 8:end])
+
+    reader.advance(count)
+    assert reader.pending() == 0
+
+
+def test_reader_capacity_is_reserved_on_push():
+    ringbuffer = RingBuffer(headroom=100)
+    reader = ringbuffer.register_reader(1000, 250)
+
+    ringbuffer.push(np.ones((1, 10)))
+    length = ringbuffer.buffer_length
+    assert length >= 1000 + 250 + 100
+
+    for i in range(20):
+        ringbuffer.push(np.ones((1, 50)))
+        reader.frames(reader.pending())
+
+    # the reader never makes the buffer grow
+    assert ringbuffer.buffer_length == length
+
+
+def test_reader_overrun_is_detected():
+    ringbuffer = RingBuffer(headroom=100)
+    reader = ringbuffer.register_reader(64, 16)
+    ringbuffer.push(np.zeros((1, 1)))
+
+    for i in range(10):
+        ringbuffer.push(np.zeros((1, 100)))
+
+    assert reader.pending() == 0
+    assert reader.overruns == 1
+    assert reader.index % 16 == 0
+
+    ringbuffer.push(np.zeros((1, 32)))
+    assert reader.pending() == 2
+
+
+def test_huge_offset():
+    ringbuffer = RingBuffer()
+    # far beyond the range of a 64-bit integer, and a multiple of the step
+    ringbuffer.offset = 10 * 2 ** 70
+    reader = ringbuffer.register_reader(10, 10)
+
+    x = np.arange(100.).reshape(1, -1)
+    ringbuffer.push(x)
+
+    assert reader.pending() == 10
+    np.testing.assert_array_equal(reader.frames(10)[0, -1], x[0, -10:])
+
+
+def test_reader_skips_pending_frames():
+    ringbuffer = RingBuffer()
+    reader = ringbuffer.register_reader(100, 30)
+
+    ringbuffer.push(np.zeros((1, 1000)))
+    assert reader.pending() == 1000 // 30
+
+    reader.skip_pending()
+    assert reader.pending() == 0
+    assert reader.index == 990
+
+    ringbuffer.push(np.zeros((1, 25)))
+    assert reader.pending() == 1
@@ -0,0 +1,57 @@
+import numpy as np
+
+import sys
+sys.path.insert(0, '.')
+
+from friture.spectrogram_history import SpectrogramHistory
+
+
+def columns(start, stop, bins=3):
+    # each column holds its own index, so that the reads can be checked
+    return np.tile(np.arange(start, stop, dtype=np.float32), (bins, 1))
+
+
+def test_history_wraps_and_reads_in_order():
+    freq = np.arange(3.)
+    history = SpectrogramHistory(retention_s=10.)
+
+    for start in range(0, 25, 5):
+        history.append(freq, 1., columns(start, start + 5))
+
+    assert history.capacity == 10
+    assert history.count == 25
+    assert history.first() == 15
+
+    np.testing.assert_array_equal(history.read(15, 25)[:, 0], np.arange(15, 25))
+    history.close()
+
+
+def test_history_pools_the_maximum_and_blanks_missing_columns():
+    freq = np.arange(3.)
+    history = SpectrogramHistory(retention_s=100.)
+    history.append(freq, 1., columns(0, 40))
+
+    # 4 columns per pixel, the last pixels are newer than the history
+    pooled = history.pooled(20, 60, 10)
+
+    assert pooled.shape == (3, 10)
+    np.testing.assert_array_equal(pooled[0, :5], [23, 27, 31, 35, 39])
+    np.testing.assert_array_equal(pooled[0, 5:], 0)
+
+    # zoomed in, a column spans several pixels
+    np.testing.assert_array_equal(history.pooled(10, 12, 4)[0], [10, 10, 11, 11])
+    history.close()
+
+
+def test_history_resets_when_the_bins_change():
+    history = SpectrogramHistory(retention_s=100.)
+    history.append(np.arange(3.), 1., columns(0, 10))
+    history.append(np.arange(4.), 1., columns(0, 5, bins=4))
+
+    assert history.count == 5
+    assert history.pyramid.bins == 4
+
+    history.set_retention(0.)
+    history.append(np.arange(4.), 1., columns(0, 5, bins=4))
+    assert history.count == 0
+    assert history.pooled(0, 5, 5).shape == (4, 5)
@@ -0,0 +1,57 @@
+import numpy as np
+
+import sys
+sys.path.insert(0, '.')
+
+from friture.filesource import SPEED_UNLIMITED
+from friture.syntheticsource import SyntheticSource, SIGNALS, CHANNEL_DELAY
+
+
+def play_all(source):
+    source.start()
+    blocks = []
+    while not source.is_finished():
+        count = source.read_available()
+        read, block, empty = source.read_buffers(count)
+        assert empty.shape[0] == 0
+        source.advance_read_index(read)
+        blocks.append(block.copy())
+    return blocks
+
+
+def test_signals_are_deterministic():
+    for signal in SIGNALS:
+        a = play_all(SyntheticSource(48000, signal, duration=0.51, block_size=1000, seed=3, speed=SPEED_UNLIMITED))
+        b = play_all(SyntheticSource(48000, signal, duration=0.51, block_size=1000, seed=3, speed=SPEED_UNLIMITED))
+
+        # fixed cadence, with a shorter last block
+        assert [block.shape[0] for block in a] == [1000] * 24 + [480]
+        np.testing.assert_array_equal(np.concatenate(a), np.concatenate(b))
+
+
+def test_second_channel_is_delayed():
+    source = SyntheticSource(48000, "noise", duration=0.1, block_size=100, speed=SPEED_UNLIMITED)
+    x = np.concatenate(play_all(source))
+
+    delay = int(CHANNEL_DELAY * 48000)
+    np.testing.assert_array_equal(x[delay:, 1], x[:-delay, 0])
+    assert np.all(x[:delay, 1] == 0.)
+
+
+def test_paced_source_waits_for_whole_blocks():
+    source = SyntheticSource(48000, "tones", duration=1., block_size=4800)
+    source.start()
+    assert source.read_available() == 0
+
+    source.clock_start -= 0.25
+    count = source.read_available()
+    assert count == 4800
+
+
+def test_blocks_longer_than_the_pacing_cap_are_played():
+    # 100000 frames is more than the second of audio that the pacing lets be due at once
+    source = SyntheticSource(48000, "noise", duration=5., block_size=100000, speed=0.5)
+    source.start()
+
+    source.clock_start -= 5.
+    assert source.read_available() == 100000
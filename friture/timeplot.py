@@ -177,6 +177,8 @@ class TimePlot(QtWidgets.QWidget):
         self.xmax = 1.
 
         self.canvas_width = 0
+        # the curves have one point per pixel divided by this, raised by the frame scheduler
+        self.resolution_divider = 1
 
         self.dual_channel = False
 
@@ -213,6 +215,7 @@ class TimePlot(QtWidgets.QWidget):
         if not self.paused:
             y_interp = np.interp(self.xscaled, x, y)
             self.curve.setData(self.xscaled, y_interp)
+            self.canvasWidget.invalidateData()
 
         self.draw()
 
@@ -239,6 +242,8 @@ class TimePlot(QtWidgets.QWidget):
                                       np.array(self.verticalScaleDivision.majorTicks()),
                                       np.array(self.verticalScaleDivision.minorTicks()))
 
+            self.canvasWidget.invalidateTransform()
+
     def pause(self):
         self.paused = True
         self.canvasWidget.pause()
@@ -286,11 +291,19 @@ class TimePlot(QtWidgets.QWidget):
             # self.curve2.setData(self.xscaled, y_interp2)
             self.curve.setData(x, y)
             self.curve2.setData(x, y2)
+            self.canvasWidget.invalidateData()
 
         self.draw()
 
     def update_xscale(self):
-        self.xscaled = np.linspace(self.xmin, self.xmax, self.canvas_width)
+        self.xscaled = np.linspace(self.xmin, self.xmax, max(self.canvas_width // self.resolution_divider, 2))
+
+    def set_resolution_divider(self, divider):
+        self.resolution_divider = divider
+        self.update_xscale()
+
+    def canvasUpdate(self):
+        self.canvasWidget.canvasUpdate()
 
     def settimerange(self, time_min, time_max):
         self.horizontalScaleTransform.setRange(time_min, time_max)
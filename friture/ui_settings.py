@@ -73,6 +73,14 @@ class Ui_Settings_Dialog(object):
         self.verticalLayout_4.addWidget(self.groupBox_second)
         self.horizontalLayout.addLayout(self.verticalLayout_4)
         self.verticalLayout_5.addLayout(self.horizontalLayout)
+        self.label_precision = QtWidgets.QLabel(Settings_Dialog)
+        self.label_precision.setObjectName("label_precision")
+        self.verticalLayout_5.addWidget(self.label_precision)
+        self.comboBox_precision = QtWidgets.QComboBox(Settings_Dialog)
+        self.comboBox_precision.setObjectName("comboBox_precision")
+        self.comboBox_precision.addItem("")
+        self.comboBox_precision.addItem("")
+        self.verticalLayout_5.addWidget(self.comboBox_precision)
 
         self.retranslateUi(Settings_Dialog)
         QtCore.QMetaObject.connectSlotsByName(Settings_Dialog)
@@ -86,3 +94,6 @@ class Ui_Settings_Dialog(object):
         self.radioButton_duo.setText(_translate("Settings_Dialog", "Two channels"))
         self.groupBox_first.setTitle(_translate("Settings_Dialog", "First channel"))
         self.groupBox_second.setTitle(_translate("Settings_Dialog", "Second channel"))
+        self.label_precision.setText(_translate("Settings_Dialog", "Processing precision :"))
+        self.comboBox_precision.setItemText(0, _translate("Settings_Dialog", "Double precision (64-bit)"))
+        self.comboBox_precision.setItemText(1, _translate("Settings_Dialog", "Single precision (32-bit)"))
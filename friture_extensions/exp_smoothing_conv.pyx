@@ -7,10 +7,13 @@ dtype = np.float64
 ctypedef np.float64_t dtype_t
 
 cimport cython
+# the data can be single or double precision, the kernel and the results are always double
+from cython cimport floating
+
 @cython.boundscheck(False)
 @cython.wraparound(False)
 
-def pyx_exp_smoothed_value(np.ndarray[dtype_t, ndim=1] kernel, dtype_t alpha, np.ndarray[dtype_t, ndim=1] data, dtype_t previous):
+def pyx_exp_smoothed_value(np.ndarray[dtype_t, ndim=1] kernel, dtype_t alpha, np.ndarray[floating, ndim=1] data, dtype_t previous):
 	cdef Py_ssize_t N = data.shape[0]
 	cdef Py_ssize_t Nk = kernel.shape[0]
 	cdef Py_ssize_t i
@@ -33,7 +36,10 @@ def pyx_exp_smoothed_value(np.ndarray[dtype_t, ndim=1] kernel, dtype_t alpha, np
 	
 	return value
 
-def pyx_exp_smoothed_value_numpy(np.ndarray[dtype_t, ndim=1] kernel, dtype_t alpha, np.ndarray[dtype_t, ndim=2] data, np.ndarray[dtype_t, ndim=1] previous):
+@cython.boundscheck(False)
+@cython.wraparound(False)
+
+def pyx_exp_smoothed_value_numpy(np.ndarray[dtype_t, ndim=1] kernel, dtype_t alpha, np.ndarray[floating, ndim=2] data, np.ndarray[dtype_t, ndim=1] previous):
 	cdef Py_ssize_t N = data.shape[1]
 	cdef Py_ssize_t Nf = data.shape[0]
 	cdef Py_ssize_t Nk = kernel.shape[0]
@@ -0,0 +1,127 @@
+import numpy as np
+cimport numpy as np
+
+# see INSTALL
+
+cimport cython
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+
+def pyx_sos_filter_bank_float64(
+    double[:, :, ::1] sos not None,
+    double[::1] x not None,
+    double[:, :, ::1] zi not None,
+    double[:, ::1] y not None):
+
+    """
+    Filter one signal through a bank of filters made of cascaded second-order sections.
+
+    sos has shape (n_bands, n_sections, 6), each row being [b0, b1, b2, a0, a1, a2]
+    with a0 = 1. zi has shape (n_bands, n_sections, 2) and holds the direct form II
+    transposed state of each section. It is updated in place, so that the next
+    block can be filtered seamlessly. The output of band i is written to y[i, :len(x)].
+
+    The block is run through one biquad at a time, in place in y, so that the
+    coefficients and the state of the biquad stay in registers in the inner loop.
+    """
+
+    cdef Py_ssize_t n_bands = sos.shape[0]
+    cdef Py_ssize_t n_sections = sos.shape[1]
+    cdef Py_ssize_t len_x = x.shape[0]
+    cdef Py_ssize_t i, k, s
+    cdef double b0, b1, b2, a1, a2, z0, z1, v, out
+
+    assert zi.shape[0] == n_bands and zi.shape[1] == n_sections and zi.shape[2] == 2
+    assert y.shape[0] >= n_bands and y.shape[1] >= len_x
+
+    with nogil:
+        for i in range(n_bands):
+            for s in range(n_sections):
+                b0 = sos[i, s, 0]
+                b1 = sos[i, s, 1]
+                b2 = sos[i, s, 2]
+                a1 = sos[i, s, 4]
+                a2 = sos[i, s, 5]
+                z0 = zi[i, s, 0]
+                z1 = zi[i, s, 1]
+
+                if s == 0:
+                    for k in range(len_x):
+                        v = x[k]
+                        out = b0 * v + z0
+                        z0 = b1 * v - a1 * out + z1
+                        z1 = b2 * v - a2 * out
+                        y[i, k] = out
+                else:
+                    for k in range(len_x):
+                        v = y[i, k]
+                        out = b0 * v + z0
+                        z0 = b1 * v - a1 * out + z1
+                        z1 = b2 * v - a2 * out
+                        y[i, k] = out
+
+                zi[i, s, 0] = z0
+                zi[i, s, 1] = z1
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+
+def pyx_polyphase_decimate_float64(
+    double[::1] b not None,
+    double[::1] a not None,
+    double[::1] x not None,
+    double[::1] zi not None,
+    int phase,
+    double[::1] work not None,
+    double[::1] y not None):
+
+    """
+    Low-pass filter and decimate by 2, without computing the discarded outputs.
+
+    The filter is evaluated in direct form II: the recursive part runs on every
+    input sample, while the feed-forward part is only evaluated for the samples
+    that are kept. b and a must have the same length, with a[0] = 1.
+
+    zi holds the last len(a) - 1 values of the recursive part, and is updated in place.
+    phase is the number of input samples to skip before the next kept sample (0 or 1).
+    work must hold at least len(x) + len(a) - 1 values, and y at least (len(x) + 1) / 2.
+
+    Returns the number of output samples and the phase for the next block.
+    """
+
+    cdef Py_ssize_t order = a.shape[0] - 1
+    cdef Py_ssize_t len_x = x.shape[0]
+    cdef Py_ssize_t n, k, m
+    cdef Py_ssize_t count = 0
+    cdef double w, acc
+
+    assert b.shape[0] == a.shape[0], "a and b must be of the same shape"
+    assert zi.shape[0] == order
+    assert work.shape[0] >= len_x + order
+    assert y.shape[0] >= (len_x + 1) // 2
+
+    with nogil:
+        for k in range(order):
+            work[k] = zi[k]
+
+        for n in range(len_x):
+            m = n + order
+            w = x[n]
+            for k in range(1, order + 1):
+                w = w - a[k] * work[m - k]
+            work[m] = w
+
+            if n >= phase and (n - phase) % 2 == 0:
+                acc = 0.
+                for k in range(order + 1):
+                    acc = acc + b[k] * work[m - k]
+                y[count] = acc
+                count = count + 1
+
+        for k in range(order):
+            zi[k] = work[len_x + k]
+
+    return count, (phase + len_x) % 2
@@ -7,13 +7,16 @@ dtype = np.float64
 ctypedef np.float64_t dtype_t
 
 cimport cython
+# the signal can be single or double precision, the coefficients and the state are always double
+from cython cimport floating
+
 @cython.boundscheck(False)
 @cython.wraparound(False)
 
-def pyx_lfilter_float64_1D(
+def pyx_lfilter_1D(
     np.ndarray[np.float64_t, ndim=1] b not None,
     np.ndarray[np.float64_t, ndim=1] a not None,
-    np.ndarray[np.float64_t, ndim=1] x not None,
+    np.ndarray[floating, ndim=1] x not None,
     np.ndarray[np.float64_t, ndim=1] zi not None):
 
     """
@@ -46,7 +49,7 @@ def pyx_lfilter_float64_1D(
     Returns
     -------
     y : array
-        The output of the digital filter.
+        The output of the digital filter, of the same precision as x.
     zf : array (optional)
         If zi is None, this is not returned, otherwise, zf holds the
         final filter delay values.
@@ -91,24 +94,31 @@ def pyx_lfilter_float64_1D(
     cdef Py_ssize_t len_b = b.shape[0]
     cdef np.int_t n
     cdef np.uint_t k
+    cdef double xk, yk
 
-    cdef np.ndarray[np.float64_t, ndim=1] y = np.empty(x.shape[0])
+    cdef np.ndarray[floating, ndim=1] y = np.empty(x.shape[0], dtype=x.dtype)
     cdef np.ndarray[np.float64_t, ndim=1] z = np.array(zi, copy=True)
 
     if len_b > 1:
         for k in range(len_x):
-            y[k] = z[0] + b[0] * x[k] # Calculate first delay (output)
+            xk = x[k]
+            yk = z[0] + b[0] * xk # Calculate first delay (output)
 
             # Fill in middle delays
             for n in range(len_b - 2):
-                z[n] = z[1+n] + x[k] * b[1+n] - y[k] * a[1+n]
+                z[n] = z[1+n] + xk * b[1+n] - yk * a[1+n]
 
             # Calculate last delay
-            z[len_b - 2] = x[k] * b[len_b - 1] - y[k] * a[len_b - 1]
+            z[len_b - 2] = xk * b[len_b - 1] - yk * a[len_b - 1]
+            y[k] = yk
     else:
         for k in range(len_x):
             y[k] = x[k] * b[0]
 
 
 
-    return y, z
\ No newline at end of file
+    return y, z
+
+
+# former name, from when only double precision was supported
+pyx_lfilter_float64_1D = pyx_lfilter_1D
\ No newline at end of file
@@ -7,12 +7,15 @@ dtype = np.float64
 ctypedef np.float64_t dtype_t
 
 cimport cython
+# the buffers can be single or double precision, the indices are always double
+from cython cimport floating
+
 @cython.boundscheck(False)
 @cython.wraparound(False)
 
-def pyx_linear_interp_2D(np.ndarray[dtype_t, ndim=2] resampled_buffer not None,
-                         np.ndarray[dtype_t, ndim=1] data not None,
-                         np.ndarray[dtype_t, ndim=1] old_data not None,
+def pyx_linear_interp_2D(np.ndarray[floating, ndim=2] resampled_buffer not None,
+                         np.ndarray[floating, ndim=1] data not None,
+                         np.ndarray[floating, ndim=1] old_data not None,
                          dtype_t orig_index,
                          dtype_t resampled_index,
                          dtype_t resampling_ratio,
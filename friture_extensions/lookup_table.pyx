@@ -7,11 +7,14 @@ dtype = np.float64
 ctypedef np.float64_t dtype_t
 
 cimport cython
+# the values can be single or double precision
+from cython cimport floating
+
 @cython.boundscheck(False)
 @cython.wraparound(False)
 
 def pyx_color_from_float(np.ndarray[np.uint32_t, ndim=1] lut not None,
-                         np.ndarray[np.float64_t, ndim=1] values not None):
+                         np.ndarray[floating, ndim=1] values not None):
     cdef np.int_t i, j
     cdef Py_ssize_t N = values.shape[0]
     cdef np.ndarray[np.uint32_t, ndim=1] out = np.zeros([N], dtype=np.uint32)
@@ -23,7 +26,7 @@ def pyx_color_from_float(np.ndarray[np.uint32_t, ndim=1] lut not None,
     return out
 
 def pyx_color_from_float_2D(np.ndarray[np.uint32_t, ndim=1] lut not None,
-                            np.ndarray[np.float64_t, ndim=2] values not None):
+                            np.ndarray[floating, ndim=2] values not None):
     cdef np.int_t i, j, k
     cdef Py_ssize_t M = values.shape[0]
     cdef Py_ssize_t N = values.shape[1]
@@ -35,3 +38,42 @@ def pyx_color_from_float_2D(np.ndarray[np.uint32_t, ndim=1] lut not None,
             out[i, j] = lut[k]
     
     return out
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def pyx_color_from_level_2D(np.ndarray[np.uint32_t, ndim=1] lut not None,
+                            np.ndarray[floating, ndim=2] levels not None,
+                            double level_min, double level_max,
+                            np.ndarray[np.uint32_t, ndim=2] out not None):
+    # scale the levels from [level_min, level_max] to the lookup table, clip, and write
+    # the colors in place: out can be a strided view on the pixels of a QImage
+    cdef Py_ssize_t i, j, k
+    cdef Py_ssize_t M = levels.shape[0]
+    cdef Py_ssize_t N = levels.shape[1]
+    cdef Py_ssize_t last = lut.shape[0] - 1
+    cdef double scale
+    cdef double v
+
+    # the loop below is not bounds-checked
+    if last < 0:
+        raise ValueError("the lookup table is empty")
+    if out.shape[0] < M or out.shape[1] < N:
+        raise ValueError("out is smaller than levels: %s < %s" % ((out.shape[0], out.shape[1]), (M, N)))
+
+    if level_max == level_min:
+        # degenerate range: a step at level_min, as the division by zero of the numpy version
+        scale = np.inf
+    else:
+        scale = last / (level_max - level_min)
+
+    for i in range(M):
+        for j in range(N):
+            v = (levels[i, j] - level_min) * scale
+            # also catches NaN
+            if not v > 0.:
+                k = 0
+            elif v >= last:
+                k = last
+            else:
+                k = <Py_ssize_t> v
+            out[i, j] = lut[k]
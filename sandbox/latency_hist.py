@@ -1,15 +1,32 @@
 # -*- coding: utf-8 -*-
 
+# plots the latency histograms exported from the Statistics tab of the About dialog
+
+import json
+import sys
+
 import matplotlib.pyplot as plt
 import numpy as np
 
-filename = "latency_log.txt"
+filename = sys.argv[1] if len(sys.argv) > 1 else "friture-timings.json"
 
-data = np.loadtxt(filename)
+with open(filename) as f:
+    timings = json.load(f)
+
+edges = np.array(timings['bin_upper_edges_ms'])
 
 plt.figure(1)
-plt.hist(data, bins = 200)
-plt.figure(2)
-plt.plot(data)
+for source, metrics in sorted(timings['histograms'].items()):
+    if 'latency' not in metrics:
+        continue
+    counts = np.array(metrics['latency']['counts'])
+    # the underflow and overflow bins are not plotted
+    plt.step(edges[1:], counts[1:-1], where='pre', label=source)
+
+plt.xscale('log')
+plt.xlabel("Latency from capture to display (ms)")
+plt.ylabel("Count")
+plt.title(str(timings['context'].get('device')))
+plt.legend()
 
-plt.show()
\ No newline at end of file
+plt.show()
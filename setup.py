@@ -44,7 +44,9 @@ ext_modules = [LateIncludeExtension("friture_extensions.exp_smoothing_conv",
                LateIncludeExtension("friture_extensions.lookup_table",
                                     ["friture_extensions/lookup_table.pyx"]),
                LateIncludeExtension("friture_extensions.lfilter",
-                                    ["friture_extensions/lfilter.pyx"])]
+                                    ["friture_extensions/lfilter.pyx"]),
+               LateIncludeExtension("friture_extensions.filterbank",
+                                    ["friture_extensions/filterbank.pyx"])]
 
 # Friture runtime dependencies
 # these will be installed when calling 'pip install friture'
@@ -94,6 +96,8 @@ setup(name="friture",
                 'friture.generators',
                 'friture.signal',
                 'friture_extensions'],
+      # filters parameters generated by friture/filter_design.py
+      package_data={'friture': ['generated_filters.npz']},
       scripts=['scripts/friture'],
       ext_modules=ext_modules,
       install_requires=install_requires,